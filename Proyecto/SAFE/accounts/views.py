@@ -3,7 +3,6 @@ from django.contrib import messages
 from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.db import transaction
-from django.db.models import Count
 from .models import AppUser
 from enrollments.models import CourseInscription
 from django.contrib.auth import update_session_auth_hash
@@ -301,14 +300,7 @@ def profile(request):
         app_user=request.user
     ).select_related("course")
 
-    courses_qs = (
-        get_courses_for_user(request.user)
-        .annotate(
-            modules_count=Count("modules", distinct=True),
-            contents_count=Count("modules__contents", distinct=True),
-        )
-        .order_by("-created_at")
-    )
+    courses_qs = get_courses_for_user(request.user).order_by("-created_at")
     prefetch = _build_inscriptions_prefetch(request.user)
     if prefetch is not None:
         courses_qs = courses_qs.prefetch_related(prefetch)
@@ -0,0 +1,112 @@
+import logging
+import queue
+
+from django.conf import settings
+from django.db import transaction
+
+from courses.background import run_in_background
+from courses.models import Course, Material
+from learning_paths.models import LearningPath
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+# Campos de archivo cuyo contenido se borra al quitarlos o reemplazarlos
+TRACKED_FILE_FIELDS = {
+    Material: ("file",),
+    Course: ("header_img",),
+    LearningPath: ("header_img",),
+}
+
+# Borrados pendientes; el hilo de fondo los procesa por lotes
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+
+
+def loaded_file_name(instance, field_name: str):
+    """
+    Name the file field had when the instance was loaded, or ``None`` if it
+    was not loaded (new instance or deferred field).
+    """
+    return getattr(instance, "_loaded_files", {}).get(field_name)
+
+
+def remember_loaded_files(instance) -> None:
+    """Record the current file names of ``instance`` as its loaded state."""
+    loaded = {}
+    for field_name in TRACKED_FILE_FIELDS[type(instance)]:
+        # Leer el valor crudo: evita crear FieldFile y cargar campos diferidos
+        value = instance.__dict__.get(field_name)
+        if value is not None:
+            loaded[field_name] = getattr(value, "name", value) or ""
+    instance._loaded_files = loaded
+
+
+def _referenced_names(names):
+    """File names from ``names`` still used by some row (and so not orphaned)."""
+    referenced = set()
+    for model, fields in TRACKED_FILE_FIELDS.items():
+        for field_name in fields:
+            referenced.update(
+                model._base_manager.filter(**{f"{field_name}__in": names}).values_list(
+                    field_name, flat=True
+                )
+            )
+    return referenced
+
+
+def delete_files(items) -> int:
+    """
+    Delete ``(storage, name)`` pairs that no row references any more, with
+    one query per tracked field for the whole batch. Returns how many were
+    deleted.
+    """
+    names = {name for _storage, name in items}
+    referenced = _referenced_names(names)
+    deleted = 0
+    for storage, name in items:
+        if name in referenced:
+            continue
+        try:
+            storage.delete(name)
+            deleted += 1
+        except OSError:
+            logger.warning("No se pudo borrar el archivo %s", name, exc_info=True)
+    return deleted
+
+
+def _drain() -> None:
+    """Delete every queued file in batches; later jobs find the queue empty."""
+    while True:
+        batch = []
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return
+        try:
+            delete_files(batch)
+        except Exception:
+            logger.exception("Error borrando %d archivo(s) huérfanos", len(batch))
+
+
+def schedule_file_deletion(storage, name) -> None:
+    """
+    Delete a file once the current transaction commits; nothing is deleted
+    if it rolls back. With ``FILE_CLEANUP_ASYNC`` deletions are handed to a
+    background thread that processes them in batches, so the request does
+    not wait on the disk or the storage service.
+    """
+    if not name:
+        return
+
+    def enqueue():
+        if settings.FILE_CLEANUP_ASYNC:
+            _queue.put((storage, name))
+            run_in_background("file-cleanup", _drain)
+        else:
+            delete_files([(storage, name)])
+
+    transaction.on_commit(enqueue)
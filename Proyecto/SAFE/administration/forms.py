@@ -145,6 +145,38 @@ class ContentForm(forms.ModelForm):
         }
 
 
+# Mapeo de tipos esperados a extensiones válidas
+MATERIAL_EXTENSIONS = {
+    "jpg": ["jpg", "jpeg"],
+    "mp4": ["mp4"],
+    "pdf": ["pdf"],
+    "mp3": ["mp3"],
+    "txt": ["txt"],
+}
+
+
+def validate_material_filename(filename, expected_type):
+    """
+    Verifica que la extensión de ``filename`` corresponda a ``expected_type``.
+    La usan MaterialForm y la subida por fragmentos.
+    """
+    if "." in filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+    else:
+        raise forms.ValidationError("El archivo debe tener una extensión.")
+
+    # Verificar que la extensión coincida con el tipo esperado
+    if expected_type in MATERIAL_EXTENSIONS:
+        if extension not in MATERIAL_EXTENSIONS[expected_type]:
+            expected_display = expected_type.upper()
+            if expected_type == "jpg":
+                expected_display = "JPG/JPEG"
+            raise forms.ValidationError(
+                f"El archivo debe ser de tipo {expected_display}. "
+                f"Has seleccionado un archivo {extension.upper()}."
+            )
+
+
 class MaterialForm(forms.ModelForm):
     # Campo oculto para especificar el tipo esperado según el block_type
     expected_type = forms.CharField(required=False, widget=forms.HiddenInput())
@@ -170,36 +202,11 @@ class MaterialForm(forms.ModelForm):
             file = self.instance.file
 
         if file and expected_type:
-            # Obtener la extensión del archivo
             filename = file.name if hasattr(file, "name") else str(file)
-            if "." in filename:
-                extension = filename.rsplit(".", 1)[-1].lower()
-            else:
-                raise forms.ValidationError(
-                    {"file": "El archivo debe tener una extensión."}
-                )
-
-            # Mapeo de tipos esperados a extensiones válidas
-            valid_extensions = {
-                "jpg": ["jpg", "jpeg"],
-                "mp4": ["mp4"],
-                "pdf": ["pdf"],
-                "mp3": ["mp3"],
-                "txt": ["txt"],
-            }
-
-            # Verificar que la extensión coincida con el tipo esperado
-            if expected_type in valid_extensions:
-                if extension not in valid_extensions[expected_type]:
-                    expected_display = expected_type.upper()
-                    if expected_type == "jpg":
-                        expected_display = "JPG/JPEG"
-                    raise forms.ValidationError(
-                        {
-                            "file": f"El archivo debe ser de tipo {expected_display}. "
-                            f"Has seleccionado un archivo {extension.upper()}."
-                        }
-                    )
+            try:
+                validate_material_filename(filename, expected_type)
+            except forms.ValidationError as error:
+                raise forms.ValidationError({"file": error.messages})
 
         return cleaned_data
 
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Sum
+
+from administration.models import ChunkedUpload
+from administration.uploads import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarta las subidas por fragmentos vencidas (sin terminar o cuyo "
+        "material nunca se asoció a un contenido) y muestra el rendimiento "
+        "de las subidas completadas."
+    )
+
+    def handle(self, *args, **options):
+        stats = ChunkedUpload.objects.filter(completed_at__isnull=False).aggregate(
+            uploads=Count("pk"),
+            total_bytes=Sum("size"),
+            total_seconds=Sum("transfer_seconds"),
+            avg_chunks=Avg("chunks_received"),
+        )
+        if stats["uploads"] and stats["total_seconds"]:
+            self.stdout.write(
+                f"{stats['uploads']} subida(s) completadas: "
+                f"{stats['total_bytes'] / 1024**2:.1f} MB a "
+                f"{stats['total_bytes'] / stats['total_seconds'] / 1024**2:.2f} MB/s, "
+                f"{stats['avg_chunks']:.1f} fragmentos de media."
+            )
+
+        removed = purge_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f"{removed} subida(s) vencidas descartadas."))
@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from accounts.models import AppUser
+from courses.models import Material
 
 # Create your models here.
 
@@ -23,4 +26,46 @@ class RoleChangeLog(models.Model):
         verbose_name_plural = "Registros de cambio de rol"
 
     def __str__(self):
-        return f"{self.changed_by} cambió el rol de {self.target_user}"
\ No newline at end of file
+        return f"{self.changed_by} cambió el rol de {self.target_user}"
+
+
+class ChunkedUpload(models.Model):
+    """Subida reanudable de un archivo de material, recibida por fragmentos."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        AppUser, on_delete=models.CASCADE, related_name="chunked_uploads"
+    )
+    filename = models.CharField(max_length=255)
+    expected_type = models.CharField(max_length=10, choices=Material.MaterialType.choices)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    # Métricas de transferencia: fragmentos y segundos leyendo cuerpos de petición
+    chunks_received = models.PositiveIntegerField(default=0)
+    transfer_seconds = models.FloatField(default=0)
+    # Fragmento en escritura: reserva el desplazamiento actual sin mantener
+    # la fila bloqueada mientras llegan los bytes (administration.uploads)
+    write_started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    material = models.OneToOneField(
+        Material, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Subida por fragmentos"
+        verbose_name_plural = "Subidas por fragmentos"
+
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
+
+    @property
+    def throughput(self):
+        """Bytes por segundo recibidos (sin contar esperas entre fragmentos)."""
+        if not self.transfer_seconds:
+            return None
+        return self.offset / self.transfer_seconds
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
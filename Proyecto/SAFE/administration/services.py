@@ -1,8 +1,81 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Q, QuerySet
 
 from accounts.models import AppUser
 from .models import RoleChangeLog
 
+ADMIN_PAGE_SIZE = 50
+
+
+@dataclass
+class KeysetPage:
+    """One page of a keyset-paginated listing."""
+
+    items: List
+    next_cursor: Optional[str]
+
+
+def _decode_cursor(queryset: QuerySet, cursor: Optional[str], order_field: str):
+    """Return ``(value, pk)`` from a cursor, or ``None`` when it is missing/invalid."""
+    if not cursor:
+        return None
+
+    raw_value, _sep, raw_pk = cursor.rpartition("|")
+    try:
+        pk = int(raw_pk)
+        if order_field == "pk":
+            return pk, pk
+        field = queryset.model._meta.get_field(order_field)
+        return field.to_python(raw_value), pk
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def _encode_cursor(obj, order_field: str) -> str:
+    if order_field == "pk":
+        return str(obj.pk)
+    field = obj._meta.get_field(order_field)
+    return f"{field.value_to_string(obj)}|{obj.pk}"
+
+
+def keyset_paginate(
+    queryset: QuerySet,
+    cursor: Optional[str] = None,
+    page_size: int = ADMIN_PAGE_SIZE,
+    order_field: str = "pk",
+    descending: bool = False,
+) -> KeysetPage:
+    """
+    Return the page of ``queryset`` that follows ``cursor``.
+
+    Rows are ordered by ``(order_field, pk)`` and the next page starts after
+    the last row returned, so the cost does not grow with the page number
+    the way ``OFFSET`` does.
+    """
+    prefix, lookup = ("-", "lt") if descending else ("", "gt")
+    queryset = queryset.order_by(f"{prefix}{order_field}", f"{prefix}pk")
+
+    position = _decode_cursor(queryset, cursor, order_field)
+    if position is not None:
+        value, pk = position
+        if order_field == "pk":
+            queryset = queryset.filter(**{f"pk__{lookup}": pk})
+        else:
+            queryset = queryset.filter(
+                Q(**{f"{order_field}__{lookup}": value})
+                | Q(**{order_field: value, f"pk__{lookup}": pk})
+            )
+
+    items = list(queryset[: page_size + 1])
+    if len(items) > page_size:
+        items = items[:page_size]
+        return KeysetPage(items=items, next_cursor=_encode_cursor(items[-1], order_field))
+    return KeysetPage(items=items, next_cursor=None)
+
 
 def change_role(actor: AppUser, target: AppUser, new_role: str) -> bool:
     """Change the role of ``target`` when performed by an authorized actor.
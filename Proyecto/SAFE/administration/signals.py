@@ -1,32 +1,29 @@
-import os
-from django.db.models import Sum
-from django.db.models.signals import post_delete, pre_save, post_save
+from django.db.models.signals import post_delete, post_init, pre_save, post_save
 from django.dispatch import receiver
 from courses.models import Material, Content, Course
+from courses.thumbnails import schedule_derivatives
+from .file_cleanup import (
+    loaded_file_name,
+    remember_loaded_files,
+    schedule_file_deletion,
+)
 from learning_paths.models import LearningPath, CourseInPath
-
-
-def update_learning_path_duration(learning_path):
-    """Recalcula la duración total de una ruta basada en sus cursos."""
-    total_duration = learning_path.courses.aggregate(
-        total=Sum("course__duration_hours")
-    )["total"]
-    learning_path.estimated_duration = total_duration or 0
-    learning_path.save(update_fields=["estimated_duration"])
+from learning_paths.services import schedule_path_duration_update
 
 
 @receiver(post_save, sender=CourseInPath)
 @receiver(post_delete, sender=CourseInPath)
 def update_duration_on_path_change(sender, instance, **kwargs):
-    update_learning_path_duration(instance.learning_path)
+    schedule_path_duration_update(path_ids=[instance.learning_path_id])
 
 
 @receiver(post_save, sender=Course)
-def update_duration_on_course_change(sender, instance, **kwargs):
-    # Actualizar todas las rutas que contienen este curso
-    paths = LearningPath.objects.filter(courses__course=instance).distinct()
-    for path in paths:
-        update_learning_path_duration(path)
+def update_duration_on_course_change(sender, instance, created, update_fields, **kwargs):
+    # Un curso nuevo aún no pertenece a ninguna ruta
+    if created or (update_fields is not None and "duration_hours" not in update_fields):
+        return
+    # Actualizar todas las rutas que contienen este curso (un UPDATE tras el commit)
+    schedule_path_duration_update(course_ids=[instance.pk])
 
 
 @receiver(post_delete, sender=Content)
@@ -42,74 +39,106 @@ def auto_delete_material_on_content_delete(sender, instance, **kwargs):
             pass
 
 
+# Los archivos se borran tras el commit (administration.file_cleanup); el
+# archivo anterior se conoce por el estado cargado, sin volver a consultar.
+@receiver(post_init, sender=Material)
+@receiver(post_init, sender=Course)
+@receiver(post_init, sender=LearningPath)
+def remember_files_on_load(sender, instance, **kwargs):
+    if instance.pk is not None:
+        remember_loaded_files(instance)
+
+
 @receiver(post_delete, sender=Material)
 def auto_delete_file_on_delete(sender, instance, **kwargs):
     if instance.file:
-        if os.path.isfile(instance.file.path):
-            os.remove(instance.file.path)
+        schedule_file_deletion(instance.file.storage, instance.file.name)
 
 
 @receiver(post_delete, sender=Course)
 def auto_delete_course_image_on_delete(sender, instance, **kwargs):
     """Elimina la imagen de portada cuando se elimina el curso."""
     if instance.header_img:
-        if os.path.isfile(instance.header_img.path):
-            os.remove(instance.header_img.path)
+        schedule_file_deletion(instance.header_img.storage, instance.header_img.name)
 
 
 @receiver(post_delete, sender=LearningPath)
 def auto_delete_path_image_on_delete(sender, instance, **kwargs):
     """Elimina la imagen de portada cuando se elimina la ruta."""
     if instance.header_img:
-        if os.path.isfile(instance.header_img.path):
-            os.remove(instance.header_img.path)
+        schedule_file_deletion(instance.header_img.storage, instance.header_img.name)
 
 
-@receiver(pre_save, sender=Material)
-def auto_delete_file_on_change(sender, instance, **kwargs):
-    if not instance.pk:
-        return False
+def _delete_replaced_file(instance, field_name):
+    """Programa el borrado del archivo cargado si el campo ya no lo usa."""
+    old_name = loaded_file_name(instance, field_name)
+    if not old_name:
+        return
+    new_file = getattr(instance, field_name)
+    if not new_file or new_file.name != old_name or not new_file._committed:
+        schedule_file_deletion(new_file.storage, old_name)
 
-    try:
-        old_file = Material.objects.get(pk=instance.pk).file
-    except Material.DoesNotExist:
-        return False
 
-    new_file = instance.file
-    if not old_file == new_file:
-        if old_file and os.path.isfile(old_file.path):
-            os.remove(old_file.path)
+@receiver(pre_save, sender=Material)
+def auto_delete_file_on_change(sender, instance, **kwargs):
+    _delete_replaced_file(instance, "file")
 
 
 @receiver(pre_save, sender=Course)
 def auto_delete_course_image_on_change(sender, instance, **kwargs):
     """Elimina la imagen antigua cuando se actualiza la imagen del curso."""
-    if not instance.pk:
-        return False
-
-    try:
-        old_file = Course.objects.get(pk=instance.pk).header_img
-    except Course.DoesNotExist:
-        return False
-
-    new_file = instance.header_img
-    if not old_file == new_file:
-        if old_file and os.path.isfile(old_file.path):
-            os.remove(old_file.path)
+    _delete_replaced_file(instance, "header_img")
 
 
 @receiver(pre_save, sender=LearningPath)
 def auto_delete_path_image_on_change(sender, instance, **kwargs):
     """Elimina la imagen antigua cuando se actualiza la imagen de la ruta."""
-    if not instance.pk:
-        return False
-
-    try:
-        old_file = LearningPath.objects.get(pk=instance.pk).header_img
-    except LearningPath.DoesNotExist:
-        return False
-
-    new_file = instance.header_img
-    if not old_file == new_file:
-        if old_file and os.path.isfile(old_file.path):
-            os.remove(old_file.path)
+    _delete_replaced_file(instance, "header_img")
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=LearningPath)
+def remember_files_on_save(sender, instance, **kwargs):
+    remember_loaded_files(instance)
+
+
+def _mark_image_for_thumbnails(instance, field_name, digest_field):
+    """Olvida las miniaturas de una imagen quitada o reemplazada."""
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        setattr(instance, digest_field, "")
+    elif not field_file._committed:
+        # Subida nueva: el archivo se escribe después de pre_save, así que las
+        # miniaturas se programan en post_save
+        setattr(instance, digest_field, "")
+        instance._thumbnails_pending = True
+
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=LearningPath)
+def reset_header_thumbnails(sender, instance, **kwargs):
+    _mark_image_for_thumbnails(instance, "header_img", "header_img_digest")
+
+
+@receiver(pre_save, sender=Material)
+def reset_material_thumbnails(sender, instance, **kwargs):
+    if instance.type == Material.MaterialType.JPG:
+        _mark_image_for_thumbnails(instance, "file", "file_digest")
+    else:
+        instance.file_digest = ""
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=LearningPath)
+def schedule_header_thumbnails(sender, instance, **kwargs):
+    if getattr(instance, "_thumbnails_pending", False):
+        instance._thumbnails_pending = False
+        schedule_derivatives(instance, "header_img", "header_img_digest")
+
+
+@receiver(post_save, sender=Material)
+def schedule_material_thumbnails(sender, instance, **kwargs):
+    if getattr(instance, "_thumbnails_pending", False):
+        instance._thumbnails_pending = False
+        schedule_derivatives(instance, "file", "file_digest")
@@ -0,0 +1,115 @@
+// Subida por fragmentos de archivos de material. Los formularios con
+// data-chunked-upload envían el archivo en fragmentos (PATCH con Upload-Offset)
+// antes de enviarse, y solo mandan el id de la subida en material_upload.
+// Si la conexión se corta, se reanuda desde el último byte confirmado.
+(function () {
+  const EXPECTED_TYPES = { image: 'jpg', video: 'mp4', pdf: 'pdf' }
+  const MAX_RETRIES = 5
+
+  function csrfToken(form) {
+    const input = form.querySelector('[name="csrfmiddlewaretoken"]')
+    return input ? input.value : ''
+  }
+
+  function storageKey(file) {
+    return `chunked-upload:${file.name}:${file.size}:${file.lastModified}`
+  }
+
+  function wait(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms))
+  }
+
+  async function request(url, options) {
+    const response = await fetch(url, { credentials: 'same-origin', ...options })
+    const data = await response.json().catch(() => ({}))
+    return { response, data }
+  }
+
+  async function resumeOrStart(form, file, expectedType) {
+    const headers = { 'X-CSRFToken': csrfToken(form) }
+    const saved = window.localStorage.getItem(storageKey(file))
+    if (saved) {
+      const { response, data } = await request(saved, { headers })
+      if (response.ok && !data.complete) return data
+    }
+
+    const { response, data } = await request(form.dataset.chunkedUpload, {
+      method: 'POST',
+      headers: { ...headers, 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size, expected_type: expectedType }),
+    })
+    if (!response.ok) throw new Error(data.error || 'No se pudo iniciar la subida.')
+    window.localStorage.setItem(storageKey(file), data.url)
+    return data
+  }
+
+  async function upload(form, file, expectedType, status) {
+    let state = await resumeOrStart(form, file, expectedType)
+    let retries = 0
+
+    while (!state.complete) {
+      const chunk = file.slice(state.offset, state.offset + state.chunk_size)
+      try {
+        const { response, data } = await request(state.url, {
+          method: 'PATCH',
+          headers: {
+            'X-CSRFToken': csrfToken(form),
+            'Upload-Offset': String(state.offset),
+            'Content-Type': 'application/offset+octet-stream',
+          },
+          body: chunk,
+        })
+        if (response.status === 409) {
+          // El servidor tiene otro desplazamiento: continuar desde ahí
+          state = { ...state, offset: data.offset, complete: data.complete }
+          continue
+        }
+        if (!response.ok) throw new Error(data.error || response.statusText)
+        state = { ...state, ...data }
+        retries = 0
+      } catch (error) {
+        if (++retries > MAX_RETRIES) throw error
+        await wait(1000 * 2 ** retries)
+        const { response, data } = await request(state.url, {})
+        if (response.ok) state = { ...state, ...data }
+        continue
+      }
+
+      const percent = Math.floor((state.offset / state.size) * 100)
+      const speed = state.throughput ? ` · ${(state.throughput / 1048576).toFixed(1)} MB/s` : ''
+      if (status) status.textContent = `Subiendo ${percent}%${speed}`
+    }
+
+    window.localStorage.removeItem(storageKey(file))
+    return state.id
+  }
+
+  document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('form[data-chunked-upload]').forEach((form) => {
+      form.addEventListener('submit', async (event) => {
+        const input = form.querySelector('input[type="file"][name="file"]')
+        const blockType = form.querySelector('[name="block_type"]')
+        const expectedType = blockType && EXPECTED_TYPES[blockType.value]
+        // Las validaciones previas del formulario pueden haber cancelado el envío
+        if (event.defaultPrevented || !input || !input.files.length || !expectedType) return
+
+        event.preventDefault()
+        const status = form.querySelector('[data-upload-status]')
+        const buttons = form.querySelectorAll('button[type="submit"]')
+        buttons.forEach((button) => { button.disabled = true })
+
+        try {
+          form.querySelector('[name="material_upload"]').value = await upload(
+            form, input.files[0], expectedType, status
+          )
+          input.value = ''
+          if (status) status.textContent = 'Archivo subido. Guardando…'
+          form.submit()
+        } catch (error) {
+          if (status) status.textContent = `Error en la subida: ${error.message}`
+          buttons.forEach((button) => { button.disabled = false })
+        }
+      })
+    })
+  })
+})()
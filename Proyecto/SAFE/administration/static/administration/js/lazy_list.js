@@ -0,0 +1,40 @@
+// Carga incremental de las pestañas del panel: cada elemento .lazy-sentinel
+// apunta a la siguiente página y se reemplaza por sus filas al hacerse visible.
+(function () {
+  function loadNext(sentinel, observer) {
+    observer.unobserve(sentinel);
+    const url = new URL(sentinel.dataset.nextPage, window.location.href);
+    url.searchParams.set('partial', '1');
+
+    fetch(url, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+      .then((response) => {
+        if (!response.ok) throw new Error(response.statusText);
+        return response.text();
+      })
+      .then((html) => {
+        // <template> admite filas de tabla sin un <tbody> envolvente
+        const template = document.createElement('template');
+        template.innerHTML = html.trim();
+        const nextSentinels = Array.from(template.content.querySelectorAll('.lazy-sentinel'));
+        sentinel.replaceWith(template.content);
+        nextSentinels.forEach((next) => observer.observe(next));
+      })
+      .catch(() => {
+        // Si falla, queda el enlace "Cargar más" como alternativa
+      });
+  }
+
+  document.addEventListener('DOMContentLoaded', () => {
+    if (!('IntersectionObserver' in window)) return;
+
+    const observer = new IntersectionObserver(
+      (entries) => {
+        entries.forEach((entry) => {
+          if (entry.isIntersecting) loadNext(entry.target, observer);
+        });
+      },
+      { rootMargin: '200px' }
+    );
+    document.querySelectorAll('.lazy-sentinel').forEach((sentinel) => observer.observe(sentinel));
+  });
+})();
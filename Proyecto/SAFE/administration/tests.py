@@ -1,14 +1,26 @@
+import io
+import json
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock
-from courses.models import Material, Content, Course
+from courses.models import Material, Content, Course, Exam, Module
 from administration.forms import CourseForm, ContentForm
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.messages import get_messages
 from django.core.files.uploadedfile import SimpleUploadedFile
 from .forms import ExamUploadForm
 from accounts.models import AppUser
-from administration.models import RoleChangeLog
+from administration.file_cleanup import delete_files
+from administration.models import ChunkedUpload, RoleChangeLog
+from administration.uploads import UploadConflict, append_chunk, part_path
+from learning_paths.models import CourseInPath, LearningPath
+from teams.models import Team, TeamUser
 from django.contrib.auth import get_user_model
-from .services import change_role
+from .services import change_role, keyset_paginate
 User = get_user_model()
 
 
@@ -461,3 +473,404 @@ class ChangeRoleServiceTests(TestCase):
         self.assertEqual(log_entry.target_user, self.collaborator)
         self.assertEqual(log_entry.old_role, AppUser.UserRole.COLABORADOR)
         self.assertEqual(log_entry.new_role, AppUser.UserRole.SUPERVISOR)
+
+
+class ReorderEndpointTests(TestCase):
+    def setUp(self):
+        self.analyst = User.objects.create_user(
+            username="reorder-analyst",
+            email="reorder-analyst@example.com",
+            password="password123",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        self.collaborator = User.objects.create_user(
+            username="reorder-collab",
+            email="reorder-collab@example.com",
+            password="password123",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        self.course = Course.objects.create(name="Reorder")
+        self.modules = [
+            Module.objects.create(course=self.course, name=f"M{i}") for i in range(3)
+        ]
+        self.url = reverse("module_reorder", args=[self.course.pk])
+
+    def _post(self, payload):
+        return self.client.post(
+            self.url, data=json.dumps(payload), content_type="application/json"
+        )
+
+    def test_analyst_reorders_modules(self):
+        self.client.force_login(self.analyst)
+        new_order = [m.pk for m in reversed(self.modules)]
+
+        response = self._post({"order": new_order})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["order"], new_order)
+        self.assertEqual(
+            list(self.course.modules.order_by("order").values_list("pk", flat=True)),
+            new_order,
+        )
+
+    def test_incomplete_order_is_rejected(self):
+        self.client.force_login(self.analyst)
+
+        response = self._post({"order": [self.modules[0].pk]})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_analyst_is_forbidden(self):
+        self.client.force_login(self.collaborator)
+
+        response = self._post({"order": [m.pk for m in self.modules]})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_course_detail_wires_content_reordering(self):
+        self.client.force_login(self.analyst)
+        module = self.modules[0]
+        contents = [
+            Content.objects.create(module=module, title=f"C{i}", order=i + 1)
+            for i in range(2)
+        ]
+
+        page = self.client.get(
+            reverse("course_detail", args=[self.course.pk]), {"module": module.pk}
+        )
+        self.assertContains(
+            page, f'data-reorder-url="{reverse("content_reorder", args=[module.pk])}"'
+        )
+        self.assertContains(page, f'data-reorder-id="{contents[1].pk}"')
+
+        response = self.client.post(
+            reverse("content_reorder", args=[module.pk]),
+            data=json.dumps({"order": [contents[1].pk, contents[0].pk]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["order"], [contents[1].pk, contents[0].pk])
+
+
+class AdminPanelPaginationTests(TestCase):
+    def setUp(self):
+        self.analyst = User.objects.create_user(
+            username="panel-analyst",
+            email="panel-analyst@example.com",
+            password="password123",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        self.courses = [Course.objects.create(name=f"Curso {i}") for i in range(5)]
+        self.client.force_login(self.analyst)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            page = keyset_paginate(
+                Course.objects.all(),
+                cursor,
+                page_size=2,
+                order_field="created_at",
+                descending=True,
+            )
+            seen.extend(course.pk for course in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        self.assertEqual(sorted(seen), sorted(c.pk for c in self.courses))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page = keyset_paginate(Course.objects.all(), "basura|x", page_size=2)
+
+        self.assertEqual([c.pk for c in page.items], [c.pk for c in self.courses[:2]])
+
+    def test_partial_request_renders_only_the_tab_rows(self):
+        response = self.client.get(
+            reverse("admin_panel"), {"tab": "cursos", "partial": "1"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "administration/includes/admin_course_cards.html")
+        self.assertTemplateNotUsed(response, "administration/admin_panel.html")
+        self.assertContains(response, "Curso 4")
+
+    def test_every_tab_renders(self):
+        for tab in ("usuarios", "cursos", "rutas", "equipos"):
+            with self.subTest(tab=tab):
+                response = self.client.get(reverse("admin_panel"), {"tab": tab})
+                self.assertEqual(response.status_code, 200)
+
+    def _count_tab_queries(self, tab):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin_panel"), {"tab": tab})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def _add_rows(self, index):
+        course = Course.objects.create(name=f"Extra {index}")
+        Module.objects.create(course=course, name="M")
+        path = LearningPath.objects.create(name=f"Ruta {index}")
+        CourseInPath.objects.create(learning_path=path, course=course)
+        member = User.objects.create_user(
+            username=f"member-{index}",
+            email=f"member-{index}@example.com",
+            password="password123",
+        )
+        team = Team.objects.create(name=f"Equipo {index}", supervisor=self.analyst)
+        TeamUser.objects.create(team=team, app_user=member)
+
+    def test_tab_queries_do_not_grow_with_rows(self):
+        self._add_rows(0)
+        tabs = ("usuarios", "cursos", "rutas", "equipos")
+        baseline = {tab: self._count_tab_queries(tab) for tab in tabs}
+
+        for index in range(1, 4):
+            self._add_rows(index)
+
+        for tab in tabs:
+            with self.subTest(tab=tab):
+                self.assertEqual(self._count_tab_queries(tab), baseline[tab])
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(media.name, "media"),
+            MATERIAL_UPLOAD_DIR=os.path.join(media.name, "uploads"),
+            MATERIAL_UPLOAD_CHUNK_SIZE=8,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.analyst = User.objects.create_user(
+            username="upload-analyst",
+            email="upload-analyst@example.com",
+            password="password123",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        self.client.force_login(self.analyst)
+        self.module = Module.objects.create(
+            course=Course.objects.create(name="Videos"), name="Módulo"
+        )
+
+    def _start(self, filename, size, expected_type="mp4"):
+        return self.client.post(
+            reverse("material_upload_create"),
+            data=json.dumps(
+                {"filename": filename, "size": size, "expected_type": expected_type}
+            ),
+            content_type="application/json",
+        )
+
+    def _patch(self, url, offset, data):
+        return self.client.generic(
+            "PATCH",
+            url,
+            data=data,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_extension_is_validated_like_material_form(self):
+        response = self._start("clase.avi", 10)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["error"],
+            "El archivo debe ser de tipo MP4. Has seleccionado un archivo AVI.",
+        )
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_interrupted_upload_resumes_and_attaches_material(self):
+        started = self._start("clase.mp4", 12)
+        self.assertEqual(started.status_code, 201)
+        url = started["Location"]
+        upload = ChunkedUpload.objects.get()
+
+        # La conexión se corta tras 5 de los 8 bytes del fragmento
+        append_chunk(upload.pk, 0, io.BytesIO(b"01234"), 8)
+        self.assertEqual(self.client.head(url)["Upload-Offset"], "5")
+        self.assertEqual(self._patch(url, 0, b"01234567").status_code, 409)
+        self.assertEqual(self._patch(url, 5, b"5678901234").status_code, 413)
+
+        self.assertEqual(self._patch(url, 5, b"567").status_code, 200)
+        finished = self._patch(url, 8, b"89ab")
+
+        self.assertEqual(finished.status_code, 200)
+        self.assertTrue(finished.json()["complete"])
+        upload.refresh_from_db()
+        self.assertEqual(upload.chunks_received, 3)
+        self.assertEqual(upload.material.type, Material.MaterialType.MP4)
+        with upload.material.file.open("rb") as stored:
+            self.assertEqual(stored.read(), b"0123456789ab")
+        self.assertFalse(os.path.exists(part_path(upload)))
+
+        response = self.client.post(
+            reverse("content_create", args=[self.module.pk]),
+            {
+                "title": "Clase 1",
+                "block_type": Content.BlockType.VIDEO,
+                "material_upload": str(upload.pk),
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        content = Content.objects.get(module=self.module)
+        self.assertEqual(content.material_id, upload.material_id)
+
+    def test_chunk_is_read_without_holding_the_row_lock(self):
+        self._start("clase.mp4", 8)
+        upload = ChunkedUpload.objects.get()
+        test_case = self
+        savepoints = list(connection.savepoint_ids)
+
+        class SlowClient(io.BytesIO):
+            def read(self, size=-1):
+                # Mientras llegan los bytes el desplazamiento está reservado,
+                # sin transacción abierta: otra petición recibe 409
+                test_case.assertEqual(connection.savepoint_ids, savepoints)
+                with test_case.assertRaises(UploadConflict):
+                    append_chunk(upload.pk, 0, io.BytesIO(b"x"), 1)
+                return super().read(size)
+
+        upload = append_chunk(upload.pk, 0, SlowClient(b"01234567"), 8)
+
+        self.assertTrue(upload.is_complete)
+        self.assertIsNone(upload.write_started_at)
+
+    def test_unfinished_upload_cannot_be_attached(self):
+        self._start("clase.mp4", 12)
+        upload = ChunkedUpload.objects.get()
+
+        self.client.post(
+            reverse("content_create", args=[self.module.pk]),
+            {
+                "title": "Clase 1",
+                "block_type": Content.BlockType.VIDEO,
+                "material_upload": str(upload.pk),
+            },
+        )
+
+        self.assertFalse(Content.objects.filter(module=self.module).exists())
+
+
+@override_settings(FILE_CLEANUP_ASYNC=False)
+class FileCleanupTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _material(self, name, data=b"pdf"):
+        material = Material(type=Material.MaterialType.PDF)
+        material.file = SimpleUploadedFile(name, data)
+        material.save()
+        return material
+
+    def test_replaced_file_is_deleted_after_commit_without_requery(self):
+        material = Material.objects.get(pk=self._material("guia.pdf").pk)
+        old_path = material.file.path
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            material.file = SimpleUploadedFile("guia_v2.pdf", b"v2")
+            # Solo el UPDATE: el archivo anterior sale del estado cargado
+            with self.assertNumQueries(1):
+                material.save()
+
+        self.assertTrue(os.path.exists(old_path))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(material.file.path))
+
+    def test_file_still_referenced_by_another_row_is_kept(self):
+        material = self._material("compartido.pdf")
+        Material.objects.create(type=Material.MaterialType.PDF, file=material.file.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            material.delete()
+
+        self.assertTrue(os.path.exists(material.file.path))
+
+    def test_batch_skips_referenced_names(self):
+        kept = self._material("uno.pdf")
+        orphan = self._material("dos.pdf")
+        Material.objects.filter(pk=orphan.pk).update(file="")
+
+        deleted = delete_files(
+            [(kept.file.storage, kept.file.name), (orphan.file.storage, orphan.file.name)]
+        )
+
+        self.assertEqual(deleted, 1)
+        self.assertTrue(os.path.exists(kept.file.path))
+        self.assertFalse(os.path.exists(orphan.file.path))
+
+
+class ExamFileImportTests(TestCase):
+    def setUp(self):
+        analyst = User.objects.create_user(
+            username="exam-import",
+            email="exam-import@example.com",
+            password="password123",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        self.client.force_login(analyst)
+        self.course = Course.objects.create(name="Seguridad")
+        self.url = reverse("create_exam_for_course", args=[self.course.pk])
+
+    def _upload(self, content: bytes):
+        file = SimpleUploadedFile("preguntas.txt", content, content_type="text/plain")
+        # Fragmentos chicos: el archivo se procesa por partes
+        file.DEFAULT_CHUNK_SIZE = 16
+        return self.client.post(
+            self.url, {"title": "Examen", "difficulty": "media", "file": file}
+        )
+
+    def test_reports_every_line_error_without_creating_the_exam(self):
+        response = self._upload(
+            b"O:X|Suelta|1\n"
+            b"Q:P1|Bien|\n"
+            b"O:P1-A|Si|1\n"
+            b"Q:P2 sin separador\n"
+            b"O:P2-A|Ignorada|1\n"
+            b"Q:P3|Sin correcta\n"
+            b"O:P3-A|No|0\n"
+            b"cualquier cosa\n"
+        )
+
+        errors = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertEqual(
+            [error.split(":")[0] for error in errors],
+            ["Línea 1", "Línea 4", "Línea 6", "Línea 8"],
+        )
+        self.assertFalse(Exam.objects.exists())
+
+    def test_rejects_question_without_correct_option(self):
+        response = self._upload(b"Q:P1|Bien|\nO:P1-A|Si|1\n\nQ:P2|Sin correcta\nO:P2-A|No|0\n")
+
+        self.assertEqual(
+            [str(m) for m in get_messages(response.wsgi_request)],
+            ["Línea 4: La pregunta 'P2' no tiene opción correcta"],
+        )
+        self.assertFalse(Exam.objects.exists())
+
+    def test_imports_latin1_file_in_one_exam_write(self):
+        lines = []
+        for n in range(300):
+            lines += [f"Q:P{n}|¿Pregunta {n}?", f"O:P{n}-A|Sí|1", f"O:P{n}-B|No|0", ""]
+        with CaptureQueriesContext(connection) as queries:
+            self._upload("\n".join(lines).encode("latin-1"))
+
+        exam = Exam.objects.get()
+        self.assertEqual(exam.total_questions, 300)
+        self.assertEqual(exam.questions[0]["answers"][0]["text"], "Sí")
+        self.assertEqual(exam.questions[0]["type"], "single")
+        self.assertEqual(
+            sum(1 for q in queries if q["sql"].startswith('INSERT INTO "exam"')), 1
+        )
@@ -0,0 +1,198 @@
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from courses.models import Material
+from .forms import validate_material_filename
+from .models import ChunkedUpload
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+# Tras este tiempo se da por perdida la escritura de un fragmento (por ejemplo,
+# si el proceso murió) y otra petición puede retomar desde el mismo punto
+WRITE_LEASE = timedelta(minutes=15)
+
+
+class UploadConflict(Exception):
+    """The client's offset does not match what the server has stored."""
+
+
+class _AssembledFile(File):
+    """
+    Finished upload on local disk. ``temporary_file_path`` lets
+    FileSystemStorage move it into place instead of copying it.
+    """
+
+    def __init__(self, file, name, path):
+        super().__init__(file, name=name)
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def part_path(upload: ChunkedUpload) -> str:
+    return os.path.join(settings.MATERIAL_UPLOAD_DIR, f"{upload.pk}.part")
+
+
+def start_upload(user, filename: str, size: int, expected_type: str) -> ChunkedUpload:
+    """
+    Validate an upload announced by the client and reserve its part file.
+
+    Raises ``ValidationError`` with the same messages MaterialForm shows when
+    the extension does not match ``expected_type`` or the size is not allowed.
+    """
+    filename = os.path.basename(filename or "").strip()
+    if expected_type not in Material.MaterialType.values:
+        raise ValidationError("Tipo de material no válido.")
+    validate_material_filename(filename, expected_type)
+    if size <= 0:
+        raise ValidationError("El archivo está vacío.")
+    if size > settings.MATERIAL_UPLOAD_MAX_SIZE:
+        raise ValidationError("El archivo supera el tamaño máximo permitido.")
+
+    upload = ChunkedUpload.objects.create(
+        user=user, filename=filename, expected_type=expected_type, size=size
+    )
+    os.makedirs(settings.MATERIAL_UPLOAD_DIR, exist_ok=True)
+    open(part_path(upload), "wb").close()
+    return upload
+
+
+def _reserve_offset(upload_id, offset: int, length: int):
+    """Check ``offset`` under a short row lock and reserve it for one writer."""
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload_id)
+        now = timezone.now()
+        writing = (
+            upload.write_started_at is not None
+            and upload.write_started_at > now - WRITE_LEASE
+        )
+        if upload.is_complete or writing or offset != upload.offset:
+            raise UploadConflict(upload.offset)
+        if offset + length > upload.size:
+            raise ValidationError("El fragmento excede el tamaño anunciado.")
+        upload.write_started_at = now
+        upload.save(update_fields=["write_started_at"])
+    return upload
+
+
+def append_chunk(upload_id, offset: int, stream, length: int) -> ChunkedUpload:
+    """
+    Write ``length`` bytes read from ``stream`` at ``offset`` of the part file.
+
+    The offset is checked and reserved in a short transaction; the bytes are
+    then read from the client without holding a row lock or a transaction,
+    and the new offset is stored with a compare-and-set on the reservation.
+    If the connection drops mid-chunk the bytes already received are kept
+    and the client resumes from the new offset. The last chunk turns the
+    upload into a Material.
+    """
+    upload = _reserve_offset(upload_id, offset, length)
+    reservation = upload.write_started_at
+
+    received = 0
+    started = time.monotonic()
+    try:
+        with open(part_path(upload), "r+b") as part:
+            part.seek(offset)
+            try:
+                while received < length:
+                    data = stream.read(min(READ_SIZE, length - received))
+                    if not data:
+                        break
+                    part.write(data)
+                    received += len(data)
+            finally:
+                # Descarta restos de un intento anterior interrumpido
+                part.truncate()
+    finally:
+        stored = ChunkedUpload.objects.filter(
+            pk=upload.pk, offset=offset, write_started_at=reservation
+        ).update(
+            offset=offset + received,
+            chunks_received=F("chunks_received") + 1,
+            transfer_seconds=F("transfer_seconds") + (time.monotonic() - started),
+            write_started_at=None,
+        )
+    if not stored:
+        # La reserva venció y otra petición retomó la subida
+        upload.refresh_from_db()
+        raise UploadConflict(upload.offset)
+
+    upload.refresh_from_db()
+    if upload.offset == upload.size and not upload.is_complete:
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            if not upload.is_complete:
+                _attach_material(upload)
+                upload.save(update_fields=["material", "completed_at"])
+    return upload
+
+
+def _attach_material(upload: ChunkedUpload) -> None:
+    """Move the assembled file into a new Material (inside the caller's transaction)."""
+    path = part_path(upload)
+    material = Material(type=upload.expected_type)
+    with open(path, "rb") as assembled:
+        material.file = _AssembledFile(assembled, upload.filename, path)
+        try:
+            material.save()
+        except Exception:
+            # El archivo ya pudo haberse movido al almacenamiento
+            if material.file._committed:
+                material.file.delete(save=False)
+            raise
+
+    upload.material = material
+    upload.completed_at = timezone.now()
+    if os.path.exists(path):
+        # Almacenamientos que copian en lugar de mover
+        os.remove(path)
+
+    throughput = upload.throughput
+    logger.info(
+        "Subida %s completada: %d bytes en %d fragmentos, %.2f MB/s",
+        upload.pk,
+        upload.size,
+        upload.chunks_received,
+        (throughput or 0) / 1024**2,
+    )
+
+
+def cancel_upload(upload: ChunkedUpload) -> None:
+    if os.path.exists(part_path(upload)):
+        os.remove(part_path(upload))
+    upload.delete()
+
+
+def purge_expired_uploads(now=None) -> int:
+    """
+    Forget uploads older than ``MATERIAL_UPLOAD_EXPIRY_HOURS``. Unfinished
+    ones lose their part file and finished Materials never attached to a
+    content are deleted; returns how many uploads were discarded.
+    """
+    cutoff = (now or timezone.now()) - timedelta(
+        hours=settings.MATERIAL_UPLOAD_EXPIRY_HOURS
+    )
+    removed = 0
+    expired = ChunkedUpload.objects.filter(created_at__lt=cutoff).select_related(
+        "material"
+    )
+    for upload in expired.iterator():
+        material = upload.material
+        if material is None or not material.contents.exists():  # pyright: ignore[reportAttributeAccessIssue]
+            if material is not None:
+                material.delete()
+            removed += 1
+        cancel_upload(upload)
+    return removed
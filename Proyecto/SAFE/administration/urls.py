@@ -17,11 +17,27 @@ urlpatterns = [
         views.module_move,
         name="module_move",
     ),
+    path(
+        "course/<int:course_pk>/modules/reorder/",
+        views.module_reorder,
+        name="module_reorder",
+    ),
+    path(
+        "modules/<int:module_pk>/content/reorder/",
+        views.content_reorder,
+        name="content_reorder",
+    ),
     path(
         "modules/<int:module_pk>/content/create/",
         views.content_create,
         name="content_create",
     ),
+    path("uploads/", views.material_upload_create, name="material_upload_create"),
+    path(
+        "uploads/<uuid:upload_id>/",
+        views.material_upload_detail,
+        name="material_upload_detail",
+    ),
     path(
         "modules/content/<int:content_pk>/move/<str:direction>/",
         views.content_move,
@@ -49,6 +65,7 @@ urlpatterns = [
         views.path_remove_course,
         name="path_remove_course",
     ),
+    path("paths/<int:pk>/reorder/", views.path_reorder, name="path_reorder"),
     path(
         "paths/<int:pk>/move-up/<int:course_id>/",
         views.path_move_up,
@@ -1,9 +1,15 @@
+import json
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
-from django.http import HttpResponse
+from django.views.decorators.http import require_http_methods, require_POST
+from django.http import HttpResponse, JsonResponse
 from django.urls import reverse
 from django.db import transaction
+from django.db.models import Count, Prefetch
 from courses.models import Course, Module, Content, Exam
 from courses.services import (
     append_content_to_module,
@@ -12,11 +18,21 @@ from courses.services import (
     get_ordered_modules,
     move_content,
     move_module,
-    rebuild_content_chain,
-    rebuild_module_chain,
+    remove_content,
+    remove_module,
+    set_content_order,
+    set_module_order,
+)
+from administration.models import ChunkedUpload
+from administration.services import change_role, keyset_paginate
+from administration.uploads import (
+    UploadConflict,
+    append_chunk,
+    cancel_upload,
+    start_upload,
 )
-from administration.services import change_role
 from learning_paths.models import LearningPath, CourseInPath
+from learning_paths.services import set_path_course_order
 from accounts.models import AppUser
 from django.contrib import messages
 from .forms import (
@@ -27,50 +43,90 @@ from .forms import (
     LearningPathForm,
     ExamUploadForm,
 )
-from courses.views import parse_evaluacion
+from courses.exam_import import (
+    MAX_REPORTED_ERRORS,
+    ExamImportError,
+    format_error,
+    parse_exam_file,
+)
 from teams.models import Team, TeamUser
 
 
-@login_required
-def admin_panel(request):
-    if request.user.role != "analistaTH":
-        return HttpResponse("No tienes permisos", status=403)
+# Plantilla parcial con las filas de cada pestaña (carga incremental)
+ADMIN_TAB_ROWS = {
+    "usuarios": "administration/includes/admin_user_rows.html",
+    "cursos": "administration/includes/admin_course_cards.html",
+    "rutas": "administration/includes/admin_path_cards.html",
+    "equipos": "administration/includes/admin_team_rows.html",
+}
 
-    active_tab = request.GET.get("tab", "cursos")
 
-    courses = Course.objects.all().order_by("-created_at")
-    selected_course = None
-    selected_module = None
+def _admin_tab_page(active_tab, cursor):
+    """Consulta solo la pestaña activa, una página a la vez."""
+    if active_tab == "usuarios":
+        return keyset_paginate(AppUser.objects.all(), cursor)
 
-    course_id = request.GET.get("course")
-    if course_id:
-        selected_course = get_object_or_404(Course, id=course_id)
+    if active_tab == "cursos":
+        # modules_count está desnormalizado en Course: sin COUNT por fila
+        return keyset_paginate(
+            Course.objects.all(), cursor, order_field="created_at", descending=True
+        )
 
-        module_id = request.GET.get("module")
-        if module_id:
-            selected_module = get_object_or_404(
-                Module, id=module_id, course=selected_course
-            )
+    if active_tab == "rutas":
+        return keyset_paginate(
+            LearningPath.objects.annotate(courses_total=Count("courses")),
+            cursor,
+            order_field="created_at",
+            descending=True,
+        )
 
-    learning_paths = LearningPath.objects.all().order_by("-created_at")
+    if active_tab == "equipos":
+        return keyset_paginate(
+            Team.objects.select_related("supervisor")
+            .annotate(members_total=Count("members"))
+            .prefetch_related(
+                Prefetch(
+                    "members",
+                    queryset=TeamUser.objects.select_related("app_user").order_by("id"),
+                )
+            ),
+            cursor,
+        )
 
-    usuarios = AppUser.objects.all().order_by("id")
+    return None
 
-    # Equipos
-    teams = Team.objects.all().select_related("supervisor").prefetch_related("members")
-    supervisors = AppUser.objects.filter(role="supervisor")
+
+@login_required
+def admin_panel(request):
+    if request.user.role != "analistaTH":
+        return HttpResponse("No tienes permisos", status=403)
+
+    active_tab = request.GET.get("tab", "cursos")
+    page = _admin_tab_page(active_tab, request.GET.get("cursor"))
+
+    next_page_url = None
+    if page and page.next_cursor:
+        next_page_url = "?" + urlencode({"tab": active_tab, "cursor": page.next_cursor})
 
     context = {
         "active_tab": active_tab,
-        "courses": courses,
-        "selected_course": selected_course,
-        "selected_module": selected_module,
-        "learning_paths": learning_paths,
-        "usuarios": usuarios,
+        "items": page.items if page else [],
+        "next_page_url": next_page_url,
         "role_choices": AppUser.UserRole.choices,
-        "teams": teams,
-        "supervisors": supervisors,
     }
+
+    if request.GET.get("partial") and active_tab in ADMIN_TAB_ROWS:
+        return render(request, ADMIN_TAB_ROWS[active_tab], context)
+
+    if active_tab == "usuarios":
+        context["enroll_courses"] = Course.objects.filter(
+            status=Course.CourseStatus.ACTIVE
+        ).only("id", "name")
+    elif active_tab == "equipos":
+        context["supervisors"] = AppUser.objects.filter(role="supervisor").only(
+            "id", "first_name", "last_name"
+        )
+
     return render(request, "administration/admin_panel.html", context)
 
 
@@ -254,9 +310,7 @@ def module_delete(request, pk):
     module = get_object_or_404(Module, pk=pk)
     course = module.course
 
-    with transaction.atomic():
-        module.delete()
-        rebuild_module_chain(course)
+    remove_module(module)
     messages.success(request, "Módulo eliminado")
     return redirect("course_detail", pk=course.pk)
 
@@ -281,9 +335,169 @@ def module_move(request, pk, direction):
     )
 
 
+def _reorder_json(request, apply_order):
+    """
+    Aplica el orden completo recibido como JSON ({"order": [ids...]}) y
+    devuelve el orden resultante sin redirigir.
+    """
+    if request.user.role != AppUser.UserRole.ANALISTA_TH:
+        return JsonResponse({"error": "No tienes permisos"}, status=403)
+
+    try:
+        order = json.loads(request.body or b"{}").get("order")
+    except (ValueError, AttributeError):
+        order = None
+    if not isinstance(order, list):
+        return JsonResponse({"error": "Se esperaba una lista 'order'."}, status=400)
+
+    try:
+        ordered_ids = apply_order(order)
+    except (TypeError, ValueError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse({"order": ordered_ids})
+
+
+@login_required
+@require_POST
+def module_reorder(request, course_pk):
+    course = get_object_or_404(Course, pk=course_pk)
+    return _reorder_json(
+        request, lambda ids: [m.pk for m in set_module_order(course, ids)]
+    )
+
+
+@login_required
+@require_POST
+def content_reorder(request, module_pk):
+    module = get_object_or_404(Module, pk=module_pk)
+    return _reorder_json(
+        request, lambda ids: [c.pk for c in set_content_order(module, ids)]
+    )
+
+
+@login_required
+@require_POST
+def path_reorder(request, pk):
+    learning_path = get_object_or_404(LearningPath, pk=pk)
+    return _reorder_json(
+        request,
+        lambda ids: [
+            cip.course_id  # pyright: ignore[reportAttributeAccessIssue]
+            for cip in set_path_course_order(learning_path, ids)
+        ],
+    )
+
+
 # vista de contenido
 
 
+def _material_from_upload(request, expected_type):
+    """
+    Material de una subida por fragmentos terminada (campo ``material_upload``),
+    o None si el formulario trae el archivo de forma tradicional.
+    """
+    upload_id = request.POST.get("material_upload")
+    if not upload_id:
+        return None
+
+    try:
+        upload = (
+            ChunkedUpload.objects.select_related("material")
+            .filter(pk=upload_id, user=request.user, material__isnull=False)
+            .first()
+        )
+    except ValidationError:
+        upload = None
+    if upload is None or upload.expected_type != expected_type:
+        raise ValidationError(
+            "La subida no está completa o no corresponde al tipo de bloque."
+        )
+    return upload.material
+
+
+def _upload_response(upload, status=200):
+    response = JsonResponse(
+        {
+            "id": str(upload.pk),
+            "url": reverse("material_upload_detail", args=[upload.pk]),
+            "offset": upload.offset,
+            "size": upload.size,
+            "chunk_size": settings.MATERIAL_UPLOAD_CHUNK_SIZE,
+            "complete": upload.is_complete,
+            "chunks_received": upload.chunks_received,
+            "throughput": upload.throughput,
+        },
+        status=status,
+    )
+    # Cabeceras al estilo tus para reanudar con HEAD
+    response["Upload-Offset"] = str(upload.offset)
+    response["Upload-Length"] = str(upload.size)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@login_required
+@require_POST
+def material_upload_create(request):
+    """Anuncia una subida por fragmentos: JSON con filename, size y expected_type."""
+    if request.user.role != AppUser.UserRole.ANALISTA_TH:
+        return JsonResponse({"error": "No tienes permisos"}, status=403)
+
+    try:
+        payload = json.loads(request.body or b"{}")
+        size = int(payload.get("size"))
+    except (TypeError, ValueError, AttributeError):
+        return JsonResponse({"error": "Solicitud inválida."}, status=400)
+
+    try:
+        upload = start_upload(
+            request.user,
+            str(payload.get("filename", "")),
+            size,
+            str(payload.get("expected_type", "")),
+        )
+    except ValidationError as error:
+        return JsonResponse({"error": error.messages[0]}, status=400)
+
+    response = _upload_response(upload, status=201)
+    response["Location"] = reverse("material_upload_detail", args=[upload.pk])
+    return response
+
+
+@login_required
+@require_http_methods(["GET", "HEAD", "PATCH", "DELETE"])
+def material_upload_detail(request, upload_id):
+    """
+    Estado (GET/HEAD), siguiente fragmento (PATCH con cabecera Upload-Offset
+    y el contenido crudo en el cuerpo) o cancelación (DELETE) de una subida.
+    """
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+    if request.method == "DELETE":
+        cancel_upload(upload)
+        return HttpResponse(status=204)
+
+    if request.method == "PATCH":
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (KeyError, ValueError):
+            return JsonResponse({"error": "Falta la cabecera Upload-Offset."}, status=400)
+        if length > settings.MATERIAL_UPLOAD_CHUNK_SIZE:
+            return JsonResponse({"error": "Fragmento demasiado grande."}, status=413)
+
+        try:
+            upload = append_chunk(upload.pk, offset, request, length)
+        except UploadConflict:
+            upload.refresh_from_db()
+            return _upload_response(upload, status=409)
+        except ValidationError as error:
+            return JsonResponse({"error": error.messages[0]}, status=400)
+
+    return _upload_response(upload)
+
+
 @login_required
 @require_POST
 def content_create(request, module_pk):
@@ -351,7 +565,15 @@ def content_create(request, module_pk):
             Content.BlockType.VIDEO,
             Content.BlockType.PDF,
         ):
-            if material_form.is_valid() and material_form.cleaned_data.get("file"):
+            try:
+                uploaded_material = _material_from_upload(request, expected_type)
+            except ValidationError as error:
+                messages.error(request, f"Archivo: {error.messages[0]}")
+                return redirect(redirect_url)
+
+            if uploaded_material:
+                content.material = uploaded_material
+            elif material_form.is_valid() and material_form.cleaned_data.get("file"):
                 material = material_form.save(commit=False)
                 # Asignar tipo automáticamente según block_type
                 if block_type == Content.BlockType.IMAGE:
@@ -426,6 +648,7 @@ def content_update(request, content_pk):
     )
 
     material_checked = False
+    replaced_material = None
 
     if content_form.is_valid():
         updated_content = content_form.save(commit=False)
@@ -464,7 +687,19 @@ def content_update(request, content_pk):
             Content.BlockType.PDF,
         ):
             material_checked = True
-            if material_form.is_valid():
+            try:
+                uploaded_material = _material_from_upload(request, expected_type)
+            except ValidationError as error:
+                uploaded_material = None
+                material_form.is_valid()
+                material_form.add_error("file", error)
+
+            if uploaded_material:
+                # El material anterior se borra tras guardar si queda huérfano
+                replaced_material = content.material
+                updated_content.material = uploaded_material
+                updated_content.exam = None
+            elif material_form.is_valid():
                 existing_file = material_form.cleaned_data.get("file") or (
                     material_form.instance and material_form.instance.file
                 )
@@ -493,6 +728,8 @@ def content_update(request, content_pk):
         # Solo guardar si no hay errores en el material form cuando se verificó
         if not material_checked or not material_form.errors:
             updated_content.save()
+            if replaced_material and not replaced_material.contents.exists():  # pyright: ignore[reportAttributeAccessIssue]
+                replaced_material.delete()
             messages.success(request, "Contenido actualizado.")
     else:
         for field, field_errors in content_form.errors.items():
@@ -542,9 +779,7 @@ def content_delete(request, content_pk):
     module = content.module
     course = module.course
 
-    with transaction.atomic():
-        content.delete()
-        rebuild_content_chain(module)
+    remove_content(content)
 
     messages.success(request, "Contenido eliminado.")
     return redirect(
@@ -846,6 +1081,20 @@ def user_delete(request, pk):
 # administration/views.py
 
 
+def _get_or_append_exam_module(course):
+    """Devuelve el módulo "Examen" del curso, creándolo al final si no existe."""
+    exam_module = Module.objects.filter(course=course, name="Examen").first()
+    if exam_module is None:
+        exam_module = append_module_to_course(
+            course,
+            Module(
+                name="Examen",
+                description="Módulo dedicado a las evaluaciones del curso.",
+            ),
+        )
+    return exam_module
+
+
 @login_required
 @require_POST
 def create_exam_for_course(request, course_pk):
@@ -856,14 +1105,7 @@ def create_exam_for_course(request, course_pk):
     course = get_object_or_404(Course, pk=course_pk)
 
     # 1.Buscar o Crear el módulo "Examen"
-    exam_module, created = Module.objects.get_or_create(
-        course=course,
-        name="Examen",
-        defaults={
-            "description": "Módulo dedicado a las evaluaciones del curso.",
-            # Si tienes un campo 'order' o 'duration', puedes poner defaults aquí
-        },
-    )
+    exam_module = _get_or_append_exam_module(course)
 
     if exam_module.contents.filter(content_type=Content.ContentType.EXAM).exists():
         messages.error(request, "Ya existe un examen para este curso.")
@@ -880,58 +1122,40 @@ def create_exam_for_course(request, course_pk):
             messages.error(request, "Error: El archivo debe ser tipo .txt")
             return redirect("course_detail", pk=course.pk)
 
+        # 3. Parsear el archivo por líneas a medida que se lee; se informan
+        # todos los errores de formato juntos
         try:
-            # 3. Leer y parsear el archivo de preguntas
-            raw_content = uploaded_file.read()
-            try:
-                text_content = raw_content.decode("utf-8")
-            except UnicodeDecodeError:
-                text_content = raw_content.decode("latin-1")
-
-            parsed_questions = parse_evaluacion(text_content)
-
-            # Adaptar al formato que usa el frontend (questions/answers)
-            questions = []
-            for pregunta in parsed_questions:
-                opciones = pregunta.get("opciones", [])
-                correctas = sum(1 for o in opciones if o.get("es_correcta"))
-                q_type = "single" if correctas <= 1 else "multiple"
-
-                answers = [
-                    {
-                        "id": opcion.get("id"),
-                        "text": opcion.get("texto"),
-                        "is_correct": opcion.get("es_correcta"),
-                    }
-                    for opcion in opciones
-                ]
-
-                questions.append(
-                    {
-                        "id": pregunta.get("id"),
-                        "text": pregunta.get("texto"),
-                        "type": q_type,
-                        "answers": answers,
-                    }
+            questions = parse_exam_file(uploaded_file)
+        except ExamImportError as e:
+            for error in e.errors[:MAX_REPORTED_ERRORS]:
+                messages.error(request, format_error(error))
+            if len(e.errors) > MAX_REPORTED_ERRORS:
+                messages.error(
+                    request,
+                    f"… y {len(e.errors) - MAX_REPORTED_ERRORS} error(es) más.",
                 )
+            return redirect("course_detail", pk=course.pk)
 
-            # 4. Crear objeto Exam
-            exam = Exam.objects.create(
-                questions=questions,
-                total_questions=len(questions),
-                # difficulty=difficulty  <-- Si tu modelo Exam tiene este campo
-            )
+        try:
+            with transaction.atomic():
+                # 4. Crear objeto Exam (una sola escritura)
+                exam = Exam.objects.create(
+                    questions=questions,
+                    total_questions=len(questions),
+                    # difficulty=difficulty  <-- Si tu modelo Exam tiene este campo
+                )
 
-            # 5. Crear Content tipo QUIZ/EXAM en el módulo
-            Content.objects.create(
-                module=exam_module,
-                title=title,
-                description=f"Examen generado desde {uploaded_file.name}",
-                block_type=Content.BlockType.QUIZ,
-                content_type=Content.ContentType.EXAM,
-                exam=exam,
-                order=exam_module.contents.count() + 1,
-            )
+                # 5. Crear Content tipo QUIZ/EXAM en el módulo
+                append_content_to_module(
+                    exam_module,
+                    Content(
+                        title=title,
+                        description=f"Examen generado desde {uploaded_file.name}",
+                        block_type=Content.BlockType.QUIZ,
+                        content_type=Content.ContentType.EXAM,
+                        exam=exam,
+                    ),
+                )
 
             messages.success(request, "Examen creado exitosamente desde archivo.")
 
@@ -953,13 +1177,7 @@ def create_exam_manual(request, course_pk):
     course = get_object_or_404(Course, pk=course_pk)
 
     # 1. Buscar o Crear el módulo "Examen"
-    exam_module, created = Module.objects.get_or_create(
-        course=course,
-        name="Examen",
-        defaults={
-            "description": "Módulo dedicado a las evaluaciones del curso.",
-        },
-    )
+    exam_module = _get_or_append_exam_module(course)
 
     if exam_module.contents.filter(content_type=Content.ContentType.EXAM).exists():
         messages.error(request, "Ya existe un examen para este curso.")
@@ -987,15 +1205,16 @@ def create_exam_manual(request, course_pk):
     exam = Exam.objects.create(questions=questions, total_questions=len(questions))
 
     # Create Content object
-    Content.objects.create(
-        module=exam_module,
-        title=title,
-        description=description or "",
-        block_type=Content.BlockType.QUIZ,
-        content_type=Content.ContentType.EXAM,
-        is_mandatory=is_mandatory,
-        exam=exam,
-        order=exam_module.contents.count() + 1,
+    append_content_to_module(
+        exam_module,
+        Content(
+            title=title,
+            description=description or "",
+            block_type=Content.BlockType.QUIZ,
+            content_type=Content.ContentType.EXAM,
+            is_mandatory=is_mandatory,
+            exam=exam,
+        ),
     )
 
     messages.success(request, "Examen creado exitosamente.")
@@ -1069,7 +1288,12 @@ def team_add_member(request, pk):
 
     team = get_object_or_404(Team, pk=pk)
     user_id = request.POST.get("user_id")
-    user = get_object_or_404(AppUser, pk=user_id)
+    if user_id:
+        user = get_object_or_404(AppUser, pk=user_id)
+    else:
+        user = get_object_or_404(
+            AppUser, username=request.POST.get("username", "").strip()
+        )
 
     if TeamUser.objects.filter(team=team, app_user=user).exists():
         messages.warning(request, "El usuario ya es miembro del equipo.")
@@ -91,6 +91,30 @@ DATABASES = {
 }
 
 
+# Caché compartida por todos los workers (gunicorn/uWSGI): el estado de
+# desbloqueo de módulos y las versiones de estructura de los cursos se
+# invalidan para todos los procesos, no solo para el que atendió la escritura.
+# Con CACHE_REDIS_URL usa Redis (servicio ``cache`` de docker-compose). Sin
+# ella cae a la base de datos (tabla creada con ``manage.py createcachetable``):
+# cada lectura de la caché es un SELECT sobre django_cache y cada escritura
+# suma un COUNT de purga y un INSERT/UPDATE, así que solo conviene fuera de
+# docker-compose.
+if os.getenv("CACHE_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -144,6 +168,71 @@ STATICFILES_FINDERS = [
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Materiales de cursos protegidos: la vista verifica el acceso y delega la
+# transferencia al proxy. PROTECTED_MEDIA_SERVER="nginx" usa X-Accel-Redirect
+# hacia la location interna PROTECTED_MEDIA_INTERNAL_URL (alias de MEDIA_ROOT);
+# "apache" usa X-Sendfile con la ruta absoluta. Vacío: Django transmite el
+# archivo por rangos.
+PROTECTED_MEDIA_SERVER = os.getenv("PROTECTED_MEDIA_SERVER", "").lower()
+PROTECTED_MEDIA_INTERNAL_URL = os.getenv(
+    "PROTECTED_MEDIA_INTERNAL_URL", "/protected-media/"
+)
+
+# Miniaturas de portadas e imágenes (courses.thumbnails): se generan tras el
+# commit en un hilo en segundo plano. THUMBNAILS_ASYNC=False las genera en la
+# misma petición (útil en pruebas o scripts).
+THUMBNAILS_ASYNC = os.getenv("THUMBNAILS_ASYNC", "True") == "True"
+
+# Archivos de materiales y portadas reemplazados o eliminados: se borran tras
+# el commit, en lotes, desde un hilo en segundo plano (administration.file_cleanup).
+FILE_CLEANUP_ASYNC = os.getenv("FILE_CLEANUP_ASYNC", "True") == "True"
+
+# Subida de materiales por fragmentos (administration.uploads): los fragmentos
+# se ensamblan en MATERIAL_UPLOAD_DIR y el archivo terminado se mueve al
+# almacenamiento de medios. Conviene que ambos estén en el mismo disco para que
+# el movimiento sea un simple rename.
+MATERIAL_UPLOAD_DIR = os.getenv(
+    "MATERIAL_UPLOAD_DIR", str(BASE_DIR / "private_media" / "uploads")
+)
+MATERIAL_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MATERIAL_UPLOAD_MAX_SIZE = int(os.getenv("MATERIAL_UPLOAD_MAX_SIZE", str(4 * 1024**3)))
+MATERIAL_UPLOAD_EXPIRY_HOURS = 24
+
+# Entregas de tareas: por defecto en disco, fuera de MEDIA_ROOT (no se sirven
+# como archivos públicos). Con SUBMISSION_STORAGE_BACKEND=storages.backends.s3.S3Storage
+# (paquete django-storages) se guardan en un bucket compatible con S3;
+# SUBMISSION_S3_ENDPOINT_URL permite usar un servicio local como MinIO.
+SUBMISSION_STORAGE_BACKEND = os.getenv(
+    "SUBMISSION_STORAGE_BACKEND", "django.core.files.storage.FileSystemStorage"
+)
+if SUBMISSION_STORAGE_BACKEND.endswith("S3Storage"):
+    SUBMISSION_STORAGE_OPTIONS = {
+        "bucket_name": os.getenv("SUBMISSION_S3_BUCKET", "safe-submissions"),
+        "endpoint_url": os.getenv("SUBMISSION_S3_ENDPOINT_URL") or None,
+        "access_key": os.getenv("SUBMISSION_S3_ACCESS_KEY"),
+        "secret_key": os.getenv("SUBMISSION_S3_SECRET_KEY"),
+        "default_acl": "private",
+        "querystring_auth": True,
+    }
+else:
+    SUBMISSION_STORAGE_OPTIONS = {
+        "location": os.getenv(
+            "SUBMISSION_STORAGE_ROOT", str(BASE_DIR / "private_media" / "submissions")
+        ),
+        "base_url": None,
+    }
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+    "submissions": {
+        "BACKEND": SUBMISSION_STORAGE_BACKEND,
+        "OPTIONS": SUBMISSION_STORAGE_OPTIONS,
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,40 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name: str) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = _executors[name] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=name
+            )
+        return executor
+
+
+def _run(name: str, func: Callable, args: tuple) -> None:
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Error en la tarea en segundo plano %s %r", name, args)
+    finally:
+        # Cada hilo abre su propia conexión; no dejarla colgada
+        connections.close_all()
+
+
+def run_in_background(name: str, func: Callable, *args) -> None:
+    """
+    Run ``func(*args)`` on the single worker thread of queue ``name``, so
+    jobs of one kind run in order and never compete with each other for the
+    database. Errors are logged, not raised.
+    """
+    _get_executor(name).submit(_run, name, func, args)
@@ -0,0 +1,232 @@
+import functools
+import hashlib
+import io
+import mimetypes
+import re
+import zipfile
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag built from values that change whenever the file changes."""
+    digest = hashlib.md5(
+        ":".join(str(part) for part in parts).encode(), usedforsecurity=False
+    )
+    return quote_etag(digest.hexdigest())
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=`` range into inclusive ``(start, end)`` offsets.
+
+    Returns ``None`` when there is no usable range (missing header, several
+    ranges or an unknown unit) so the whole file is sent, and raises
+    ``ValueError`` when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Sufijo: los últimos N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Rango vacío")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Rango fuera del archivo")
+    return start, end
+
+
+class _RangeFile:
+    """
+    Read-only view of ``length`` bytes of a file starting at ``start``.
+
+    Django iterates it through ``read()``; WSGI servers with a
+    ``wsgi.file_wrapper`` (gunicorn, uWSGI) use ``fileno()`` plus the
+    Content-Length to send the range with ``os.sendfile`` (zero-copy).
+    """
+
+    def __init__(self, file_obj, start: int, length: int):
+        self._file = file_obj
+        self._remaining = length
+        file_obj.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def ranged_file_response(
+    request,
+    file_obj,
+    size: int,
+    etag: str,
+    filename: str,
+    as_attachment: bool = True,
+    content_type: Optional[str] = None,
+):
+    """
+    Stream ``file_obj`` honouring If-None-Match, If-Range and a single
+    ``Range`` header. Both full and partial bodies are FileResponses, so the
+    WSGI server's file wrapper can send them without copying through Python;
+    otherwise they are read in ``FileResponse.block_size`` pieces.
+    """
+    conditional = get_conditional_response(request, etag=etag)
+    if conditional is not None:
+        file_obj.close()
+        return conditional
+
+    content_type = (
+        content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    )
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if if_range and if_range != etag:
+        # El archivo cambió desde la descarga parcial: enviarlo completo
+        range_header = None
+
+    response: HttpResponseBase
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        file_obj.close()
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(
+            file_obj,
+            as_attachment=as_attachment,
+            filename=filename,
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(size)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            _RangeFile(file_obj, start, end - start + 1),
+            status=206,
+            as_attachment=as_attachment,
+            filename=filename,
+            content_type=content_type,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    return response
+
+
+def protected_file_response(
+    request, field_file, as_attachment: bool = False, etag: Optional[str] = None
+):
+    """
+    Serve a FieldFile whose access was already checked by the view.
+
+    With ``PROTECTED_MEDIA_SERVER`` set, only headers are returned and the
+    front proxy sends the bytes (``X-Accel-Redirect`` for nginx,
+    ``X-Sendfile`` for Apache/lighttpd), so no Python worker stays busy
+    during long downloads. Otherwise the file is streamed by ranges.
+    """
+    name = field_file.name
+    filename = name.rsplit("/", 1)[-1]
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    server = settings.PROTECTED_MEDIA_SERVER
+
+    if server in ("nginx", "apache"):
+        response = HttpResponse(content_type=content_type)
+        if server == "nginx":
+            response["X-Accel-Redirect"] = (
+                settings.PROTECTED_MEDIA_INTERNAL_URL.rstrip("/") + "/" + quote(name)
+            )
+        else:
+            response["X-Sendfile"] = field_file.path
+        disposition = content_disposition_header(as_attachment, filename)
+        if disposition:
+            response["Content-Disposition"] = disposition
+        return response
+
+    storage = field_file.storage
+    size = storage.size(name)
+    return ranged_file_response(
+        request,
+        storage.open(name, "rb"),
+        size,
+        etag=etag or make_etag(name, size),
+        filename=filename,
+        as_attachment=as_attachment,
+        content_type=content_type,
+    )
+
+
+class _ZipStream(io.RawIOBase):
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta drenarlo."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[Tuple[str, IO[bytes]]]) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive built from ``(arcname, file)`` pairs without
+    holding it in memory: every chunk read from a file is emitted as soon
+    as it has been written to the archive.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for arcname, file_obj in entries:
+            with file_obj, archive.open(arcname, mode="w", force_zip64=True) as target:
+                for chunk in iter(functools.partial(file_obj.read, CHUNK_SIZE), b""):
+                    target.write(chunk)
+                    data = stream.drain()
+                    if data:
+                        yield data
+            data = stream.drain()
+            if data:
+                yield data
+    yield stream.drain()
@@ -0,0 +1,118 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Máximo de errores que se muestran al usuario (se detectan todos)
+MAX_REPORTED_ERRORS = 20
+
+
+class ExamImportError(ValueError):
+    """The exam file has format errors; ``errors`` holds ``(line, message)`` pairs."""
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        self.errors = sorted(errors)
+        super().__init__("; ".join(format_error(error) for error in self.errors))
+
+
+def format_error(error: Tuple[int, str]) -> str:
+    line_number, message = error
+    return f"Línea {line_number}: {message}"
+
+
+def iter_upload_lines(uploaded_file) -> Iterator[str]:
+    """
+    Decode an uploaded file line by line from its chunks, so it is never
+    read whole. Lines are decoded as UTF-8 until one is not valid UTF-8;
+    from there on the file is read as latin-1.
+    """
+    encoding = "utf-8"
+    for raw_line in uploaded_file:
+        try:
+            yield raw_line.decode(encoding)
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+            yield raw_line.decode(encoding)
+
+
+def _finish(
+    question: Optional[Tuple[int, Dict[str, Any]]], errors: List[Tuple[int, str]]
+) -> Optional[Dict[str, Any]]:
+    if question is None:
+        return None
+    line_number, data = question
+    correct = sum(1 for answer in data["answers"] if answer["is_correct"])
+    # Regla que ya aplicaba parse_evaluacion: toda pregunta necesita una correcta
+    if not correct:
+        errors.append((line_number, f"La pregunta '{data['id']}' no tiene opción correcta"))
+        return None
+    data["type"] = "single" if correct == 1 else "multiple"
+    return data
+
+
+def iter_exam_questions(
+    lines: Iterable[str], errors: List[Tuple[int, str]]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parse ``Q:id|texto`` / ``O:id|texto|1`` lines into questions in the
+    editor format (``id``, ``text``, ``type``, ``answers``), yielding each one
+    as soon as it is complete.
+
+    Format errors do not stop the parse: they are appended to ``errors`` as
+    ``(line, message)`` and the offending question is not yielded, so one
+    pass reports every problem in the file.
+    """
+    question: Optional[Tuple[int, Dict[str, Any]]] = None  # (línea, datos) en curso
+    skipping = False  # Opciones de una pregunta mal formada
+
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            # Línea vacía: separador entre preguntas
+            continue
+
+        if line.startswith("Q:"):
+            finished = _finish(question, errors)
+            if finished is not None:
+                yield finished
+            question = None
+
+            qid, sep, text = line[2:].partition("|")
+            skipping = not sep
+            if skipping:
+                errors.append((line_number, "Pregunta sin '|' entre el id y el texto"))
+                continue
+            question = (
+                line_number,
+                {"id": qid.strip(), "text": text.strip(), "answers": []},
+            )
+
+        elif line.startswith("O:"):
+            if question is None:
+                if not skipping:
+                    errors.append((line_number, "Opción sin pregunta previa"))
+                continue
+            parts = line[2:].split("|", 2)
+            if len(parts) != 3:
+                errors.append((line_number, "La opción debe tener el formato id|texto|0 o 1"))
+                continue
+            oid, text, flag = parts
+            question[1]["answers"].append(
+                {"id": oid.strip(), "text": text.strip(), "is_correct": flag.strip() == "1"}
+            )
+
+        else:
+            errors.append((line_number, f"Línea con formato inválido: {line[:80]}"))
+
+    finished = _finish(question, errors)
+    if finished is not None:
+        yield finished
+
+
+def parse_exam_file(uploaded_file) -> List[Dict[str, Any]]:
+    """
+    Questions of an uploaded exam file. Raises ``ExamImportError`` with
+    every line-numbered error if the file has any.
+    """
+    errors: List[Tuple[int, str]] = []
+    questions = list(iter_exam_questions(iter_upload_lines(uploaded_file), errors))
+    if errors:
+        raise ExamImportError(errors)
+    return questions
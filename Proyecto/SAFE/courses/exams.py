@@ -0,0 +1,176 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# Versión del esquema canónico guardado en Exam.canonical_questions. Subirla
+# al cambiar el formato hace que los exámenes viejos se normalicen al vuelo
+# hasta ejecutar canonicalize_exams.
+EXAM_SCHEMA_VERSION = 1
+EXAM_CACHE_SIZE = 512
+
+_cache: "OrderedDict" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _canonical_option(index, option):
+    return {
+        "id": str(option.get("id") or option.get("option_id") or index),
+        "text": option.get("text") or option.get("texto") or option.get("option") or "",
+        "is_correct": bool(
+            option.get("is_correct") or option.get("es_correcta") or option.get("correct")
+        ),
+    }
+
+
+def canonicalize_exam_questions(raw_questions):
+    """
+    Normalize stored questions (legacy JSON strings and the
+    ``options``/``opciones``/``answers`` key dialects) to a uniform list.
+    """
+    if not raw_questions:
+        return []
+    if isinstance(raw_questions, str):
+        try:
+            raw_questions = json.loads(raw_questions)
+        except ValueError:
+            return []
+    if not isinstance(raw_questions, list):
+        return []
+
+    normalized = []
+    for idx, question in enumerate(raw_questions):
+        if not isinstance(question, dict):
+            continue
+        # Soportar distintos formatos de almacenamiento:
+        # - "options" / "opciones" (formatos previos)
+        # - "answers" (formato usado por el editor de cuestionarios en administración)
+        options = (
+            question.get("options")
+            or question.get("opciones")
+            or question.get("answers")
+            or []
+        )
+        norm_opts = [
+            _canonical_option(o_idx, opt)
+            for o_idx, opt in enumerate(options if isinstance(options, list) else [])
+            if isinstance(opt, dict)
+        ]
+        normalized.append(
+            {
+                "id": str(question.get("id") or question.get("question_id") or idx),
+                "text": question.get("text")
+                or question.get("texto")
+                or question.get("question")
+                or "",
+                "options": norm_opts,
+                "allows_multiple": sum(1 for opt in norm_opts if opt["is_correct"]) != 1,
+            }
+        )
+    return normalized
+
+
+def build_canonical_questions(raw_questions):
+    """Versioned document stored in ``Exam.canonical_questions``."""
+    return {
+        "v": EXAM_SCHEMA_VERSION,
+        "questions": canonicalize_exam_questions(raw_questions),
+    }
+
+
+def questions_digest(canonical) -> str:
+    """SHA-256 of ``canonical`` as canonical JSON; stored in ``Exam.questions_hash``."""
+    payload = json.dumps(
+        canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def questions_version(exam) -> str:
+    """
+    Version of the questions of ``exam``: the hash stored on save, so edits
+    that leave the questions alone (title, tries, duration) keep it.
+    """
+    if exam.questions_hash:
+        return exam.questions_hash
+    # Guardado antes de existir questions_hash (hasta ejecutar canonicalize_exams)
+    return questions_digest(build_canonical_questions(exam.questions))
+
+
+class _CachedExam:
+    """Canonical questions of one exam version plus values derived from them."""
+
+    __slots__ = ("questions", "derived")
+
+    def __init__(self, questions):
+        self.questions = questions
+        self.derived = {}
+
+
+def _cached_exam(exam) -> _CachedExam:
+    key = (exam.pk, questions_version(exam))
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            return entry
+
+    canonical = exam.canonical_questions
+    if not isinstance(canonical, dict) or canonical.get("v") != EXAM_SCHEMA_VERSION:
+        # Guardado antes de existir el esquema (o con otra versión)
+        canonical = build_canonical_questions(exam.questions)
+    entry = _CachedExam(canonical["questions"])
+
+    with _cache_lock:
+        _cache[key] = entry
+        _cache.move_to_end(key)
+        while len(_cache) > EXAM_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return entry
+
+
+def get_exam_questions(exam):
+    """
+    Canonical questions of ``exam``, cached in-process by ``(pk, questions_hash)``.
+
+    A cache hit touches neither JSON column, so callers can defer them. The
+    returned list is shared between requests: copy a question before
+    changing it.
+    """
+    if exam is None:
+        return []
+    return _cached_exam(exam).questions
+
+
+def get_exam_derivative(exam, name: str, build):
+    """
+    Value computed by ``build(questions)`` once per exam version and kept in
+    the same cache entry as its questions.
+    """
+    entry = _cached_exam(exam)
+    try:
+        return entry.derived[name]
+    except KeyError:
+        return entry.derived.setdefault(name, build(entry.questions))
+
+
+def public_questions(questions):
+    """Questions without the answer key: safe to render."""
+    return [
+        {
+            "id": question["id"],
+            "text": question["text"],
+            "allows_multiple": question["allows_multiple"],
+            "options": [
+                {"id": option["id"], "text": option["text"]}
+                for option in question["options"]
+            ],
+        }
+        for question in questions
+    ]
+
+
+def get_public_questions(exam):
+    if exam is None:
+        return []
+    return get_exam_derivative(exam, "public", public_questions)
@@ -0,0 +1,262 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional
+
+from django.db import transaction
+
+from enrollments.models import ContentProgress
+
+from .exams import get_exam_derivative, get_public_questions, questions_version
+
+REGRADE_BATCH_SIZE = 1000
+
+
+@dataclass
+class CompiledExam:
+    """Answer key of an exam packed into bit fields, one per question."""
+
+    question_ids: List[str] = field(default_factory=list)
+    option_bits: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    other_bits: Dict[str, int] = field(default_factory=dict)
+    guard_bits: Dict[str, int] = field(default_factory=dict)
+    correct_ids: Dict[str, List[str]] = field(default_factory=dict)
+    key: int = 0
+    data_mask: int = 0
+    guard_mask: int = 0
+    total: int = 0
+
+
+def compile_exam(questions) -> CompiledExam:
+    """
+    Compile canonical questions (``courses.exams``) into a CompiledExam.
+
+    Each question gets a bit field in one integer: a bit per option, an
+    "other" bit for option ids no longer in the exam and a guard bit on top.
+    Submissions are encoded the same way, so comparing one with the key is
+    a few big-integer operations over the whole exam instead of a loop of
+    set comparisons.
+    """
+    compiled = CompiledExam()
+    shift = 0
+    for question in questions:
+        qid = question["id"]
+        options = question.get("options", [])
+        bits = {}
+        for offset, option in enumerate(options):
+            bits[option["id"]] = 1 << (shift + offset)
+            if option.get("is_correct"):
+                compiled.key |= bits[option["id"]]
+        width = len(options) + 1  # + bit "otra opción"
+
+        compiled.question_ids.append(qid)
+        compiled.option_bits[qid] = bits
+        compiled.other_bits[qid] = 1 << (shift + width - 1)
+        compiled.guard_bits[qid] = 1 << (shift + width)
+        compiled.correct_ids[qid] = [
+            option["id"] for option in options if option.get("is_correct")
+        ]
+        compiled.data_mask |= ((1 << width) - 1) << shift
+        compiled.guard_mask |= compiled.guard_bits[qid]
+        shift += width + 1
+
+    compiled.total = len(compiled.question_ids)
+    return compiled
+
+
+def encode_selection(compiled: CompiledExam, selected: Mapping[str, Iterable]) -> int:
+    """
+    Bitmask of a submission given as ``question_id -> selected option ids``.
+    Encoding is still a Python loop over the selected options; only the
+    comparison with the key (``wrong_fields``) is bit-parallel.
+    """
+    mask = 0
+    for qid, option_ids in selected.items():
+        bits = compiled.option_bits.get(str(qid))
+        if bits is None:
+            continue
+        for option_id in option_ids:
+            mask |= bits.get(str(option_id), compiled.other_bits[str(qid)])
+    return mask
+
+
+def wrong_fields(compiled: CompiledExam, mask: int) -> int:
+    """
+    Guard bits of the questions answered wrongly. Adding the data mask to a
+    field overflows into its guard bit exactly when the field is non-zero,
+    i.e. when the submission differs from the key in that question.
+    """
+    diff = (mask ^ compiled.key) & compiled.data_mask
+    return (diff + compiled.data_mask) & compiled.guard_mask
+
+
+def score_mask(compiled: CompiledExam, mask: int) -> int:
+    """Number of questions answered exactly like the key."""
+    return compiled.total - wrong_fields(compiled, mask).bit_count()
+
+
+def get_answer_key(exam) -> CompiledExam:
+    """Compiled answer key of ``exam``, cached server-side with its questions."""
+    return get_exam_derivative(exam, "answer_key", compile_exam)
+
+
+def exam_version(exam) -> str:
+    """Reference to the version of ``exam`` a submission was answered against."""
+    return questions_version(exam)
+
+
+def _compact_selected(selected: Mapping[str, Iterable]) -> Dict[str, List[str]]:
+    compact = {}
+    for qid, option_ids in selected.items():
+        option_ids = list(dict.fromkeys(str(oid) for oid in option_ids or []))
+        if option_ids:
+            compact[str(qid)] = option_ids
+    return compact
+
+
+def compact_results(exam, selected: Mapping[str, Iterable]) -> dict:
+    """
+    Value stored in ``ContentProgress.results``: the selected option ids per
+    question (unanswered questions are left out) and the exam version they
+    answer. Question text, options and verdicts are not stored; they are
+    rebuilt from the canonical exam by ``expand_results``.
+    """
+    return {"exam_version": exam_version(exam), "selected": _compact_selected(selected)}
+
+
+def selections_from_results(results) -> Dict[str, List[str]]:
+    """
+    ``question_id -> selected ids`` from stored ``ContentProgress.results``,
+    compact or in the older per-question list format.
+    """
+    if isinstance(results, dict):
+        return dict(results.get("selected") or {})
+    return {
+        str(entry.get("question_id")): entry.get("selected") or []
+        for entry in results or []
+        if isinstance(entry, dict)
+    }
+
+
+class ExpandedResults(NamedTuple):
+    score: int
+    total: int
+    questions: List[dict]
+    # Las respuestas se dieron sobre otra versión del examen (o una desconocida)
+    outdated: bool
+
+
+def expand_results(exam, results) -> ExpandedResults:
+    """
+    Full view of stored ``results`` against the current version of ``exam``.
+
+    ``questions`` are the public questions, each with a ``result`` dict
+    (``selected``, ``correct_ids``, ``is_correct``) ready for
+    ``take_exam.html``. ``outdated`` tells when the answers were given
+    against another version of the exam, so the rebuilt verdicts may not be
+    the ones the learner saw.
+    """
+    compiled = get_answer_key(exam)
+    selected = selections_from_results(results)
+    wrong = wrong_fields(compiled, encode_selection(compiled, selected))
+    questions = [
+        dict(
+            question,
+            result={
+                "selected": selected.get(question["id"], []),
+                "correct_ids": compiled.correct_ids[question["id"]],
+                "is_correct": not wrong & compiled.guard_bits[question["id"]],
+            },
+        )
+        for question in get_public_questions(exam)
+    ]
+    return ExpandedResults(
+        score=compiled.total - wrong.bit_count(),
+        total=compiled.total,
+        questions=questions,
+        outdated=results_version(results) != exam_version(exam),
+    )
+
+
+def results_version(results) -> Optional[str]:
+    """Exam version stored with ``results``; ``None`` for the older list format."""
+    if isinstance(results, dict):
+        return results.get("exam_version")
+    return None
+
+
+def _compact_stored(results) -> dict:
+    """Compact form of stored results, keeping the exam version they reference."""
+    return {
+        "exam_version": results_version(results),
+        "selected": _compact_selected(selections_from_results(results)),
+    }
+
+
+def _result_batches(queryset, batch_size: int):
+    """Rows of ``queryset`` with ``results`` loaded, in keyset batches."""
+    queryset = queryset.with_results().filter(results__isnull=False).order_by("pk")
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def grade_progress_batch(compiled: CompiledExam, progresses) -> List[ContentProgress]:
+    """
+    Re-score ``progresses`` (with ``results`` loaded) against ``compiled``.
+    The exam version stored with each submission is kept: it records what
+    the learner answered, not what it was graded against. Returns the rows
+    that changed.
+    """
+    changed = []
+    for progress in progresses:
+        if not progress.results:
+            continue
+        results = _compact_stored(progress.results)
+        score = score_mask(compiled, encode_selection(compiled, results["selected"]))
+        if progress.results != results or progress.score != score:
+            progress.results = results
+            progress.score = score
+            changed.append(progress)
+    return changed
+
+
+def regrade_exam(exam, batch_size: int = REGRADE_BATCH_SIZE, dry_run: bool = False):
+    """
+    Re-score every stored submission of ``exam`` against its current answer
+    key, in keyset batches written back with ``bulk_update``.
+
+    Returns ``(graded, changed)``.
+    """
+    compiled = get_answer_key(exam)
+    graded = changed_total = 0
+    for batch in _result_batches(
+        ContentProgress.objects.filter(content__exam=exam), batch_size
+    ):
+        changed = grade_progress_batch(compiled, batch)
+        if changed and not dry_run:
+            with transaction.atomic():
+                ContentProgress.objects.bulk_update(changed, ["score", "results"])
+        graded += len(batch)
+        changed_total += len(changed)
+    return graded, changed_total
+
+
+def compact_legacy_results(batch_size: int = REGRADE_BATCH_SIZE) -> int:
+    """
+    Rewrite results still in the older per-question list format compactly.
+    Scores are kept and no exam version is recorded, since the version they
+    were answered against is unknown. Returns how many rows were rewritten.
+    """
+    rewritten = 0
+    for batch in _result_batches(ContentProgress.objects.all(), batch_size):
+        legacy = [progress for progress in batch if isinstance(progress.results, list)]
+        for progress in legacy:
+            progress.results = _compact_stored(progress.results)
+        if legacy:
+            with transaction.atomic():
+                ContentProgress.objects.bulk_update(legacy, ["results"])
+        rewritten += len(legacy)
+    return rewritten
@@ -0,0 +1,80 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.grading import compile_exam, encode_selection, score_mask
+
+
+def score_by_question(questions, submitted_answers) -> int:
+    """Score of a submission with one set comparison per question (no result building)."""
+    score = 0
+    for question in questions:
+        selected = set(submitted_answers.get(question["id"], []))
+        correct_ids = {
+            option["id"] for option in question["options"] if option["is_correct"]
+        }
+        if selected == correct_ids:
+            score += 1
+    return score
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la calificación pregunta a pregunta (una comparación de "
+        "conjuntos por pregunta) con la de máscaras de bits sobre respuestas "
+        "sintéticas. Solo la comparación con la clave es en paralelo de bits: "
+        "codificar cada respuesta (encode_selection) sigue recorriendo en Python "
+        "sus preguntas y opciones, y se mide aparte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=50)
+        parser.add_argument("--options", type=int, default=4)
+        parser.add_argument("--submissions", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        option_ids = [str(i) for i in range(options["options"])]
+        questions = [
+            {
+                "id": str(q),
+                "text": f"Pregunta {q}",
+                "options": [
+                    {"id": oid, "text": oid, "is_correct": oid == "0"} for oid in option_ids
+                ],
+            }
+            for q in range(options["questions"])
+        ]
+        submissions = [
+            {q["id"]: [rng.choice(option_ids)] for q in questions}
+            for _ in range(options["submissions"])
+        ]
+
+        started = time.perf_counter()
+        expected = [score_by_question(questions, s) for s in submissions]
+        per_question = time.perf_counter() - started
+
+        started = time.perf_counter()
+        compiled = compile_exam(questions)
+        masks = [encode_selection(compiled, s) for s in submissions]
+        encoding = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scores = [score_mask(compiled, mask) for mask in masks]
+        scoring = time.perf_counter() - started
+
+        if scores != expected:
+            self.stderr.write(self.style.ERROR("Los puntajes no coinciden."))
+            return
+
+        bitmask = encoding + scoring
+        self.stdout.write(
+            f"{len(submissions)} respuestas de {len(questions)} preguntas:\n"
+            f"  pregunta a pregunta: {per_question * 1000:.1f} ms\n"
+            f"  máscaras de bits:    {bitmask * 1000:.1f} ms "
+            f"({per_question / bitmask:.1f}x)\n"
+            f"    codificación:      {encoding * 1000:.1f} ms\n"
+            f"    comparación:       {scoring * 1000:.1f} ms"
+        )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from courses.exams import build_canonical_questions, questions_digest
+from courses.models import Exam
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda la versión normalizada de las preguntas de los exámenes "
+        "existentes (Exam.canonical_questions) y su hash (Exam.questions_hash). "
+        "Es idempotente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Exámenes por lote.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        exams = Exam.objects.only(
+            "pk", "questions", "canonical_questions", "questions_hash"
+        ).order_by("pk")
+        updated = 0
+        last_pk = 0
+
+        while True:
+            batch = list(exams.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+
+            changed = []
+            for exam in batch:
+                canonical = build_canonical_questions(exam.questions)
+                digest = questions_digest(canonical)
+                if (
+                    exam.canonical_questions != canonical
+                    or exam.questions_hash != digest
+                ):
+                    exam.canonical_questions = canonical
+                    exam.questions_hash = digest
+                    changed.append(exam)
+            # bulk_update no toca updated_at: el contenido visible no cambia
+            Exam.objects.bulk_update(changed, ["canonical_questions", "questions_hash"])
+
+            updated += len(changed)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f"{updated} examen(es) normalizados."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from courses.grading import REGRADE_BATCH_SIZE, compact_legacy_results
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda en formato compacto (opciones elegidas por pregunta) las "
+        "respuestas de exámenes con el formato anterior, sin cambiar puntajes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REGRADE_BATCH_SIZE,
+            help="Respuestas por lote.",
+        )
+
+    def handle(self, *args, **options):
+        rewritten = compact_legacy_results(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{rewritten} respuesta(s) convertidas al formato compacto.")
+        )
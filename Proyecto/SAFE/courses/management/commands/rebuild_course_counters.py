@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.services import find_course_counter_drift, rebuild_course_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los contadores modules_count/contents_count de los cursos "
+        "y verifica que coincidan con las tablas de módulos y contenidos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course",
+            type=int,
+            action="append",
+            dest="course_ids",
+            help="Limitar a un curso (se puede repetir).",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Solo verificar; no modifica la base de datos.",
+        )
+
+    def handle(self, *args, **options):
+        course_ids = options["course_ids"]
+        drift = find_course_counter_drift(course_ids)
+
+        for row in drift:
+            self.stdout.write(
+                f"Curso {row['pk']}: módulos {row['modules_count']} -> "
+                f"{row['real_modules']}, contenidos {row['contents_count']} -> "
+                f"{row['real_contents']}"
+            )
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"{len(drift)} curso(s) con contadores desfasados.")
+            self.stdout.write(self.style.SUCCESS("Contadores consistentes."))
+            return
+
+        updated = rebuild_course_counters(course_ids)
+        remaining = find_course_counter_drift(course_ids)
+        if remaining:
+            raise CommandError(
+                f"{len(remaining)} curso(s) siguen desfasados tras la reconstrucción."
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{updated} curso(s) recalculados; {len(drift)} corregido(s)."
+            )
+        )
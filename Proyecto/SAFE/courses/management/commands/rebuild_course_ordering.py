@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course
+from courses.services import rebuild_content_chain, rebuild_module_chain
+
+
+class Command(BaseCommand):
+    help = (
+        "Repara el orden de módulos y contenidos: recorre los punteros "
+        "previous/next y reescribe punteros y posiciones materializadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course",
+            type=int,
+            action="append",
+            dest="course_ids",
+            help="Limitar a un curso (se puede repetir).",
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by("pk")
+        if options["course_ids"]:
+            courses = courses.filter(pk__in=options["course_ids"])
+
+        total = 0
+        for course in courses.iterator():
+            for module in rebuild_module_chain(course):
+                rebuild_content_chain(module)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{total} curso(s) reordenados."))
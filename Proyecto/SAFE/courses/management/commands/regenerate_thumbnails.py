@@ -0,0 +1,83 @@
+from typing import Any, Dict, Tuple, Type
+
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from courses.models import Course, Material
+from courses.thumbnails import DERIVATIVES_DIR, build_derivatives_for
+from learning_paths.models import LearningPath
+
+# (modelo, campo de imagen, campo con el hash, filtro adicional)
+IMAGE_SOURCES: Tuple[Tuple[Type[models.Model], str, str, Dict[str, Any]], ...] = (
+    (Course, "header_img", "header_img_digest", {}),
+    (LearningPath, "header_img", "header_img_digest", {}),
+    (Material, "file", "file_digest", {"type": Material.MaterialType.JPG}),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las miniaturas WebP/JPEG de portadas de cursos y rutas y de "
+        "materiales JPG. Es idempotente: reutiliza las que ya existen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Vuelve a generar también las miniaturas existentes.",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Borra las miniaturas que ya no corresponden a ninguna imagen.",
+        )
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+        digests = set()
+
+        for model, field_name, digest_field, extra in IMAGE_SOURCES:
+            pending = (
+                model._default_manager.filter(**extra)
+                .exclude(**{f"{field_name}__isnull": True})
+                .exclude(**{field_name: ""})
+                .values_list("pk", flat=True)
+                .order_by("pk")
+            )
+            for pk in pending.iterator():
+                digest = build_derivatives_for(
+                    model._meta.label, pk, field_name, digest_field, force=options["force"]
+                )
+                if digest:
+                    digests.add(digest)
+                    generated += 1
+                else:
+                    failed += 1
+
+        if failed:
+            self.stdout.write(
+                self.style.WARNING(f"{failed} imagen(es) no se pudieron procesar.")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Miniaturas listas para {generated} imagen(es).")
+        )
+
+        if options["prune"]:
+            removed = self._prune(digests)
+            self.stdout.write(f"{removed} miniatura(s) huérfanas eliminadas.")
+
+    def _prune(self, digests):
+        storage = Course._meta.get_field("header_img").storage
+        if not storage.exists(DERIVATIVES_DIR):
+            return 0
+
+        removed = 0
+        folders, _ = storage.listdir(DERIVATIVES_DIR)
+        for folder in folders:
+            _, files = storage.listdir(f"{DERIVATIVES_DIR}/{folder}")
+            for name in files:
+                if name.split("-", 1)[0] not in digests:
+                    storage.delete(f"{DERIVATIVES_DIR}/{folder}/{name}")
+                    removed += 1
+        return removed
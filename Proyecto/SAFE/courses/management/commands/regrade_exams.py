@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from courses.grading import REGRADE_BATCH_SIZE, regrade_exam
+from courses.models import Exam
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a calificar las respuestas guardadas de los exámenes con su "
+        "clave de respuestas actual (por ejemplo, tras corregir una pregunta). "
+        "Cambia puntajes históricos: ejecutarlo solo a propósito."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--exam",
+            type=int,
+            action="append",
+            dest="exam_ids",
+            help="Limitar a un examen (se puede repetir).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REGRADE_BATCH_SIZE,
+            help="Respuestas por lote.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo informa cuántas calificaciones cambiarían.",
+        )
+
+    def handle(self, *args, **options):
+        exams = Exam.objects.order_by("pk")
+        if options["exam_ids"]:
+            exams = exams.filter(pk__in=options["exam_ids"])
+
+        graded_total = changed_total = 0
+        for exam in exams.iterator():
+            graded, changed = regrade_exam(
+                exam, batch_size=options["batch_size"], dry_run=options["dry_run"]
+            )
+            if graded:
+                self.stdout.write(
+                    f"Examen {exam.pk}: {graded} respuesta(s), {changed} con cambios."
+                )
+            graded_total += graded
+            changed_total += changed
+
+        verb = "cambiarían" if options["dry_run"] else "actualizadas"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{graded_total} respuesta(s) calificadas, {changed_total} {verb}."
+            )
+        )
@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models import Max
 from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from .exams import build_canonical_questions, questions_digest
+
 
 class Course(models.Model):
     """Cursos de formación"""
@@ -23,9 +26,14 @@ class Course(models.Model):
         related_name="created_courses",
     )
     header_img = models.ImageField(null=True, blank=True)
+    # Hash de la portada con miniaturas generadas (courses.thumbnails)
+    header_img_digest = models.CharField(max_length=16, blank=True, editable=False)
     status = models.CharField(
         max_length=20, choices=CourseStatus.choices, default=CourseStatus.DRAFT
     )
+    # Contadores desnormalizados (mantenidos por courses.signals)
+    modules_count = models.PositiveIntegerField(default=0, editable=False)
+    contents_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         db_table = "course"
@@ -64,13 +72,28 @@ class Module(models.Model):
         related_name="previous_modules",
     )
     duration_hours = models.IntegerField(null=True, blank=True)
+    # Posición materializada (con huecos) sincronizada con los punteros
+    order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Separación entre posiciones consecutivas para insertar sin renumerar
+    ORDER_GAP = 1024
+
     class Meta:
         db_table = "module"
         verbose_name = "Módulo"
         verbose_name_plural = "Módulos"
+        indexes = [models.Index(fields=["course", "order"])]
+
+    def save(self, *args, **kwargs):
+        # Los módulos nuevos sin posición van al final del curso
+        if self._state.adding and not self.order and self.course_id:
+            last = Module.objects.filter(course_id=self.course_id).aggregate(
+                last=Max("order")
+            )["last"]
+            self.order = (last or 0) + self.ORDER_GAP
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.course.name} - {self.name}"
@@ -84,12 +107,33 @@ class Exam(models.Model):
     duration_minutes = models.IntegerField(null=True, blank=True)
     max_tries = models.IntegerField(null=True, blank=True)
     questions = models.JSONField(null=True, blank=True)
+    # Preguntas normalizadas al guardar (courses.exams)
+    canonical_questions = models.JSONField(null=True, blank=True, editable=False)
+    # Hash de canonical_questions: versión de las preguntas y clave de la caché
+    # en proceso. No cambia al editar solo el título, intentos o duración
+    questions_hash = models.CharField(
+        max_length=64, blank=True, default="", editable=False
+    )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "exam"
         verbose_name = "Examen"
         verbose_name_plural = "Exámenes"
 
+    def save(self, *args, **kwargs):
+        self.canonical_questions = build_canonical_questions(self.questions)
+        self.questions_hash = questions_digest(self.canonical_questions)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "questions" in update_fields:
+            kwargs["update_fields"] = {
+                *update_fields,
+                "canonical_questions",
+                "questions_hash",
+                "updated_at",
+            }
+        super().save(*args, **kwargs)
+
 
 class Assignment(models.Model):
     """Tareas/Asignaciones"""
@@ -127,6 +171,8 @@ class Material(models.Model):
         max_length=10, choices=MaterialType.choices, null=True, blank=True
     )
     file = models.FileField(null=True, blank=True)
+    # Hash de la imagen con miniaturas generadas (solo materiales JPG)
+    file_digest = models.CharField(max_length=16, blank=True, editable=False)
 
     class Meta:
         db_table = "material"
@@ -222,6 +268,16 @@ class Content(models.Model):
         db_table = "content"
         verbose_name = "Contenido"
         verbose_name_plural = "Contenidos"
+        indexes = [models.Index(fields=["module", "order"])]
+
+    def save(self, *args, **kwargs):
+        # Los contenidos nuevos sin orden van al final del módulo
+        if self._state.adding and not self.order and self.module_id:
+            last = Content.objects.filter(module_id=self.module_id).aggregate(
+                last=Max("order")
+            )["last"]
+            self.order = (last or 0) + 1
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} ({self.content_type})"
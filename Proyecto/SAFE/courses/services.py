@@ -1,10 +1,48 @@
-from typing import Callable, List, Optional
+from typing import Callable, Iterable, List, Optional
+from uuid import uuid4
 
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 
 from .models import Content, Course, Module
 
 
+STRUCTURE_VERSION_TIMEOUT = None  # sin expiración: solo cambia al modificar el curso
+
+
+def _structure_version_key(course_id: int) -> str:
+    return f"courses:structure-version:{course_id}"
+
+
+def get_course_structure_version(course_id: int) -> str:
+    """
+    Token that changes whenever the module layout of a course changes.
+
+    Caches derived from the course structure (e.g. per-inscription unlock
+    state) store it and are discarded when it no longer matches.
+    """
+    version = cache.get(_structure_version_key(course_id))
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(_structure_version_key(course_id), version, STRUCTURE_VERSION_TIMEOUT):
+            version = cache.get(_structure_version_key(course_id), version)
+    return version
+
+
+def bump_course_structure_version(course_id: int) -> None:
+    """Invalidate every cache derived from the structure of a course."""
+
+    def _bump():
+        cache.set(_structure_version_key(course_id), uuid4().hex, STRUCTURE_VERSION_TIMEOUT)
+
+    # Se invalida de inmediato y otra vez al confirmar la transacción, para que
+    # una lectura concurrente no vuelva a cachear el estado anterior.
+    _bump()
+    transaction.on_commit(_bump)
+
+
 def _order_nodes(
     nodes: List,
     prev_attr: str,
@@ -47,76 +85,145 @@ def _rewrite_chain(
     prev_attr: str,
     next_attr: str,
     order_attr: Optional[str] = None,
+    order_step: int = 1,
 ) -> None:
-    """Persist previous/next (and optional order) pointers to match the ordered list."""
+    """
+    Persist previous/next (and optional order) pointers to match the ordered
+    list, writing every changed node in a single bulk UPDATE.
+    """
+    prev_id, next_id = f"{prev_attr}_id", f"{next_attr}_id"
+    changed = []
     for index, node in enumerate(ordered_nodes):
         prev_node = ordered_nodes[index - 1] if index > 0 else None
         next_node = ordered_nodes[index + 1] if index + 1 < len(ordered_nodes) else None
+        desired = {
+            prev_id: prev_node.pk if prev_node else None,
+            next_id: next_node.pk if next_node else None,
+        }
+        if order_attr:
+            desired[order_attr] = (index + 1) * order_step
 
-        fields = []
-        if getattr(node, prev_attr) != prev_node:
-            setattr(node, prev_attr, prev_node)
-            fields.append(prev_attr)
+        dirty = False
+        for attr, value in desired.items():
+            if getattr(node, attr) != value:
+                setattr(node, attr, value)
+                dirty = True
 
-        if getattr(node, next_attr) != next_node:
-            setattr(node, next_attr, next_node)
-            fields.append(next_attr)
+        if dirty:
+            changed.append(node)
 
-        if order_attr:
-            desired_order = index + 1
-            if getattr(node, order_attr) != desired_order:
-                setattr(node, order_attr, desired_order)
-                fields.append(order_attr)
-
-        if fields:
-            node.save(update_fields=fields)
+    if changed:
+        fields = [prev_id, next_id] + ([order_attr] if order_attr else [])
+        type(changed[0]).objects.bulk_update(changed, fields)
 
 
 def get_ordered_modules(course: Course) -> List[Module]:
-    """Return modules of a course ordered using their linked pointers."""
-    modules = list(
-        course.modules.select_related("previous_module", "next_module").prefetch_related("contents")
-    )
-    return _order_nodes(modules, "previous_module", "next_module", lambda module: module.pk or 0)
+    """Return modules of a course ordered by their materialized position."""
+    return list(course.modules.order_by("order", "pk").prefetch_related("contents"))
 
 
 def get_ordered_contents(module: Module) -> List[Content]:
-    """Return contents of a module ordered using their linked pointers."""
-    contents = list(
-        module.contents.select_related(
-            "previous_content",
-            "next_content",
-            "material",
-            "exam",
-            "assignment",
+    """Return contents of a module ordered by their stored position."""
+    return list(
+        module.contents.select_related("material", "exam", "assignment").order_by(
+            "order", "pk"
         )
     )
-    return _order_nodes(
+
+
+@transaction.atomic
+def rebuild_module_chain(course: Course) -> List[Module]:
+    """
+    Repair helper: order modules by their linked pointers (falling back to the
+    stored position) and rewrite pointers and gap-based positions to match.
+    """
+    modules = list(course.modules.select_related("previous_module", "next_module"))
+    ordered = _order_nodes(
+        modules,
+        "previous_module",
+        "next_module",
+        lambda module: (module.order or 0, module.pk or 0),
+    )
+    _rewrite_chain(
+        ordered,
+        "previous_module",
+        "next_module",
+        order_attr="order",
+        order_step=Module.ORDER_GAP,
+    )
+    bump_course_structure_version(course.pk)
+    return ordered
+
+
+@transaction.atomic
+def rebuild_content_chain(module: Module) -> List[Content]:
+    """
+    Repair helper: order contents by their linked pointers (falling back to the
+    stored order) and rewrite pointers and order values to match.
+    """
+    contents = list(
+        module.contents.select_related("previous_content", "next_content")
+    )
+    ordered = _order_nodes(
         contents,
         "previous_content",
         "next_content",
         lambda content: (content.order or 0, content.pk or 0),
     )
+    _rewrite_chain(ordered, "previous_content", "next_content", order_attr="order")
+    return ordered
 
 
-@transaction.atomic
-def rebuild_module_chain(course: Course) -> List[Module]:
-    """Normalize previous/next pointers for modules inside a course."""
-    ordered = get_ordered_modules(course)
-    _rewrite_chain(ordered, "previous_module", "next_module")
+def _apply_full_order(
+    nodes: dict, ordered_ids: List[int], prev_attr: str, next_attr: str, order_step: int
+) -> List:
+    """Rewrite a whole sibling list in the given order with one bulk UPDATE."""
+    ordered_ids = [int(pk) for pk in ordered_ids]
+    if len(ordered_ids) != len(set(ordered_ids)) or set(ordered_ids) != set(nodes):
+        raise ValueError(
+            "El nuevo orden debe incluir cada elemento exactamente una vez."
+        )
+
+    ordered = [nodes[pk] for pk in ordered_ids]
+    _rewrite_chain(
+        ordered, prev_attr, next_attr, order_attr="order", order_step=order_step
+    )
     return ordered
 
 
 @transaction.atomic
-def rebuild_content_chain(module: Module) -> List[Content]:
-    """Normalize previous/next pointers and order values for a module contents."""
-    ordered = get_ordered_contents(module)
-    _rewrite_chain(ordered, "previous_content", "next_content", order_attr="order")
+def set_module_order(course: Course, module_ids: List[int]) -> List[Module]:
+    """Reorder every module of a course at once (drag-and-drop editors)."""
+    ordered = _apply_full_order(
+        course.modules.select_for_update().in_bulk(),
+        module_ids,
+        "previous_module",
+        "next_module",
+        Module.ORDER_GAP,
+    )
+    bump_course_structure_version(course.pk)
     return ordered
 
 
-def _swap_adjacent(left, right, prev_attr: str, next_attr: str) -> None:
-    """Swap two adjacent nodes: left <-> right."""
+@transaction.atomic
+def set_content_order(module: Module, content_ids: List[int]) -> List[Content]:
+    """Reorder every content of a module at once (drag-and-drop editors)."""
+    return _apply_full_order(
+        module.contents.select_for_update().in_bulk(),
+        content_ids,
+        "previous_content",
+        "next_content",
+        1,
+    )
+
+
+def _swap_adjacent(
+    left, right, prev_attr: str, next_attr: str, order_attr: Optional[str] = None
+) -> None:
+    """
+    Swap two adjacent nodes: left <-> right. Only the pair and their outer
+    neighbours are written, in a single bulk UPDATE.
+    """
     before_left = getattr(left, prev_attr)
     after_right = getattr(right, next_attr)
 
@@ -125,37 +232,38 @@ def _swap_adjacent(left, right, prev_attr: str, next_attr: str) -> None:
     setattr(left, prev_attr, right)
     setattr(left, next_attr, after_right)
 
-    updates = [
-        (left, [prev_attr, next_attr]),
-        (right, [prev_attr, next_attr]),
-    ]
+    fields = [prev_attr, next_attr]
+    if order_attr:
+        left_order = getattr(left, order_attr)
+        setattr(left, order_attr, getattr(right, order_attr))
+        setattr(right, order_attr, left_order)
+        fields.append(order_attr)
 
+    nodes = [left, right]
     if before_left:
         setattr(before_left, next_attr, right)
-        updates.append((before_left, [next_attr]))
+        nodes.append(before_left)
 
     if after_right:
         setattr(after_right, prev_attr, left)
-        updates.append((after_right, [prev_attr]))
+        nodes.append(after_right)
 
-    for obj, fields in updates:
-        obj.save(update_fields=fields)
+    type(left).objects.bulk_update(nodes, fields)
 
 
 @transaction.atomic
 def append_module_to_course(course: Course, module: Module) -> Module:
     """Append a module at the end of the course linked list and save it."""
-    ordered = rebuild_module_chain(course)
-    tail = ordered[-1] if ordered else None
+    tail = course.modules.order_by("-order", "-pk").first()
 
     module.course = course
     module.previous_module = tail
     module.next_module = None
+    module.order = (tail.order if tail else 0) + Module.ORDER_GAP
     module.save()
 
-    if tail and tail.next_module_id != module.pk:
-        tail.next_module = module
-        tail.save(update_fields=["next_module"])
+    if tail:
+        Module.objects.filter(pk=tail.pk).update(next_module=module)
 
     return module
 
@@ -163,18 +271,16 @@ def append_module_to_course(course: Course, module: Module) -> Module:
 @transaction.atomic
 def append_content_to_module(module: Module, content: Content) -> Content:
     """Append a content block at the end of the module linked list and save it."""
-    ordered = rebuild_content_chain(module)
-    tail = ordered[-1] if ordered else None
+    tail = module.contents.order_by("-order", "-pk").first()
 
     content.module = module
     content.previous_content = tail
     content.next_content = None
-    content.order = len(ordered) + 1
+    content.order = (tail.order if tail else 0) + 1
     content.save()
 
-    if tail and tail.next_content_id != content.pk:
-        tail.next_content = content
-        tail.save(update_fields=["next_content"])
+    if tail:
+        Content.objects.filter(pk=tail.pk).update(next_content=content)
 
     return content
 
@@ -183,11 +289,7 @@ def append_content_to_module(module: Module, content: Content) -> Content:
 def move_module(module: Module, direction: str) -> bool:
     """Move a module one position up or down inside its course."""
     module = Module.objects.select_related(
-        "previous_module", "next_module", "course"
-    ).get(pk=module.pk)
-    rebuild_module_chain(module.course)
-    module = Module.objects.select_related(
-        "previous_module", "next_module", "course"
+        "previous_module__previous_module", "next_module__next_module"
     ).get(pk=module.pk)
 
     direction = direction.lower()
@@ -195,28 +297,59 @@ def move_module(module: Module, direction: str) -> bool:
         target = module.previous_module
         if not target or target.course_id != module.course_id:
             return False
-        _swap_adjacent(target, module, "previous_module", "next_module")
+        _swap_adjacent(target, module, "previous_module", "next_module", "order")
+        bump_course_structure_version(module.course_id)
         return True
 
     if direction == "down":
         target = module.next_module
         if not target or target.course_id != module.course_id:
             return False
-        _swap_adjacent(module, target, "previous_module", "next_module")
+        _swap_adjacent(module, target, "previous_module", "next_module", "order")
+        bump_course_structure_version(module.course_id)
         return True
 
     return False
 
 
+def _unlink(node, prev_attr: str, next_attr: str) -> None:
+    """Bridge the neighbours of ``node`` so the chain skips it (one bulk UPDATE)."""
+    model = type(node)
+    prev_id, next_id = f"{prev_attr}_id", f"{next_attr}_id"
+    before_pk, after_pk = (
+        model.objects.filter(pk=node.pk).values_list(prev_id, next_id).get()
+    )
+    neighbours = model.objects.in_bulk({before_pk, after_pk} - {None})
+    before = neighbours.get(before_pk)
+    after = neighbours.get(after_pk)
+
+    if before is not None:
+        setattr(before, next_id, after.pk if after else None)
+    if after is not None:
+        setattr(after, prev_id, before.pk if before else None)
+    if neighbours:
+        model.objects.bulk_update(list(neighbours.values()), [prev_id, next_id])
+
+
+@transaction.atomic
+def remove_module(module: Module) -> None:
+    """Delete a module, reconnecting its neighbours instead of rebuilding the chain."""
+    _unlink(module, "previous_module", "next_module")
+    module.delete()
+
+
+@transaction.atomic
+def remove_content(content: Content) -> None:
+    """Delete a content block, reconnecting its neighbours."""
+    _unlink(content, "previous_content", "next_content")
+    content.delete()
+
+
 @transaction.atomic
 def move_content(content: Content, direction: str) -> bool:
     """Move a content block one position up or down inside its module."""
     content = Content.objects.select_related(
-        "previous_content", "next_content", "module"
-    ).get(pk=content.pk)
-    rebuild_content_chain(content.module)
-    content = Content.objects.select_related(
-        "previous_content", "next_content", "module"
+        "previous_content__previous_content", "next_content__next_content"
     ).get(pk=content.pk)
 
     direction = direction.lower()
@@ -224,16 +357,64 @@ def move_content(content: Content, direction: str) -> bool:
         target = content.previous_content
         if not target or target.module_id != content.module_id:
             return False
-        _swap_adjacent(target, content, "previous_content", "next_content")
-        rebuild_content_chain(content.module)
+        _swap_adjacent(target, content, "previous_content", "next_content", "order")
         return True
 
     if direction == "down":
         target = content.next_content
         if not target or target.module_id != content.module_id:
             return False
-        _swap_adjacent(content, target, "previous_content", "next_content")
-        rebuild_content_chain(content.module)
+        _swap_adjacent(content, target, "previous_content", "next_content", "order")
         return True
 
     return False
+
+
+def _counter_subqueries():
+    """
+    Correlated subqueries ``(real_modules, real_contents)`` with the real
+    module/content totals of a course.
+    """
+    modules_total = (
+        Module.objects.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    contents_total = (
+        Content.objects.filter(module__course=OuterRef("pk"))
+        .order_by()
+        .values("module__course")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return (
+        Coalesce(Subquery(modules_total, output_field=IntegerField()), Value(0)),
+        Coalesce(Subquery(contents_total, output_field=IntegerField()), Value(0)),
+    )
+
+
+def find_course_counter_drift(course_ids: Optional[Iterable[int]] = None):
+    """Return courses whose stored modules/contents counters disagree with the tables."""
+    queryset = Course.objects.all()
+    if course_ids is not None:
+        queryset = queryset.filter(pk__in=list(course_ids))
+
+    real_modules, real_contents = _counter_subqueries()
+    return list(
+        queryset.annotate(real_modules=real_modules, real_contents=real_contents)
+        .exclude(modules_count=F("real_modules"), contents_count=F("real_contents"))
+        .values("pk", "modules_count", "contents_count", "real_modules", "real_contents")
+        .order_by("pk")
+    )
+
+
+def rebuild_course_counters(course_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute ``modules_count``/``contents_count`` with one set-based UPDATE."""
+    queryset = Course.objects.all()
+    if course_ids is not None:
+        queryset = queryset.filter(pk__in=list(course_ids))
+
+    real_modules, real_contents = _counter_subqueries()
+    return queryset.update(modules_count=real_modules, contents_count=real_contents)
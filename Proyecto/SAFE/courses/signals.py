@@ -0,0 +1,72 @@
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Content, Course, Module
+from .services import bump_course_structure_version
+
+
+def _origin_model(origin):
+    """Model that started a delete (instance or queryset)."""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _shift_counter(course_filter, field: str, delta: int) -> None:
+    """Apply ``delta`` to a Course counter with a single UPDATE (never below 0)."""
+    Course.objects.filter(**course_filter).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+@receiver(post_save, sender=Module)
+def increment_modules_count(sender, instance, created, **kwargs):
+    if created:
+        _shift_counter({"pk": instance.course_id}, "modules_count", 1)
+
+
+@receiver(post_delete, sender=Module)
+def decrement_modules_count(sender, instance, **kwargs):
+    _shift_counter({"pk": instance.course_id}, "modules_count", -1)
+
+
+@receiver(post_save, sender=Content)
+def increment_contents_count(sender, instance, created, **kwargs):
+    if created:
+        _shift_counter({"modules__pk": instance.module_id}, "contents_count", 1)
+
+
+@receiver(post_delete, sender=Content)
+def decrement_contents_count(sender, instance, **kwargs):
+    # En borrados en cascada el módulo aún existe cuando se emite esta señal
+    _shift_counter({"modules__pk": instance.module_id}, "contents_count", -1)
+
+
+# Altas y bajas de módulos o contenidos cambian qué módulos quedan desbloqueados
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_structure_on_module_change(sender, instance, **kwargs):
+    if kwargs.get("created", True):
+        bump_course_structure_version(instance.course_id)
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_structure_on_content_change(sender, instance, **kwargs):
+    if not kwargs.get("created", True):
+        return
+    origin = kwargs.get("origin")
+    if origin is not None and _origin_model(origin) is not Content:
+        # Borrado en cascada: el módulo o curso de origen ya invalida
+        return
+
+    if Content.module.is_cached(instance):
+        course_id = instance.module.course_id
+    else:
+        course_id = (
+            Module.objects.filter(pk=instance.module_id)
+            .values_list("course_id", flat=True)
+            .first()
+        )
+    if course_id is not None:
+        bump_course_structure_version(course_id)
@@ -0,0 +1,47 @@
+from urllib.parse import urlencode
+
+from django import template
+from django.urls import reverse
+
+from courses.models import Content
+from courses.thumbnails import THUMBNAIL_FORMATS, derivative_name
+
+register = template.Library()
+
+
+def _picture_sources(obj, preset):
+    """URLs per format of an object's image, or only the original when it has no thumbnails."""
+    if isinstance(obj, Content):
+        # Los materiales se sirven siempre a través de la vista con control de acceso
+        base_url = reverse("serve_material", args=[obj.pk])
+        digest = obj.material.file_digest if obj.material else ""
+        if not digest:
+            return base_url, {}
+        return base_url, {
+            fmt: f"{base_url}?{urlencode({'size': preset, 'format': fmt, 'v': digest})}"
+            for fmt in THUMBNAIL_FORMATS
+        }
+
+    field_file = obj.header_img
+    if not obj.header_img_digest:
+        return field_file.url, {}
+    return field_file.url, {
+        fmt: field_file.storage.url(derivative_name(obj.header_img_digest, preset, fmt))
+        for fmt in THUMBNAIL_FORMATS
+    }
+
+
+@register.inclusion_tag("courses/includes/picture.html")
+def picture(obj, preset, alt="", css_class="", style=""):
+    """
+    Render a <picture> with the WebP and JPEG thumbnails of a course or path
+    header (``obj.header_img``) or of a content's image material.
+    """
+    original, sources = _picture_sources(obj, preset)
+    return {
+        "webp_src": sources.get("webp"),
+        "src": sources.get("jpg", original),
+        "alt": alt,
+        "css_class": css_class,
+        "style": style,
+    }
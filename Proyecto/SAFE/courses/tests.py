@@ -1,18 +1,63 @@
-
+import io
+import json
+import os
+import tempfile
 import unittest
-from courses.views import parse_evaluacion, is_txt_file
+import zipfile
+from io import StringIO
+from courses.views import (
+    is_txt_file,
+    parse_evaluacion,
+    serve_material,
+)
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from accounts.models import AppUser
+from enrollments.models import ContentProgress, CourseInscription
+from enrollments.services import store_submission
 
-from .models import Content, Course, Module
+from .exams import EXAM_SCHEMA_VERSION, canonicalize_exam_questions, get_exam_questions
+from .grading import (
+    compact_results,
+    compile_exam,
+    encode_selection,
+    expand_results,
+    score_mask,
+)
+from .models import Content, Course, Exam, Material, Module
 from .services import (
     append_content_to_module,
     append_module_to_course,
+    find_course_counter_drift,
     get_ordered_contents,
     get_ordered_modules,
     move_content,
     move_module,
+    rebuild_module_chain,
+    remove_content,
+    remove_module,
+    set_content_order,
+    set_module_order,
 )
+from .thumbnails import derivative_name
+
+# Caché en memoria, como Redis en docker-compose: las pruebas que cuentan
+# consultas miden solo el SQL de la aplicación. El coste con la caché en base
+# de datos (el respaldo por defecto) se mide aparte.
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 
 # Create your tests here.
 class TestParseEvaluacion(unittest.TestCase):
@@ -133,6 +178,7 @@ class TestIsTxtFile(unittest.TestCase):
                 self.assertEqual(is_txt_file(entrada), esperado)
 
 
+@override_settings(CACHES=LOCMEM_CACHES)
 class OrderingServicesTests(TestCase):
     def setUp(self):
         self.course = Course.objects.create(name="Course A")
@@ -189,6 +235,34 @@ class OrderingServicesTests(TestCase):
         self.assertEqual(m3.previous_module, m1)
         self.assertIsNone(m3.next_module)
 
+    def test_module_positions_are_gap_based(self):
+        m2 = append_module_to_course(self.course, Module(name="Module 2"))
+        self.assertEqual(
+            [Module.ORDER_GAP, 2 * Module.ORDER_GAP],
+            [m.order for m in get_ordered_modules(self.course)],
+        )
+
+        # Un único SELECT de módulos (más el prefetch de contenidos)
+        with self.assertNumQueries(2):
+            self.assertEqual([self.module, m2], get_ordered_modules(self.course))
+
+        # Intercambiar dos módulos: un SELECT y un UPDATE (dentro de un savepoint)
+        with self.assertNumQueries(4):
+            self.assertTrue(move_module(m2, "up"))
+        self.assertEqual([m2, self.module], get_ordered_modules(self.course))
+
+    def test_remove_module_bridges_neighbours(self):
+        m2 = append_module_to_course(self.course, Module(name="Module 2"))
+        m3 = append_module_to_course(self.course, Module(name="Module 3"))
+
+        remove_module(m2)
+
+        self.module.refresh_from_db()
+        m3.refresh_from_db()
+        self.assertEqual(m3, self.module.next_module)
+        self.assertEqual(self.module, m3.previous_module)
+        self.assertEqual([self.module, m3], rebuild_module_chain(self.course))
+
     def test_append_content_sets_order_and_links(self):
         c1 = append_content_to_module(
             self.module,
@@ -279,3 +353,674 @@ class OrderingServicesTests(TestCase):
         self.assertEqual(c2.previous_content, c3)
         self.assertIsNone(c2.next_content)
 
+    def test_set_full_order_in_one_statement(self):
+        m2 = append_module_to_course(self.course, Module(name="Module 2"))
+        m3 = append_module_to_course(self.course, Module(name="Module 3"))
+        contents = [
+            append_content_to_module(
+                self.module,
+                Content(title=title, content_type=Content.ContentType.MATERIAL),
+            )
+            for title in ("One", "Two", "Three")
+        ]
+
+        # SELECT del curso completo + un único UPDATE (dentro de un savepoint)
+        with self.assertNumQueries(4):
+            set_module_order(self.course, [m3.pk, self.module.pk, m2.pk])
+        self.assertEqual([m3, self.module, m2], get_ordered_modules(self.course))
+        self.assertEqual([m3, self.module, m2], rebuild_module_chain(self.course))
+
+        c1, c2, c3 = contents
+        set_content_order(self.module, [c3.pk, c1.pk, c2.pk])
+        ordered = get_ordered_contents(self.module)
+        self.assertEqual([c3, c1, c2], ordered)
+        self.assertEqual([1, 2, 3], [c.order for c in ordered])
+
+        with self.assertRaises(ValueError):
+            set_content_order(self.module, [c1.pk, c2.pk])
+
+        # Mover un contenido solo toca la pareja y sus vecinos
+        with self.assertNumQueries(4):
+            self.assertTrue(move_content(c1, "up"))
+        self.assertEqual([c1, c3, c2], get_ordered_contents(self.module))
+
+        remove_content(c3)
+        c1.refresh_from_db()
+        c2.refresh_from_db()
+        self.assertEqual(c2, c1.next_content)
+        self.assertEqual(c1, c2.previous_content)
+
+class CourseCountersTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name="Counters")
+        self.module = append_module_to_course(self.course, Module(name="M1"))
+        for title in ("A", "B"):
+            append_content_to_module(
+                self.module,
+                Content(title=title, content_type=Content.ContentType.MATERIAL),
+            )
+
+    def test_counters_follow_writes(self):
+        self.course.refresh_from_db()
+        self.assertEqual(1, self.course.modules_count)
+        self.assertEqual(2, self.course.contents_count)
+
+        self.module.contents.first().delete()
+        self.course.refresh_from_db()
+        self.assertEqual(1, self.course.contents_count)
+
+        self.module.delete()
+        self.course.refresh_from_db()
+        self.assertEqual(0, self.course.modules_count)
+        self.assertEqual(0, self.course.contents_count)
+
+    def test_rebuild_command_fixes_drift(self):
+        Course.objects.filter(pk=self.course.pk).update(
+            modules_count=7, contents_count=0
+        )
+        self.assertEqual(1, len(find_course_counter_drift()))
+        with self.assertRaises(CommandError):
+            call_command("rebuild_course_counters", "--check", stdout=StringIO())
+
+        call_command("rebuild_course_counters", stdout=StringIO())
+        self.course.refresh_from_db()
+        self.assertEqual(1, self.course.modules_count)
+        self.assertEqual(2, self.course.contents_count)
+        self.assertEqual([], find_course_counter_drift())
+
+
+@override_settings(
+    STORAGES={
+        **settings.STORAGES,
+        "submissions": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    }
+)
+class SubmissionDownloadTests(TestCase):
+    PAYLOAD = bytes(range(256)) * 400
+
+    def setUp(self):
+        User = get_user_model()
+        self.analyst = User.objects.create_user(
+            username="descargas",
+            email="descargas@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        learner = User.objects.create_user(
+            username="alumno",
+            email="alumno@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        course = Course.objects.create(name="Curso Entregas")
+        module = Module.objects.create(course=course, name="Módulo")
+        self.content = Content.objects.create(
+            module=module, title="Tarea", content_type=Content.ContentType.ASSIGNMENT
+        )
+        inscription = CourseInscription.objects.create(app_user=learner, course=course)
+        self.progress = ContentProgress.objects.create(
+            content=self.content, course_inscription=inscription
+        )
+        store_submission(self.progress, SimpleUploadedFile("tarea.bin", self.PAYLOAD))
+        self.url = reverse("download_submission", args=[self.progress.pk])
+        self.client.force_login(self.analyst)
+
+    def test_full_download_streams_file_with_etag(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.PAYLOAD)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_range_request_returns_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=100-199")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.PAYLOAD)}")
+        self.assertEqual(b"".join(response.streaming_content), self.PAYLOAD[100:200])
+
+        suffix = self.client.get(self.url, HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(suffix.streaming_content), self.PAYLOAD[-10:])
+
+        invalid = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.PAYLOAD)}-")
+        self.assertEqual(invalid.status_code, 416)
+
+    def test_zip_contains_every_submission(self):
+        response = self.client.get(
+            reverse("download_assignment_submissions", args=[self.content.pk])
+        )
+
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        [name] = archive.namelist()
+        self.assertTrue(name.startswith(f"{self.progress.pk}_alumno_tarea"))
+        self.assertEqual(archive.read(name), self.PAYLOAD)
+
+
+@override_settings(
+    STORAGES={
+        **settings.STORAGES,
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    }
+)
+class ProtectedMaterialTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.learner = User.objects.create_user(
+            username="viewer",
+            email="viewer@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        self.course = Course.objects.create(name="Curso Video")
+        module = Module.objects.create(course=self.course, name="Módulo")
+        material = Material(type=Material.MaterialType.MP4)
+        material.file.save("clase.mp4", SimpleUploadedFile("clase.mp4", b"v" * 5000))
+        self.content = Content.objects.create(
+            module=module,
+            title="Clase",
+            content_type=Content.ContentType.MATERIAL,
+            block_type=Content.BlockType.VIDEO,
+            material=material,
+        )
+        self.url = reverse("serve_material", args=[self.content.pk])
+        self.client.force_login(self.learner)
+
+    def test_requires_access_to_the_course(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        CourseInscription.objects.create(app_user=self.learner, course=self.course)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-99")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(len(b"".join(response.streaming_content)), 100)
+
+    @override_settings(PROTECTED_MEDIA_SERVER="nginx")
+    def test_transfer_is_delegated_to_the_proxy(self):
+        CourseInscription.objects.create(app_user=self.learner, course=self.course)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["X-Accel-Redirect"],
+            "/protected-media/" + self.content.material.file.name,
+        )
+        self.assertEqual(response.content, b"")
+
+
+class LargeMaterialRangeTests(TestCase):
+    """Rangos sobre un video de 300 MB (archivo disperso: no ocupa disco)."""
+
+    SIZE = 300 * 1024 * 1024
+
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings_override = override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                "default": {
+                    "BACKEND": "django.core.files.storage.FileSystemStorage",
+                    "OPTIONS": {"location": self.media.name},
+                },
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        path = os.path.join(self.media.name, "largo.mp4")
+        with open(path, "wb") as handle:
+            handle.truncate(self.SIZE)
+            handle.seek(self.SIZE - 4)
+            handle.write(b"tail")
+
+        self.analyst = analyst = get_user_model().objects.create_user(
+            username="video-analyst",
+            email="video-analyst@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        course = Course.objects.create(name="Curso Largo")
+        module = Module.objects.create(course=course, name="Módulo")
+        material = Material.objects.create(type=Material.MaterialType.MP4, file="largo.mp4")
+        content = Content.objects.create(
+            module=module,
+            title="Video",
+            content_type=Content.ContentType.MATERIAL,
+            block_type=Content.BlockType.VIDEO,
+            material=material,
+        )
+        self.content_pk = content.pk
+        self.url = reverse("serve_material", args=[content.pk])
+        self.client.force_login(analyst)
+
+    def _serve(self, **headers):
+        request = RequestFactory().get(self.url, **headers)
+        request.user = self.analyst
+        response = serve_material(request, self.content_pk)
+        self.addCleanup(response.close)
+        return response
+
+    def test_full_response_declares_size_and_is_sendfile_capable(self):
+        response = self._serve()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response["Content-Length"]), self.SIZE)
+        # fileno permite a gunicorn/uWSGI enviar el archivo con os.sendfile
+        self.assertIsInstance(response.file_to_stream.fileno(), int)
+
+    def test_range_at_the_end_of_the_file(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={self.SIZE - 8}-")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Length"], "8")
+        self.assertEqual(
+            response["Content-Range"], f"bytes {self.SIZE - 8}-{self.SIZE - 1}/{self.SIZE}"
+        )
+        self.assertEqual(b"".join(response.streaming_content), b"\0\0\0\0tail")
+
+        partial = self._serve(HTTP_RANGE="bytes=1024-2047")
+        self.assertEqual(partial.file_to_stream.read(), b"\0" * 1024)
+        self.assertIsInstance(partial.file_to_stream.fileno(), int)
+
+    def test_stale_if_range_returns_the_whole_file(self):
+        response = self.client.get(
+            self.url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"otro-etag"'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response["Content-Length"]), self.SIZE)
+        response.close()
+
+
+def _jpeg(size, name="portada.jpg"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(
+    THUMBNAILS_ASYNC=False,
+    FILE_CLEANUP_ASYNC=False,
+    STORAGES={
+        **settings.STORAGES,
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    },
+)
+class ThumbnailPipelineTests(TestCase):
+    def _derivative_size(self, digest, preset, fmt):
+        with default_storage.open(derivative_name(digest, preset, fmt), "rb") as handle:
+            return Image.open(handle).size
+
+    def test_upload_generates_sized_derivatives_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(name="Curso", header_img=_jpeg((2000, 1000)))
+
+        course.refresh_from_db()
+        digest = course.header_img_digest
+        self.assertEqual(len(digest), 16)
+        # "card" cubre 640x360 sin recortar; "block" cabe en 1280x1280
+        self.assertEqual(self._derivative_size(digest, "card", "webp"), (720, 360))
+        self.assertEqual(self._derivative_size(digest, "block", "jpg"), (1280, 640))
+
+        html = Template("{% load image_extras %}{% picture course 'card' alt=course.name %}").render(
+            Context({"course": course})
+        )
+        self.assertIn(default_storage.url(derivative_name(digest, "card", "webp")), html)
+        self.assertIn(default_storage.url(derivative_name(digest, "card", "jpg")), html)
+
+    def test_new_upload_drops_stale_digest_until_regenerated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = Course.objects.create(name="Curso", header_img=_jpeg((800, 600)))
+        course.refresh_from_db()
+        old_digest = course.header_img_digest
+        self.assertTrue(old_digest)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.header_img = _jpeg((900, 600), "otra.jpg")
+            course.save()
+            self.assertEqual(Course.objects.get(pk=course.pk).header_img_digest, "")
+
+        course.refresh_from_db()
+        self.assertNotIn(course.header_img_digest, ("", old_digest))
+
+    def test_material_thumbnail_is_served_with_immutable_cache(self):
+        analyst = get_user_model().objects.create_user(
+            username="thumb-analyst",
+            email="thumb-analyst@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        course = Course.objects.create(name="Curso Imagen")
+        module = Module.objects.create(course=course, name="Módulo")
+        with self.captureOnCommitCallbacks(execute=True):
+            material = Material.objects.create(file=_jpeg((3000, 2000), "foto.jpg"))
+        material.refresh_from_db()
+        content = Content.objects.create(
+            module=module,
+            title="Foto",
+            content_type=Content.ContentType.MATERIAL,
+            block_type=Content.BlockType.IMAGE,
+            material=material,
+        )
+        self.client.force_login(analyst)
+
+        response = self.client.get(
+            reverse("serve_material", args=[content.pk]),
+            {"size": "block", "format": "webp", "v": material.file_digest},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        body = b"".join(response.streaming_content)
+        self.assertEqual(Image.open(io.BytesIO(body)).size, (1280, 853))
+
+    def test_command_regenerates_existing_images_and_prunes_orphans(self):
+        name = default_storage.save("portada.jpg", _jpeg((400, 300)))
+        course = Course.objects.create(name="Curso", header_img=name)
+        orphan = default_storage.save(
+            derivative_name("0" * 16, "card", "jpg"), ContentFile(b"x")
+        )
+
+        call_command("regenerate_thumbnails", "--prune", stdout=StringIO())
+
+        course.refresh_from_db()
+        self.assertTrue(
+            default_storage.exists(derivative_name(course.header_img_digest, "card", "jpg"))
+        )
+        self.assertFalse(default_storage.exists(orphan))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExamQuestionCacheTests(TestCase):
+    LEGACY = json.dumps(
+        [
+            {
+                "texto": "¿2 + 2?",
+                "opciones": [
+                    {"texto": "4", "es_correcta": True},
+                    {"texto": "5"},
+                ],
+            }
+        ]
+    )
+
+    def test_save_stores_versioned_canonical_questions(self):
+        exam = Exam.objects.create(questions=self.LEGACY)
+
+        self.assertEqual(exam.canonical_questions["v"], EXAM_SCHEMA_VERSION)
+        self.assertEqual(
+            exam.canonical_questions["questions"],
+            [
+                {
+                    "id": "0",
+                    "text": "¿2 + 2?",
+                    "options": [
+                        {"id": "0", "text": "4", "is_correct": True},
+                        {"id": "1", "text": "5", "is_correct": False},
+                    ],
+                    "allows_multiple": False,
+                }
+            ],
+        )
+
+    def test_legacy_rows_are_normalized_until_canonicalized(self):
+        exam = Exam.objects.create(questions=self.LEGACY)
+        Exam.objects.filter(pk=exam.pk).update(canonical_questions=None)
+
+        call_command("canonicalize_exams", stdout=StringIO())
+
+        exam.refresh_from_db()
+        self.assertEqual(exam.canonical_questions["v"], EXAM_SCHEMA_VERSION)
+
+    def test_take_exam_skips_question_columns_on_cache_hit(self):
+        user = get_user_model().objects.create_user(
+            username="exam-analyst",
+            email="exam-analyst@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.ANALISTA_TH,
+        )
+        module = Module.objects.create(course=Course.objects.create(name="Curso"), name="Examen")
+        exam = Exam.objects.create(questions=self.LEGACY)
+        content = Content.objects.create(
+            module=module,
+            title="Examen final",
+            content_type=Content.ContentType.EXAM,
+            block_type=Content.BlockType.QUIZ,
+            exam=exam,
+        )
+        self.client.force_login(user)
+        url = reverse("take_exam", args=[content.pk])
+
+        with CaptureQueriesContext(connection) as first:
+            self.assertContains(self.client.get(url), "¿2 + 2?")
+        with CaptureQueriesContext(connection) as second:
+            self.assertContains(self.client.get(url), "¿2 + 2?")
+        # Sin la carga diferida de canonical_questions
+        self.assertEqual(len(second), len(first) - 1)
+
+        exam.questions = [{"text": "¿3 + 3?", "answers": [{"text": "6", "correct": True}]}]
+        exam.save(update_fields=["questions"])
+        self.assertContains(self.client.get(url), "¿3 + 3?")
+        self.assertEqual(get_exam_questions(exam)[0]["text"], "¿3 + 3?")
+
+
+# Calificación pregunta a pregunta (la anterior a courses.grading): referencia
+# para las máscaras de bits y generador de resultados en el formato antiguo
+def evaluate_exam_submission(questions, submitted_answers):
+    """
+    Evalúa la selección del usuario.
+    submitted_answers: dict de question_id -> set(option_id)
+    """
+    results = []
+    correct_count = 0
+
+    for q in questions:
+        qid = q.get("id")
+        # Convertir la selección del usuario a set solo para comparar,
+        # pero no guardar sets en los resultados (JSONField).
+        selected = set(submitted_answers.get(qid, []))
+        correct_ids = {
+            opt["id"] for opt in q.get("options", []) if opt.get("is_correct")
+        }
+
+        is_correct = selected == correct_ids and (correct_ids or not selected)
+        if is_correct:
+            correct_count += 1
+
+        results.append(
+            {
+                "question_id": qid,
+                "question": q.get("text", ""),
+                "selected": list(selected),
+                "correct_ids": list(correct_ids),
+                "is_correct": is_correct,
+                "options": q.get("options", []),
+            }
+        )
+
+    total = len(questions)
+    return correct_count, total, results
+
+
+class BatchGradingTests(TestCase):
+    QUESTIONS = [
+        {"text": "Una", "options": [{"text": "a", "is_correct": True}, {"text": "b"}]},
+        {
+            "text": "Varias",
+            "options": [
+                {"text": "a", "is_correct": True},
+                {"text": "b", "is_correct": True},
+                {"text": "c"},
+            ],
+        },
+        {"text": "Ninguna", "options": [{"text": "a"}]},
+    ]
+
+    def test_bitmask_scores_match_per_question_grading(self):
+        questions = canonicalize_exam_questions(self.QUESTIONS)
+        compiled = compile_exam(questions)
+        submissions = [
+            {"0": ["0"], "1": ["0", "1"], "2": []},
+            {"0": ["1"], "1": ["0"], "2": ["0"]},
+            {"0": ["0", "1"], "1": ["1", "0"]},
+            {"0": ["9"], "1": ["0", "1", "9"], "2": []},
+            {},
+        ]
+
+        for submission in submissions:
+            expected = evaluate_exam_submission(questions, submission)[0]
+            self.assertEqual(
+                score_mask(compiled, encode_selection(compiled, submission)),
+                expected,
+                submission,
+            )
+
+    def test_regrade_applies_a_fixed_answer_key(self):
+        exam = Exam.objects.create(questions=self.QUESTIONS)
+        course = Course.objects.create(name="Curso")
+        module = Module.objects.create(course=course, name="Examen")
+        content = Content.objects.create(
+            module=module,
+            title="Examen",
+            content_type=Content.ContentType.EXAM,
+            block_type=Content.BlockType.QUIZ,
+            exam=exam,
+        )
+        learner = get_user_model().objects.create_user(
+            username="regrade", email="regrade@example.com", password="pass1234A!"
+        )
+        inscription = CourseInscription.objects.create(app_user=learner, course=course)
+        compact = ContentProgress.objects.create(
+            content=content,
+            course_inscription=inscription,
+            score=2,
+            results=compact_results(exam, {"0": ["1"], "1": ["0", "1"], "2": []}),
+        )
+        # Formato anterior: una entrada completa por pregunta
+        score, _total, results = evaluate_exam_submission(
+            get_exam_questions(exam), {"0": ["1"], "1": ["0"]}
+        )
+        legacy = ContentProgress.objects.create(
+            content=Content.objects.create(
+                module=module,
+                title="Examen (copia)",
+                content_type=Content.ContentType.EXAM,
+                block_type=Content.BlockType.QUIZ,
+                exam=exam,
+            ),
+            course_inscription=inscription,
+            score=score,
+            results=json.loads(json.dumps(results, default=list)),
+        )
+        self.assertEqual(score, 1)
+
+        call_command("compact_exam_results", stdout=StringIO())
+
+        legacy = ContentProgress.objects.with_results().get(pk=legacy.pk)
+        self.assertEqual(legacy.score, 1)
+        self.assertEqual(
+            legacy.results, {"exam_version": None, "selected": {"0": ["1"], "1": ["0"]}}
+        )
+        answered_version = compact.results["exam_version"]
+
+        # Corrección de la clave: la opción "b" era la correcta en la primera pregunta
+        fixed = json.loads(json.dumps(self.QUESTIONS))
+        fixed[0]["options"][0]["is_correct"] = False
+        fixed[0]["options"][1]["is_correct"] = True
+        exam.questions = fixed
+        exam.save()
+
+        call_command("regrade_exams", "--exam", str(exam.pk), stdout=StringIO())
+
+        compact = ContentProgress.objects.with_results().get(pk=compact.pk)
+        self.assertEqual(compact.score, 3)
+        # Se conserva la versión sobre la que se respondió
+        self.assertEqual(compact.results["exam_version"], answered_version)
+        expanded = expand_results(exam, compact.results)
+        self.assertTrue(expanded.outdated)
+        self.assertEqual(
+            [q["result"]["is_correct"] for q in expanded.questions], [True, True, True]
+        )
+        self.assertEqual(expanded.questions[0]["result"]["correct_ids"], ["1"])
+
+        legacy = ContentProgress.objects.with_results().get(pk=legacy.pk)
+        self.assertEqual(legacy.score, 2)
+        self.assertIsNone(legacy.results["exam_version"])
+
+
+class ExamAnswerKeyTests(TestCase):
+    def setUp(self):
+        self.learner = get_user_model().objects.create_user(
+            username="answer-key",
+            email="answer-key@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        course = Course.objects.create(name="Curso")
+        self.inscription = CourseInscription.objects.create(
+            app_user=self.learner, course=course
+        )
+        self.content = Content.objects.create(
+            module=Module.objects.create(course=course, name="Examen"),
+            title="Examen",
+            content_type=Content.ContentType.EXAM,
+            block_type=Content.BlockType.QUIZ,
+            exam=Exam.objects.create(questions=BatchGradingTests.QUESTIONS),
+        )
+        self.url = reverse("take_exam", args=[self.content.pk])
+        self.client.force_login(self.learner)
+
+    def test_rendered_questions_leave_out_the_answer_key(self):
+        response = self.client.get(self.url)
+
+        self.assertContains(response, "Varias")
+        for question in response.context["questions"]:
+            for option in question["options"]:
+                self.assertNotIn("is_correct", option)
+        self.assertNotContains(response, "Correcta")
+
+    def test_submission_is_graded_against_the_cached_key(self):
+        self.client.get(self.url)
+        response = self.client.post(
+            self.url, {"q-0": ["0"], "q-1": ["1", "0"], "q-2": ["0"]}
+        )
+
+        self.assertEqual(response.context["score"], 2)
+        self.assertContains(response, "Correcta")
+        progress = ContentProgress.objects.with_results().get(
+            course_inscription=self.inscription
+        )
+        self.assertEqual(progress.score, 2)
+        # Solo las opciones elegidas y la versión del examen
+        self.assertEqual(
+            progress.results,
+            {
+                "exam_version": self.content.exam.questions_hash,
+                "selected": {"0": ["0"], "1": ["1", "0"], "2": ["0"]},
+            },
+        )
+        expanded = expand_results(self.content.exam, progress.results)
+        self.assertEqual((expanded.score, expanded.total), (2, 3))
+        self.assertFalse(expanded.outdated)
+        self.assertEqual(
+            [q["result"]["is_correct"] for q in expanded.questions], [True, True, False]
+        )
+
+    def test_editing_exam_settings_keeps_the_version(self):
+        self.client.post(self.url, {"q-0": ["0"], "q-1": ["1", "0"], "q-2": ["0"]})
+        exam = self.content.exam
+        exam.max_tries = 3
+        exam.save()
+
+        progress = ContentProgress.objects.with_results().get(
+            course_inscription=self.inscription
+        )
+        self.assertEqual(progress.results["exam_version"], exam.questions_hash)
+        self.assertFalse(expand_results(exam, progress.results).outdated)
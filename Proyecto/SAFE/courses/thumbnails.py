@@ -0,0 +1,141 @@
+import hashlib
+import io
+import logging
+from typing import Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .background import run_in_background
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "derivados"
+DIGEST_LENGTH = 16
+THUMBNAIL_QUALITY = 80
+
+# Tamaño de cada derivada: "cover" garantiza que la imagen cubra la caja
+# (tarjetas con object-fit: cover), "contain" que quepa dentro de ella.
+THUMBNAIL_PRESETS = {
+    "card": ((640, 360), "cover"),
+    "block": ((1280, 1280), "contain"),
+}
+THUMBNAIL_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+
+def derivative_name(digest: str, preset: str, fmt: str) -> str:
+    """
+    Storage name of a derivative. It depends only on the source bytes, so
+    the URL never changes while the image stays the same and can be cached
+    indefinitely; a new upload gets a new name.
+    """
+    return f"{DERIVATIVES_DIR}/{digest[:2]}/{digest}-{preset}.{fmt}"
+
+
+def derivative_file(field_file, digest: str, preset: str, fmt: str):
+    """FieldFile pointing to a derivative in the same storage as ``field_file``."""
+    return type(field_file)(
+        field_file.instance, field_file.field, derivative_name(digest, preset, fmt)
+    )
+
+
+def _target_size(image, preset: str):
+    (box_w, box_h), mode = THUMBNAIL_PRESETS[preset]
+    width, height = image.size
+    ratios = (box_w / width, box_h / height)
+    scale = min(1.0, max(ratios) if mode == "cover" else min(ratios))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def render_derivative(image: Image.Image, preset: str, fmt: str) -> bytes:
+    """Resize and recompress an already oriented RGB image."""
+    size = _target_size(image, preset)
+    resized = image if size == image.size else image.resize(size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(
+        buffer, THUMBNAIL_FORMATS[fmt], quality=THUMBNAIL_QUALITY, optimize=True
+    )
+    return buffer.getvalue()
+
+
+def generate_derivatives(field_file, force: bool = False) -> str:
+    """
+    Write every preset/format derivative of ``field_file`` next to it in its
+    storage and return the source digest. Derivatives that already exist are
+    reused unless ``force`` is given.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, "rb") as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+    image: Optional[Image.Image] = None
+    for preset in THUMBNAIL_PRESETS:
+        for fmt in THUMBNAIL_FORMATS:
+            name = derivative_name(digest, preset, fmt)
+            if storage.exists(name):
+                if not force:
+                    continue
+                storage.delete(name)
+            if image is None:
+                source_image = Image.open(io.BytesIO(data))
+                # JPEG: decodifica directamente a menor escala cuando es posible
+                source_image.draft("RGB", THUMBNAIL_PRESETS["block"][0])
+                image = ImageOps.exif_transpose(source_image).convert("RGB")
+            storage.save(name, ContentFile(render_derivative(image, preset, fmt)))
+    return digest
+
+
+def build_derivatives_for(
+    model_label: str, pk, field_name: str, digest_field: str, force: bool = False
+) -> Optional[str]:
+    """
+    Generate the derivatives of one instance's image and record the digest.
+
+    The digest is only written if the field still holds the same file, so a
+    slow job never overwrites the digest of a newer upload.
+    """
+    model = apps.get_model(model_label)
+    instance = model._base_manager.filter(pk=pk).only("pk", field_name).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+
+    try:
+        digest = generate_derivatives(field_file, force=force)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning(
+            "No se pudieron generar miniaturas de %s %s (%s)",
+            model_label,
+            pk,
+            field_file.name,
+            exc_info=True,
+        )
+        return None
+
+    model._base_manager.filter(pk=pk, **{field_name: field_file.name}).update(
+        **{digest_field: digest}
+    )
+    return digest
+
+
+def schedule_derivatives(instance, field_name: str, digest_field: str) -> None:
+    """
+    Queue derivative generation once the current transaction commits.
+
+    With ``THUMBNAILS_ASYNC`` the work runs in a background thread so the
+    upload request returns immediately; otherwise it runs inline.
+    """
+    args = (instance._meta.label, instance.pk, field_name, digest_field)
+
+    def submit():
+        if settings.THUMBNAILS_ASYNC:
+            run_in_background("thumbnails", build_derivatives_for, *args)
+        else:
+            build_derivatives_for(*args)
+
+    transaction.on_commit(submit)
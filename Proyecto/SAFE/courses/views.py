@@ -1,93 +1,60 @@
-import json
+import os
+from typing import List, Tuple
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.views.decorators.http import require_POST
 
 from accounts.models import AppUser
 from enrollments.models import ContentProgress, CourseInscription
 from enrollments.services import (
+    can_access_content,
     get_catalog_courses_for_user,
     get_contents_for_user_in_course,
     get_course_progress,
+    store_submission,
+    user_can_open_course,
 )
+from .downloads import (
+    iter_zip,
+    make_etag,
+    protected_file_response,
+    ranged_file_response,
+)
+from .exam_import import ExamImportError, iter_exam_questions
+from .exams import get_public_questions
+from .grading import compact_results, expand_results
 from .services import get_ordered_contents, get_ordered_modules
+from .thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_PRESETS, derivative_file
 from .forms import QuestionUploadForm
-from .models import Content, Course, Exam
-
-
-def _to_json_safe(value):
-    """
-    Convierte estructuras anidadas (listas, diccionarios, sets) a una forma
-    segura para JSONField (los sets se transforman en listas).
-    """
-    if isinstance(value, set):
-        return [_to_json_safe(v) for v in value]
-    if isinstance(value, list):
-        return [_to_json_safe(v) for v in value]
-    if isinstance(value, dict):
-        return {k: _to_json_safe(v) for k, v in value.items()}
-    return value
+from .models import Content, Course
 
 
 def parse_evaluacion(texto: str):
     """Parsea preguntas tipo 'Q:' y opciones 'O:' desde un texto."""
-    preguntas = []
-    pregunta_actual = None
-
-    for line in texto.splitlines():
-        line = line.strip()
-        if not line:
-            # Línea vacía: separador entre preguntas
-            continue
-
-        if line.startswith("Q:"):
-            # Guardar pregunta anterior, si había
-            if pregunta_actual is not None:
-                preguntas.append(pregunta_actual)
-
-            _, resto = line.split("Q:", 1)
-            qid, texto_preg = resto.split("|", 1)
-
-            pregunta_actual = {
-                "id": qid.strip(),
-                "texto": texto_preg.strip(),
-                "opciones": [],
-            }
-
-        elif line.startswith("O:"):
-            if pregunta_actual is None:
-                raise ValueError("Opción sin pregunta previa")
-
-            _, resto = line.split("O:", 1)
-            oid, texto_opt, flag = resto.split("|", 2)
-
-            es_correcta = flag.strip() == "1"
-
-            pregunta_actual["opciones"].append(
+    errors: List[Tuple[int, str]] = []
+    preguntas = [
+        {
+            "id": pregunta["id"],
+            "texto": pregunta["text"],
+            "opciones": [
                 {
-                    "id": oid.strip(),
-                    "texto": texto_opt.strip(),
-                    "es_correcta": es_correcta,
+                    "id": opcion["id"],
+                    "texto": opcion["text"],
+                    "es_correcta": opcion["is_correct"],
                 }
-            )
-
-        else:
-            raise ValueError(f"Línea con formato inválido: {line}")
-
-    # Agregar la última pregunta si existe
-    if pregunta_actual is not None:
-        preguntas.append(pregunta_actual)
-
-    # Validación extra: cada pregunta con al menos una correcta
-    for p in preguntas:
-        if not any(o["es_correcta"] for o in p["opciones"]):
-            raise ValueError(f"La pregunta '{p['id']}' no tiene opción correcta")
-
+                for opcion in pregunta["answers"]
+            ],
+        }
+        for pregunta in iter_exam_questions(texto.splitlines(), errors)
+    ]
+    if errors:
+        raise ExamImportError(errors)
     return preguntas
 
 
@@ -211,7 +178,6 @@ def course_detail_accessible(request, pk):
                 "visible": content.id in visible_ids
                 and selected_module_id in unlocked_ids,
                 "progress": cp,
-                "render_questions": normalize_exam_questions(content.exam),
             }
         )
 
@@ -230,7 +196,9 @@ def course_detail_accessible(request, pk):
 @require_POST
 def mark_content_complete(request, content_pk):
     """Marks a read-only content as completed for the current user."""
-    content = get_object_or_404(Content, pk=content_pk)
+    content = get_object_or_404(
+        Content.objects.select_related("module__course"), pk=content_pk
+    )
     course = content.module.course
 
     if (
@@ -252,8 +220,7 @@ def mark_content_complete(request, content_pk):
         )
         return redirect("course_detail_accessible", pk=course.id)
 
-    allowed_contents = get_contents_for_user_in_course(request.user, course)
-    if content not in allowed_contents:
+    if not can_access_content(request.user, content, inscription):
         messages.error(request, "Este contenido aún no está disponible.")
         return redirect("course_detail_accessible", pk=course.id)
 
@@ -275,7 +242,9 @@ def mark_content_complete(request, content_pk):
 @require_POST
 def submit_assignment(request, content_pk):
     """Allows a collaborator to upload an assignment file."""
-    content = get_object_or_404(Content, pk=content_pk)
+    content = get_object_or_404(
+        Content.objects.select_related("module__course"), pk=content_pk
+    )
     course = content.module.course
     if content.content_type != Content.ContentType.ASSIGNMENT:
         return HttpResponse(status=404)
@@ -287,8 +256,7 @@ def submit_assignment(request, content_pk):
     except CourseInscription.DoesNotExist:
         return HttpResponseForbidden()
 
-    allowed_contents = get_contents_for_user_in_course(request.user, course)
-    if content not in allowed_contents:
+    if not can_access_content(request.user, content, inscription):
         return HttpResponseForbidden()
 
     uploaded_file = request.FILES.get("file")
@@ -301,11 +269,7 @@ def submit_assignment(request, content_pk):
     progress, _created = ContentProgress.objects.get_or_create(
         content=content, course_inscription=inscription
     )
-    progress.file = uploaded_file.read()
-    progress.started_at = progress.started_at or timezone.now()
-    progress.completed_at = timezone.now()
-    progress.is_completed = True
-    progress.save(update_fields=["file", "started_at", "completed_at", "is_completed"])
+    store_submission(progress, uploaded_file)
     messages.success(request, "Tarea enviada correctamente.")
     return redirect(f"{request.META.get('HTTP_REFERER', request.build_absolute_uri())}")
 
@@ -335,6 +299,108 @@ def assignment_submissions(request, content_pk):
     )
 
 
+@login_required
+def serve_material(request, content_pk):
+    """Serve the material file of a content block to users who can open its course."""
+    content = get_object_or_404(
+        Content.objects.select_related("material", "module__course"), pk=content_pk
+    )
+    if not content.material or not content.material.file:
+        return HttpResponse(status=404)
+    if not user_can_open_course(request.user, content.module.course):
+        return HttpResponseForbidden()
+
+    material = content.material
+    field_file = material.file
+    preset = request.GET.get("size")
+    if preset in THUMBNAIL_PRESETS and material.file_digest:
+        fmt = request.GET.get("format")
+        field_file = derivative_file(
+            material.file,
+            material.file_digest,
+            preset,
+            fmt if fmt in THUMBNAIL_FORMATS else "jpg",
+        )
+
+    try:
+        response = protected_file_response(
+            request,
+            field_file,
+            as_attachment=request.GET.get("download") == "1",
+        )
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+
+    if field_file is not material.file and request.GET.get("v") == material.file_digest:
+        # Nombre con hash del contenido: la URL cambia si cambia la imagen
+        patch_cache_control(response, private=True, max_age=31536000, immutable=True)
+    return response
+
+
+@login_required
+def download_submission(request, progress_id):
+    """Stream one submission (Range and ETag aware) to an Analista TH or its author."""
+    progress = get_object_or_404(
+        ContentProgress.objects.select_related("course_inscription"), pk=progress_id
+    )
+    is_owner = progress.course_inscription.app_user_id == request.user.pk
+    if request.user.role != AppUser.UserRole.ANALISTA_TH and not is_owner:
+        return HttpResponseForbidden()
+    if not progress.submission:
+        return HttpResponse(status=404)
+
+    name = progress.submission.name
+    storage = progress.submission.storage
+    try:
+        size = storage.size(name)
+        file_obj = storage.open(name, "rb")
+    except FileNotFoundError:
+        return HttpResponse(status=404)
+
+    return ranged_file_response(
+        request,
+        file_obj,
+        size,
+        etag=make_etag(name, size, progress.completed_at),
+        filename=os.path.basename(name),
+    )
+
+
+@login_required
+def download_assignment_submissions(request, content_pk):
+    """Stream every submission of an assignment as a ZIP built on the fly."""
+    if request.user.role != AppUser.UserRole.ANALISTA_TH:
+        return HttpResponseForbidden()
+
+    content = get_object_or_404(Content, pk=content_pk)
+    if content.content_type != Content.ContentType.ASSIGNMENT:
+        return HttpResponse(status=404)
+
+    submissions = (
+        ContentProgress.objects.filter(content=content)
+        .exclude(submission="")
+        .exclude(submission__isnull=True)
+        .select_related("course_inscription__app_user")
+        .order_by("pk")
+    )
+
+    def entries():
+        for progress in submissions.iterator():
+            name = progress.submission.name
+            username = progress.course_inscription.app_user.username
+            try:
+                file_obj = progress.submission.storage.open(name, "rb")
+            except FileNotFoundError:
+                continue
+            yield f"{progress.pk}_{username}_{os.path.basename(name)}", file_obj
+
+    response = StreamingHttpResponse(iter_zip(entries()), content_type="application/zip")
+    response["Content-Disposition"] = (
+        f'attachment; filename="entregas_{content.pk}.zip"'
+    )
+    return response
+
+
 @login_required
 @require_POST
 def grade_assignment(request, progress_id):
@@ -362,20 +428,25 @@ def grade_assignment(request, progress_id):
 @login_required
 def take_exam(request, content_pk):
     """Permite responder un examen y registra progreso básico."""
-    content = get_object_or_404(Content, pk=content_pk)
+    content = get_object_or_404(
+        # Las preguntas salen de la caché; las columnas JSON solo se leen si falla
+        Content.objects.select_related("module__course", "exam").defer(
+            "exam__questions", "exam__canonical_questions"
+        ),
+        pk=content_pk,
+    )
     course = content.module.course
 
     # Validar que sea un examen y que el usuario tenga acceso al contenido
     if content.block_type != Content.BlockType.QUIZ or not content.exam:
         return HttpResponse(status=404)
 
-    permitted_contents = get_contents_for_user_in_course(request.user, course)
-    if content not in permitted_contents:
+    if not can_access_content(request.user, content):
         return HttpResponse(status=403)
 
-    questions = normalize_exam_questions(content.exam)
-    for q in questions:
-        q["result"] = None
+    # Solo se renderizan preguntas públicas; la clave de respuestas queda en
+    # el servidor y se usa ya compilada para corregir.
+    questions = get_public_questions(content.exam)
     if request.method == "GET":
         return render(
             request,
@@ -383,18 +454,11 @@ def take_exam(request, content_pk):
             {"course": course, "content": content, "questions": questions},
         )
 
-    # POST: evaluar
-    submitted = {}
-    for q in questions:
-        qid = q.get("id")
-        # Guardar siempre listas; la lógica de corrección
-        # internamente convierte a set cuando lo necesita.
-        submitted[qid] = request.POST.getlist(f"q-{qid}")
-
-    correct_count, total, results = evaluate_exam_submission(questions, submitted)
-    result_map = {r.get("question_id"): r for r in results if r.get("question_id")}
-    for q in questions:
-        q["result"] = result_map.get(q.get("id"))
+    # POST: evaluar. Se guardan solo las opciones elegidas; la vista completa
+    # se reconstruye desde el examen canónico.
+    submitted = {q["id"]: request.POST.getlist(f"q-{q['id']}") for q in questions}
+    results = compact_results(content.exam, submitted)
+    correct_count, total, questions, _outdated = expand_results(content.exam, results)
 
     # Registrar progreso si hay inscripción
     try:
@@ -409,8 +473,7 @@ def take_exam(request, content_pk):
             content=content, course_inscription=inscription
         )
         progress.score = correct_count
-        # Asegurar que lo que guardamos en JSONField sea 100% serializable.
-        progress.results = _to_json_safe(results)
+        progress.results = results
         progress.is_completed = True
         progress.completed_at = timezone.now()
         progress.save(
@@ -433,94 +496,3 @@ def take_exam(request, content_pk):
             "total": total,
         },
     )
-
-
-def normalize_exam_questions(exam: Exam):
-    """Normaliza preguntas de un examen a un formato uniforme."""
-    if not exam or not exam.questions:
-        return []
-
-    raw_questions = exam.questions
-    if isinstance(raw_questions, str):
-        try:
-            raw_questions = json.loads(raw_questions)
-        except Exception:
-            return []
-
-    normalized = []
-    if isinstance(raw_questions, list):
-        for idx, q in enumerate(raw_questions):
-            if not isinstance(q, dict):
-                continue
-            qid = str(q.get("id") or q.get("question_id") or idx)
-            text = q.get("text") or q.get("texto") or q.get("question") or ""
-            # Soportar distintos formatos de almacenamiento:
-            # - "options" / "opciones" (formatos previos)
-            # - "answers" (formato usado por el editor de cuestionarios en administración)
-            options = q.get("options") or q.get("opciones") or q.get("answers") or []
-            norm_opts = []
-            if isinstance(options, list):
-                for o_idx, opt in enumerate(options):
-                    if not isinstance(opt, dict):
-                        continue
-                    opt_id = str(opt.get("id") or opt.get("option_id") or o_idx)
-                    norm_opts.append(
-                        {
-                            "id": opt_id,
-                            "text": opt.get("text")
-                            or opt.get("texto")
-                            or opt.get("option")
-                            or "",
-                            "is_correct": bool(
-                                opt.get("is_correct")
-                                or opt.get("es_correcta")
-                                or opt.get("correct")
-                            ),
-                        }
-                    )
-            allows_multiple = sum(1 for opt in norm_opts if opt["is_correct"]) != 1
-            normalized.append(
-                {
-                    "id": qid,
-                    "text": text,
-                    "options": norm_opts,
-                    "allows_multiple": allows_multiple,
-                }
-            )
-    return normalized
-
-
-def evaluate_exam_submission(questions, submitted_answers):
-    """
-    Evalúa la selección del usuario.
-    submitted_answers: dict de question_id -> set(option_id)
-    """
-    results = []
-    correct_count = 0
-
-    for q in questions:
-        qid = q.get("id")
-        # Convertir la selección del usuario a set solo para comparar,
-        # pero no guardar sets en los resultados (JSONField).
-        selected = set(submitted_answers.get(qid, []))
-        correct_ids = {
-            opt["id"] for opt in q.get("options", []) if opt.get("is_correct")
-        }
-
-        is_correct = selected == correct_ids and (correct_ids or not selected)
-        if is_correct:
-            correct_count += 1
-
-        results.append(
-            {
-                "question_id": qid,
-                "question": q.get("text", ""),
-                "selected": list(selected),
-                "correct_ids": list(correct_ids),
-                "is_correct": is_correct,
-                "options": q.get("options", []),
-            }
-        )
-
-    total = len(questions)
-    return correct_count, total, results
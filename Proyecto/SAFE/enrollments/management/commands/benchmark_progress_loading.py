@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from enrollments.models import ContentProgress
+
+
+def _payload_bytes(rows) -> int:
+    """Tamaño aproximado de los valores recibidos de la BD."""
+    total = 0
+    for row in rows:
+        for value in row:
+            if value is None:
+                continue
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                total += len(value)
+            else:
+                total += len(str(value).encode())
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara tiempo y bytes transferidos al cargar el progreso de un curso "
+        "con y sin las columnas pesadas (file, results) de ContentProgress."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("course_id", type=int)
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Repeticiones por estrategia."
+        )
+
+    def _measure(self, queryset, repeat):
+        fields = [
+            field.attname
+            for field in ContentProgress._meta.concrete_fields
+            if field.attname not in queryset.query.deferred_loading[0]
+        ]
+        best = None
+        payload = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = list(queryset.values_list(*fields))
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            payload = _payload_bytes(rows)
+        return len(rows), payload, best
+
+    def handle(self, *args, **options):
+        if not Course.objects.filter(pk=options["course_id"]).exists():
+            raise CommandError(f"No existe el curso {options['course_id']}.")
+
+        base = ContentProgress.objects.filter(
+            course_inscription__course_id=options["course_id"]
+        )
+        strategies = [
+            ("completo", base.with_heavy_fields()),
+            ("por defecto (diferido)", base),
+        ]
+        for label, queryset in strategies:
+            count, payload, best = self._measure(queryset, options["repeat"])
+            self.stdout.write(
+                f"{label}: {count} filas, {payload / 1024:.1f} KiB, "
+                f"mejor tiempo {best * 1000:.2f} ms"
+            )
@@ -0,0 +1,47 @@
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+
+from enrollments.models import ContentProgress
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las entregas guardadas en ContentProgress.file (BD) al "
+        "almacenamiento de entregas y vacía la columna. Es idempotente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Entregas por lote (cada lote carga sus blobs en memoria).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pending = (
+            ContentProgress.objects.with_file()
+            .filter(file__isnull=False)
+            .select_related("course_inscription")
+        )
+        moved = 0
+        last_pk = 0
+
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk).order_by("pk")[:batch_size])
+            if not batch:
+                break
+
+            for progress in batch:
+                progress.submission.save(
+                    f"entrega_{progress.pk}", ContentFile(bytes(progress.file)), save=False
+                )
+                progress.file = None
+            ContentProgress.objects.bulk_update(batch, ["submission", "file"])
+
+            moved += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f"{moved} entrega(s) movidas...")
+
+        self.stdout.write(self.style.SUCCESS(f"{moved} entrega(s) movidas al almacenamiento."))
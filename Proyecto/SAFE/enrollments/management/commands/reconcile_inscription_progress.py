@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+
+from enrollments.models import CourseInscription
+from enrollments.services import (
+    bulk_update_inscription_progress,
+    reconcile_inscription_progress,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula completed_contents, progress, status y completion_date de "
+        "las inscripciones a cursos con un único UPDATE (o por lotes con "
+        "--batch-size)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course",
+            type=int,
+            action="append",
+            dest="course_ids",
+            help="Limitar a las inscripciones de un curso (se puede repetir).",
+        )
+        parser.add_argument(
+            "--team",
+            type=int,
+            action="append",
+            dest="team_ids",
+            help="Limitar a los miembros de un equipo (se puede repetir).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Procesar por lotes con bulk_update y reportar solo las filas modificadas.",
+        )
+
+    def handle(self, *args, **options):
+        inscriptions = CourseInscription.objects.all()
+        if options["course_ids"]:
+            inscriptions = inscriptions.filter(course_id__in=options["course_ids"])
+        if options["team_ids"]:
+            inscriptions = inscriptions.filter(
+                app_user__team_memberships__team_id__in=options["team_ids"]
+            )
+
+        if options["batch_size"]:
+            updated = bulk_update_inscription_progress(
+                inscriptions, batch_size=options["batch_size"]
+            )
+            message = f"{updated} inscripción(es) corregidas."
+        else:
+            updated = reconcile_inscription_progress(inscriptions)
+            message = f"{updated} inscripción(es) reconciliadas."
+
+        self.stdout.write(self.style.SUCCESS(message))
@@ -3,6 +3,7 @@ from django.db import models
 from django.conf import settings
 from courses.models import Course, Content
 from learning_paths.models import LearningPath
+from .storage import get_submission_storage, submission_upload_to
 
 
 class CourseInscription(models.Model):
@@ -28,6 +29,8 @@ class CourseInscription(models.Model):
     progress = models.DecimalField(
         max_digits=5, decimal_places=2, default=Decimal("0.00")
     )
+    # Contenidos completados (mantenido por enrollments.signals)
+    completed_contents = models.PositiveIntegerField(default=0, editable=False)
     status = models.CharField(
         max_length=20,
         choices=InscriptionStatus.choices,
@@ -82,6 +85,45 @@ class PathInscription(models.Model):
         return f"{self.app_user} - {self.learning_path}"
 
 
+class ContentProgressQuerySet(models.QuerySet):
+    """Consultas de progreso; las columnas pesadas se piden explícitamente."""
+
+    HEAVY_FIELDS = ("file", "results")
+
+    def _load_heavy(self, *fields):
+        """
+        Cargar ``fields`` deshaciendo solo su diferido; se respetan los
+        ``only()``/``defer()`` aplicados antes por quien llama.
+        """
+        # Django no expone los campos diferidos: ``query.deferred_loading`` es
+        # ``(nombres, es_defer)`` desde Django 1.x y sigue así en 5.2. Solo se
+        # lee; el clon se construye con defer()/only().
+        names, defer = self.query.deferred_loading
+        if defer:
+            return self.defer(None).defer(*set(names).difference(fields))
+        return self.only(*set(names).union(fields))
+
+    def with_results(self):
+        """Incluir las respuestas del examen (JSON)."""
+        return self._load_heavy("results")
+
+    def with_file(self):
+        """Incluir la entrega antigua guardada en la BD."""
+        return self._load_heavy("file")
+
+    def with_heavy_fields(self):
+        return self._load_heavy(*self.HEAVY_FIELDS)
+
+
+class _DeferHeavyFieldsManager(models.Manager):
+    def get_queryset(self):
+        # ``file`` y ``results`` pueden pesar mucho y casi ninguna vista los usa
+        return super().get_queryset().defer(*ContentProgressQuerySet.HEAVY_FIELDS)
+
+
+ContentProgressManager = _DeferHeavyFieldsManager.from_queryset(ContentProgressQuerySet)
+
+
 class ContentProgress(models.Model):
     """Progreso del usuario en contenidos específicos"""
 
@@ -94,15 +136,33 @@ class ContentProgress(models.Model):
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     score = models.IntegerField(null=True, blank=True)
+    # Obsoleto: entregas antiguas guardadas en la BD. migrate_submission_blobs
+    # las mueve a ``submission``.
     file = models.BinaryField(null=True, blank=True)
+    submission = models.FileField(
+        upload_to=submission_upload_to,
+        storage=get_submission_storage,
+        max_length=255,
+        null=True,
+        blank=True,
+    )
     results = models.JSONField(null=True, blank=True)
     is_completed = models.BooleanField(default=False)
 
+    objects = ContentProgressManager()
+
     class Meta:
         db_table = "content_progress"
         verbose_name = "Progreso de contenido"
         verbose_name_plural = "Progresos de contenidos"
         unique_together = ("content", "course_inscription")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado cargado, para detectar cambios de is_completed al guardar
+        instance._loaded_is_completed = instance.__dict__.get("is_completed")
+        return instance
+
     def __str__(self):
         return f"{self.course_inscription.app_user} - {self.content}"
@@ -1,17 +1,40 @@
+import logging
+import time
 from dataclasses import dataclass
-from typing import List, Optional
-from decimal import Decimal
-
-from django.db.models import Count, Prefetch
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    Exists,
+    F,
+    FloatField,
+    Max,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, Now, Round
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
 from django.utils import timezone
 
 from accounts.models import AppUser
-from courses.models import Course, Content
-from courses.services import get_ordered_modules
+from courses.models import Course, Content, Module
+from courses.services import get_course_structure_version
 from enrollments.models import ContentProgress, CourseInscription
-from learning_paths.models import LearningPath
+from learning_paths.models import CourseInPath, LearningPath
+from learning_paths.services import order_path_links
 from teams.models import TeamUser
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class CatalogCourseCard:
@@ -89,25 +112,83 @@ def get_courses_for_user(user: AppUser):
     return Course.objects.none()
 
 
+UNLOCK_STATE_TIMEOUT = 60 * 60
+
+
+@dataclass(frozen=True)
+class UnlockState:
+    """Sequential navigation state of one inscription, cached between requests."""
+
+    structure_version: str
+    unlocked_module_ids: FrozenSet[int]
+    highest_unlocked_module_id: Optional[int]
+    completed_ids: FrozenSet[int]
+
+
+def _unlock_state_key(inscription_id: int) -> str:
+    return f"enrollments:unlock-state:{inscription_id}"
+
+
+def _compute_unlock_state(inscription_id: int, course_id: int, version: str) -> UnlockState:
+    completed_ids = frozenset(
+        ContentProgress.objects.filter(
+            course_inscription_id=inscription_id, is_completed=True
+        ).values_list("content_id", flat=True)
+    )
+    contents_by_module: Dict[int, List[int]] = {}
+    for module_id, content_id in Content.objects.filter(
+        module__course_id=course_id
+    ).values_list("module_id", "pk"):
+        contents_by_module.setdefault(module_id, []).append(content_id)
+
+    # El primer módulo siempre está desbloqueado; los siguientes, solo si
+    # todos los anteriores están completos.
+    unlocked = []
+    for module_id in Module.objects.filter(course_id=course_id).order_by(
+        "order", "pk"
+    ).values_list("pk", flat=True):
+        unlocked.append(module_id)
+        if not completed_ids.issuperset(contents_by_module.get(module_id, ())):
+            break
+
+    return UnlockState(
+        structure_version=version,
+        unlocked_module_ids=frozenset(unlocked),
+        highest_unlocked_module_id=unlocked[-1] if unlocked else None,
+        completed_ids=completed_ids,
+    )
+
+
+def get_unlock_state(inscription: CourseInscription) -> UnlockState:
+    """
+    Return the cached unlock state of an inscription, rebuilding it when the
+    course structure changed or its progress was invalidated.
+    """
+    version = get_course_structure_version(inscription.course_id)
+    state = cache.get(_unlock_state_key(inscription.pk))
+    if state is None or state.structure_version != version:
+        state = _compute_unlock_state(inscription.pk, inscription.course_id, version)
+        cache.set(_unlock_state_key(inscription.pk), state, UNLOCK_STATE_TIMEOUT)
+    return state
+
+
+def invalidate_unlock_state(inscription_ids: Iterable[int]) -> None:
+    """Drop the cached unlock state of the given inscriptions."""
+    keys = [_unlock_state_key(pk) for pk in inscription_ids]
+    if not keys:
+        return
+
+    # Se borra ahora y al confirmar la transacción, para no dejar en caché un
+    # estado leído antes de que el cambio fuese visible.
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
 def get_contents_for_user_in_course(user: AppUser, course: Course):
     """
     Determine which contents are visible for a given user inside a course.
     """
 
-    # helper for collaborator progress by modules
-    def _completed_ids_for(user: AppUser, course_obj: Course):
-        try:
-            inscription = CourseInscription.objects.get(
-                app_user=user, course=course_obj
-            )
-        except CourseInscription.DoesNotExist:
-            return set()
-        return set(
-            ContentProgress.objects.filter(
-                course_inscription=inscription, is_completed=True
-            ).values_list("content_id", flat=True)
-        )
-
     # 1. Analista TH: can see everything
     if user.role == AppUser.UserRole.ANALISTA_TH:
         return Content.objects.filter(module__course=course).order_by(
@@ -127,32 +208,88 @@ def get_contents_for_user_in_course(user: AppUser, course: Course):
 
         return Content.objects.none()
 
-    # 3. Colaborador: sequential navigation based on course contents
+    # 3. Colaborador: sequential navigation based on the cached unlock state
     if user.role == AppUser.UserRole.COLABORADOR:
-        if not CourseInscription.objects.filter(app_user=user, course=course).exists():
+        inscription = (
+            CourseInscription.objects.filter(app_user=user, course=course)
+            .only("pk", "course_id")
+            .first()
+        )
+        if inscription is None:
             return Content.objects.none()
 
-        completed_ids = _completed_ids_for(user, course)
-        modules = get_ordered_modules(course)
+        state = get_unlock_state(inscription)
+        return Content.objects.filter(
+            module__course=course, module_id__in=state.unlocked_module_ids
+        ).order_by("module_id", "order", "id")
+
+    return Content.objects.none()
 
-        unlocked_module_ids = set()
-        previous_completed = True  # first module unlocked
 
-        for module in modules:
-            if previous_completed:
-                unlocked_module_ids.add(module.id)
+def can_access_content(
+    user: AppUser, content: Content, inscription: Optional[CourseInscription] = None
+) -> bool:
+    """
+    Tell whether ``user`` may open ``content`` without materializing the
+    visible-content queryset. Collaborators are answered from the cached
+    unlock state, so with an in-memory cache (Redis) the check costs at most
+    the inscription lookup; the database cache adds two reads on
+    ``django_cache``.
+    """
+    started = time.perf_counter()
+    course_id = content.module.course_id
 
-            module_content_ids = [c.id for c in module.contents.all()]
-            module_completed = not module_content_ids or all(
-                content_id in completed_ids for content_id in module_content_ids
+    if user.role == AppUser.UserRole.ANALISTA_TH:
+        allowed = True
+    elif user.role == AppUser.UserRole.SUPERVISOR:
+        allowed = CourseInscription.objects.filter(
+            app_user_id__in=_get_team_member_ids(user), course_id=course_id
+        ).exists()
+    elif user.role == AppUser.UserRole.COLABORADOR:
+        if inscription is None:
+            inscription = (
+                CourseInscription.objects.filter(app_user=user, course_id=course_id)
+                .only("pk", "course_id")
+                .first()
             )
-            previous_completed = previous_completed and module_completed
+        allowed = (
+            inscription is not None
+            and content.module_id in get_unlock_state(inscription).unlocked_module_ids
+        )
+    else:
+        allowed = False
+
+    logger.debug(
+        "can_access_content user=%s content=%s allowed=%s %.2fms",
+        user.pk,
+        content.pk,
+        allowed,
+        (time.perf_counter() - started) * 1000,
+    )
+    return allowed
 
-        return Content.objects.filter(
-            module__course=course, module_id__in=unlocked_module_ids
-        ).order_by("module_id", "order", "id")
 
-    return Content.objects.none()
+def store_submission(progress: ContentProgress, uploaded_file) -> ContentProgress:
+    """
+    Save an assignment upload through the submission storage and mark the
+    content as completed. The file is written in chunks, never read whole
+    into memory, and any previous upload of the same progress is removed.
+    """
+    previous_name = progress.submission.name if progress.submission else None
+
+    progress.submission.save(uploaded_file.name, uploaded_file, save=False)
+    progress.file = None
+    now = timezone.now()
+    progress.started_at = progress.started_at or now
+    progress.completed_at = now
+    progress.is_completed = True
+    progress.save(
+        update_fields=["submission", "file", "started_at", "completed_at", "is_completed"]
+    )
+
+    if previous_name and previous_name != progress.submission.name:
+        progress.submission.storage.delete(previous_name)
+    return progress
 
 
 def get_courses_in_learning_path_for_user(user: AppUser, path: LearningPath):
@@ -191,6 +328,66 @@ def get_courses_in_learning_path_for_user(user: AppUser, path: LearningPath):
     return Course.objects.none()
 
 
+def get_paths_with_courses_for_user(
+    user: AppUser,
+) -> List[Tuple[LearningPath, List[Course]]]:
+    """
+    Return every visible path with its visible courses in path order.
+
+    Same visibility rules as ``get_courses_in_learning_path_for_user`` but
+    resolved for all paths at once: one query for the paths and one
+    prefetch of their CourseInPath rows annotated with the viewer's access.
+    """
+    if user.role == AppUser.UserRole.ANALISTA_TH:
+        allowed_statuses = {Course.CourseStatus.ACTIVE, Course.CourseStatus.DRAFT}
+        links_qs = CourseInPath.objects.annotate(enrolled=Value(True))
+    elif user.role == AppUser.UserRole.SUPERVISOR:
+        allowed_statuses = {Course.CourseStatus.ACTIVE}
+        links_qs = CourseInPath.objects.annotate(
+            enrolled=Exists(
+                CourseInscription.objects.filter(
+                    course_id=OuterRef("course_id"),
+                    app_user_id__in=_get_team_member_ids(user),
+                )
+            )
+        )
+    elif user.role == AppUser.UserRole.COLABORADOR:
+        allowed_statuses = {Course.CourseStatus.ACTIVE}
+        links_qs = CourseInPath.objects.annotate(
+            enrolled=Exists(
+                CourseInscription.objects.filter(
+                    course_id=OuterRef("course_id"), app_user=user
+                )
+            )
+        )
+    else:
+        return []
+
+    # Se precargan todos los eslabones para poder recorrer la cadena completa;
+    # la visibilidad se aplica después sobre la ruta ya ordenada.
+    paths = get_paths_for_user(user).prefetch_related(
+        Prefetch(
+            "courses",
+            queryset=links_qs.select_related("course"),
+            to_attr="course_links",
+        )
+    )
+
+    return [
+        (
+            path,
+            [
+                cip.course
+                for cip in order_path_links(path.course_links)
+                # ``enrolled`` es una anotación de links_qs, no un campo del modelo
+                if getattr(cip, "enrolled", False)
+                and cip.course.status in allowed_statuses
+            ],
+        )
+        for path in paths
+    ]
+
+
 def get_paths_for_user(user: AppUser):
     """
     Return the learning paths visible to the user using only PathInscription.
@@ -230,29 +427,19 @@ def _get_paths_for_supervisor(user: AppUser):
 
 def _build_inscriptions_prefetch(user: AppUser):
     """Return a Prefetch with the inscriptions relevant for the viewer."""
+    # completed_contents está desnormalizado en la inscripción: no hace falta
+    # traer las filas de ContentProgress para pintar las tarjetas.
     if user.role == AppUser.UserRole.COLABORADOR:
-        completed_prefetch = Prefetch(
-            "content_progress",
-            queryset=ContentProgress.objects.filter(is_completed=True),
-            to_attr="completed_progress",
-        )
-        inscriptions_qs = CourseInscription.objects.filter(
-            app_user=user
-        ).prefetch_related(completed_prefetch)
+        inscriptions_qs = CourseInscription.objects.filter(app_user=user)
         return Prefetch(
             "inscriptions", queryset=inscriptions_qs, to_attr="visible_inscriptions"
         )
 
     if user.role == AppUser.UserRole.SUPERVISOR:
         team_members_ids = _get_team_member_ids(user)
-        base_qs = CourseInscription.objects.filter(app_user_id__in=team_members_ids)
-
-        completed_prefetch = Prefetch(
-            "content_progress",
-            queryset=ContentProgress.objects.filter(is_completed=True),
-            to_attr="completed_progress",
+        inscriptions_qs = CourseInscription.objects.filter(
+            app_user_id__in=team_members_ids
         )
-        inscriptions_qs = base_qs.prefetch_related(completed_prefetch)
         return Prefetch(
             "inscriptions", queryset=inscriptions_qs, to_attr="visible_inscriptions"
         )
@@ -265,16 +452,12 @@ def _build_catalog_card_for_course(course: Course, user: AppUser) -> CatalogCour
     inscriptions: List[CourseInscription] = (
         getattr(course, "visible_inscriptions", []) or []
     )
-    total_contents = getattr(course, "contents_count", 0) or 0
-    modules_count = getattr(course, "modules_count", 0) or 0
+    total_contents = course.contents_count
+    modules_count = course.modules_count
 
     if user.role == AppUser.UserRole.COLABORADOR:
         inscription = inscriptions[0] if inscriptions else None
-        completed_contents = (
-            len(getattr(inscription, "completed_progress", []) or [])
-            if inscription
-            else 0
-        )
+        completed_contents = inscription.completed_contents if inscription else 0
         progress_percent = (
             (completed_contents / total_contents) * 100 if total_contents else 0.0
         )
@@ -286,9 +469,7 @@ def _build_catalog_card_for_course(course: Course, user: AppUser) -> CatalogCour
 
     elif user.role == AppUser.UserRole.SUPERVISOR:
         inscription_count = len(inscriptions)
-        completed_contents = sum(
-            len(getattr(ins, "completed_progress", []) or []) for ins in inscriptions
-        )
+        completed_contents = sum(ins.completed_contents for ins in inscriptions)
         max_possible = total_contents * inscription_count
         progress_percent = (
             (completed_contents / max_possible * 100) if max_possible else 0.0
@@ -310,7 +491,11 @@ def _build_catalog_card_for_course(course: Course, user: AppUser) -> CatalogCour
         audience_label = "Disponible"
         inscription_count = 0
 
-    can_open = user_can_open_course(user, course)
+    if hasattr(course, "visible_inscriptions"):
+        # Las inscripciones precargadas ya responden si el curso se puede abrir
+        can_open = bool(inscriptions)
+    else:
+        can_open = user_can_open_course(user, course)
 
     return CatalogCourseCard(
         course=course,
@@ -329,14 +514,7 @@ def get_catalog_courses_for_user(user: AppUser) -> List[CatalogCourseCard]:
     """
     Build catalog-friendly course data including inscription/progress visibility by role.
     """
-    courses_qs = (
-        get_courses_for_user(user)
-        .annotate(
-            modules_count=Count("modules", distinct=True),
-            contents_count=Count("modules__contents", distinct=True),
-        )
-        .order_by("-created_at")
-    )
+    courses_qs = get_courses_for_user(user).order_by("-created_at")
 
     prefetch = _build_inscriptions_prefetch(user)
     if prefetch is not None:
@@ -349,7 +527,7 @@ def get_course_progress(user: AppUser, course: Course):
     """
     Return total/complete counts and percent for a user in a course using ContentProgress.
     """
-    total_contents = Content.objects.filter(module__course=course).distinct().count()
+    total_contents = course.contents_count
     completed_contents = 0
 
     try:
@@ -371,40 +549,193 @@ def get_course_progress(user: AppUser, course: Course):
     }
 
 
+def _progress_update_values(completed):
+    """
+    UPDATE expressions that derive progress, status and completion_date from
+    ``completed`` (an expression with the completed contents of each row).
+    """
+    total = Subquery(
+        Course.objects.filter(pk=OuterRef("course_id")).values("contents_count")[:1]
+    )
+    finished = GreaterThan(total, 0) & GreaterThanOrEqual(completed, total)
+    last_completed_at = Subquery(
+        ContentProgress.objects.filter(
+            course_inscription=OuterRef("pk"), is_completed=True
+        )
+        .order_by(F("completed_at").desc(nulls_last=True))
+        .values("completed_at")[:1]
+    )
+    status = CourseInscription.InscriptionStatus
+
+    return {
+        "progress": Case(
+            When(
+                GreaterThan(total, 0),
+                then=Round(Cast(completed, FloatField()) * 100.0 / total, 2),
+            ),
+            default=Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=5, decimal_places=2),
+        ),
+        "status": Case(
+            When(finished, then=Value(status.COMPLETED)),
+            When(
+                Q(status=status.ENROLLED) & GreaterThan(completed, 0),
+                then=Value(status.IN_PROGRESS),
+            ),
+            default=F("status"),
+        ),
+        "completion_date": Case(
+            When(
+                finished & ~Q(status=status.COMPLETED),
+                then=Coalesce(last_completed_at, Now()),
+            ),
+            default=F("completion_date"),
+        ),
+    }
+
+
+def completed_contents_subquery():
+    """Correlated COUNT of completed ContentProgress rows per inscription."""
+    completed = (
+        ContentProgress.objects.filter(
+            course_inscription=OuterRef("pk"), is_completed=True
+        )
+        .order_by()
+        .values("course_inscription")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(completed), Value(0))
+
+
+def shift_completed_contents(inscriptions, delta: int) -> int:
+    """Apply ``delta`` to ``completed_contents`` and refresh progress in one UPDATE."""
+    completed = Greatest(F("completed_contents") + delta, 0)
+    return inscriptions.update(
+        completed_contents=completed, **_progress_update_values(completed)
+    )
+
+
+def refresh_inscription_progress(inscriptions) -> int:
+    """
+    Recompute progress/status from the stored ``completed_contents`` counter
+    (e.g. after contents are added to a course) with a single UPDATE.
+    """
+    return inscriptions.update(**_progress_update_values(F("completed_contents")))
+
+
+def reconcile_inscription_progress(inscriptions=None) -> int:
+    """
+    Recount completed contents from ContentProgress and fix progress, status
+    and completion_date for every inscription in one set-based UPDATE.
+    """
+    if inscriptions is None:
+        inscriptions = CourseInscription.objects.all()
+
+    completed = completed_contents_subquery()
+    return inscriptions.update(
+        completed_contents=completed, **_progress_update_values(completed)
+    )
+
+
 def update_inscription_progress(inscription: CourseInscription) -> None:
     """
     Recalcula y actualiza el porcentaje de progreso de una inscripción
     basado en los contenidos completados. También actualiza el estado.
     """
-    total_contents = Content.objects.filter(module__course=inscription.course).count()
+    reconcile_inscription_progress(
+        CourseInscription.objects.filter(pk=inscription.pk)
+    )
+    inscription.refresh_from_db(
+        fields=["completed_contents", "progress", "status", "completion_date"]
+    )
 
-    if total_contents == 0:
-        inscription.progress = Decimal("0.00")
+
+def _apply_progress(
+    inscription: CourseInscription, completed: int, total: int, last_completed_at
+) -> bool:
+    """
+    Set completed_contents/progress/status/completion_date on an in-memory
+    inscription (same rules as ``_progress_update_values``). Returns whether
+    anything changed.
+    """
+    before = (
+        inscription.completed_contents,
+        inscription.progress,
+        inscription.status,
+        inscription.completion_date,
+    )
+
+    inscription.completed_contents = completed
+    if total:
+        # Mitades hacia arriba, como Round en SQL (_progress_update_values)
+        inscription.progress = (Decimal(completed * 100) / Decimal(total)).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
     else:
-        completed_count = inscription.content_progress.filter(is_completed=True).count()
-        progress_value = (completed_count / total_contents) * 100
-        inscription.progress = Decimal(progress_value).quantize(Decimal("0.01"))
-
-    # Actualizar estado y fecha de completitud
-    update_fields = ["progress"]
-
-    if inscription.progress >= Decimal("100.00"):
-        if inscription.status != CourseInscription.InscriptionStatus.COMPLETED:
-            inscription.status = CourseInscription.InscriptionStatus.COMPLETED
-            # Usar la fecha del último contenido completado, o ahora si no hay
-            last_content = (
-                inscription.content_progress.filter(is_completed=True)
-                .order_by("-completed_at")
-                .first()
-            )
-            inscription.completion_date = (
-                last_content.completed_at if last_content else timezone.now()
-            )
-            update_fields.extend(["status", "completion_date"])
+        inscription.progress = Decimal("0.00")
+
+    status = CourseInscription.InscriptionStatus
+    if total and completed >= total:
+        if inscription.status != status.COMPLETED:
+            inscription.status = status.COMPLETED
+            inscription.completion_date = last_completed_at or timezone.now()
+    elif completed > 0 and inscription.status == status.ENROLLED:
+        inscription.status = status.IN_PROGRESS
+
+    return before != (
+        inscription.completed_contents,
+        inscription.progress,
+        inscription.status,
+        inscription.completion_date,
+    )
 
-    elif inscription.progress > Decimal("0.00"):
-        if inscription.status == CourseInscription.InscriptionStatus.ENROLLED:
-            inscription.status = CourseInscription.InscriptionStatus.IN_PROGRESS
-            update_fields.append("status")
 
-    inscription.save(update_fields=update_fields)
+def bulk_update_inscription_progress(inscriptions=None, batch_size: int = 1000) -> int:
+    """
+    Bulk version of ``update_inscription_progress`` for any set of inscriptions
+    (a course, a team or the whole table). Works in keyset chunks of
+    ``batch_size``: one grouped aggregate query per chunk and a single
+    ``bulk_update`` with only the rows that changed. Returns the number of
+    inscriptions updated.
+    """
+    if inscriptions is None:
+        inscriptions = CourseInscription.objects.all()
+
+    ids_qs = inscriptions.order_by("pk").values_list("pk", flat=True).distinct()
+    completed_filter = Q(content_progress__is_completed=True)
+    fields = ["completed_contents", "progress", "status", "completion_date"]
+
+    updated = 0
+    last_pk = 0
+    while True:
+        chunk_ids = list(ids_qs.filter(pk__gt=last_pk)[:batch_size])
+        if not chunk_ids:
+            break
+        last_pk = chunk_ids[-1]
+
+        rows = (
+            CourseInscription.objects.filter(pk__in=chunk_ids)
+            .only("pk", "course_id", *fields)
+            .annotate(
+                completed=Count("content_progress", filter=completed_filter),
+                last_completed_at=Max(
+                    "content_progress__completed_at", filter=completed_filter
+                ),
+                total_contents=F("course__contents_count"),
+            )
+        )
+        changed = [
+            row
+            for row in rows
+            if _apply_progress(
+                row, row.completed, row.total_contents, row.last_completed_at
+            )
+        ]
+        if changed:
+            CourseInscription.objects.bulk_update(changed, fields, batch_size=batch_size)
+            updated += len(changed)
+        if len(chunk_ids) < batch_size:
+            break
+
+    return updated
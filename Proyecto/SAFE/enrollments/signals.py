@@ -0,0 +1,82 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from courses.models import Content, Module
+from .models import ContentProgress, CourseInscription
+from .services import (
+    invalidate_unlock_state,
+    reconcile_inscription_progress,
+    refresh_inscription_progress,
+    shift_completed_contents,
+)
+
+
+def _origin_model(origin):
+    """Model that started a delete (instance or queryset)."""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+@receiver(post_save, sender=ContentProgress)
+def update_progress_on_content_progress_save(sender, instance, created, **kwargs):
+    previous = False if created else getattr(instance, "_loaded_is_completed", None)
+    instance._loaded_is_completed = instance.is_completed
+    inscriptions = CourseInscription.objects.filter(pk=instance.course_inscription_id)
+
+    if previous is None:
+        # Instancia no cargada desde la BD: no sabemos el estado anterior
+        reconcile_inscription_progress(inscriptions)
+        invalidate_unlock_state([instance.course_inscription_id])
+        return
+
+    delta = int(bool(instance.is_completed)) - int(bool(previous))
+    if delta:
+        shift_completed_contents(inscriptions, delta)
+        invalidate_unlock_state([instance.course_inscription_id])
+
+
+@receiver(post_delete, sender=ContentProgress)
+def update_progress_on_content_progress_delete(sender, instance, origin=None, **kwargs):
+    # Los borrados en cascada (contenido, inscripción, curso) se reconcilian
+    # en bloque desde el origen del borrado.
+    if _origin_model(origin) is not ContentProgress:
+        return
+    if instance.is_completed:
+        shift_completed_contents(
+            CourseInscription.objects.filter(pk=instance.course_inscription_id), -1
+        )
+        invalidate_unlock_state([instance.course_inscription_id])
+
+
+@receiver(post_save, sender=CourseInscription)
+def reset_unlock_state_on_inscription_create(sender, instance, created, **kwargs):
+    if created:
+        invalidate_unlock_state([instance.pk])
+
+
+# Estos receptores dependen de que courses.signals ya haya actualizado
+# Course.contents_count (courses se registra antes en INSTALLED_APPS).
+
+
+@receiver(post_save, sender=Content)
+def update_progress_on_content_create(sender, instance, created, **kwargs):
+    if created:
+        refresh_inscription_progress(
+            CourseInscription.objects.filter(course__modules=instance.module_id)
+        )
+
+
+@receiver(post_delete, sender=Content)
+def update_progress_on_content_delete(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is Content:
+        reconcile_inscription_progress(
+            CourseInscription.objects.filter(course__modules=instance.module_id)
+        )
+
+
+@receiver(post_delete, sender=Module)
+def update_progress_on_module_delete(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is Module:
+        reconcile_inscription_progress(
+            CourseInscription.objects.filter(course_id=instance.course_id)
+        )
@@ -0,0 +1,41 @@
+import os
+
+from django.core.files.storage import storages
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+
+SUBMISSION_STORAGE_ALIAS = "submissions"
+
+
+class SubmissionStorage(LazyObject):
+    """Backend configurado en ``STORAGES["submissions"]`` (disco o S3)."""
+
+    def _setup(self):
+        self._wrapped = storages[SUBMISSION_STORAGE_ALIAS]
+
+
+submission_storage = SubmissionStorage()
+
+
+def get_submission_storage():
+    # Callable para FileField: las migraciones guardan la referencia, no el backend
+    return submission_storage
+
+
+def submission_upload_to(instance, filename):
+    """entregas/<curso>/<contenido>/<inscripción>/<archivo>"""
+    inscription = instance.course_inscription
+    return os.path.join(
+        "entregas",
+        str(inscription.course_id),
+        str(instance.content_id),
+        str(inscription.pk),
+        os.path.basename(filename),
+    )
+
+
+@receiver(setting_changed)
+def reset_submission_storage(setting, **kwargs):
+    if setting == "STORAGES":
+        submission_storage._wrapped = empty
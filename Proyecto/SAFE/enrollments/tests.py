@@ -1,19 +1,35 @@
 from decimal import Decimal
+from io import StringIO
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
 from accounts.models import AppUser
 from courses.models import Content, Course, Module
+from courses.services import set_module_order
+from courses.tests import LOCMEM_CACHES
 from enrollments.models import ContentProgress, CourseInscription, PathInscription
 from learning_paths.models import CourseInPath, LearningPath
 from teams.models import Team, TeamUser
 from .services import (
+    _apply_progress,
+    bulk_update_inscription_progress,
+    can_access_content,
     get_catalog_courses_for_user,
     get_contents_for_user_in_course,
     get_courses_for_user,
     get_courses_in_learning_path_for_user,
     get_paths_for_user,
+    get_paths_with_courses_for_user,
+    get_unlock_state,
+    store_submission,
 )
 
 User = get_user_model()
@@ -136,6 +152,45 @@ class RF5ServicesTests(TestCase):
             get_courses_in_learning_path_for_user(self.collaborator, path),
         )
 
+    def test_paths_with_courses_are_batched_and_ordered(self):
+        second = Course.objects.create(
+            name="Curso Segundo", status=Course.CourseStatus.ACTIVE
+        )
+        hidden = Course.objects.create(
+            name="Curso Oculto", status=Course.CourseStatus.ACTIVE
+        )
+        paths = []
+        for index in range(3):
+            path = LearningPath.objects.create(name=f"Ruta {index}")
+            # Cadena: second -> course_active -> hidden
+            CourseInPath.objects.create(
+                learning_path=path,
+                course=self.course_active,
+                previous_course=second,
+                next_course=hidden,
+            )
+            CourseInPath.objects.create(
+                learning_path=path, course=second, next_course=self.course_active
+            )
+            CourseInPath.objects.create(
+                learning_path=path, course=hidden, previous_course=self.course_active
+            )
+            PathInscription.objects.create(app_user=self.collaborator, learning_path=path)
+            paths.append(path)
+        for course in (self.course_active, second):
+            CourseInscription.objects.create(app_user=self.collaborator, course=course)
+
+        with self.assertNumQueries(2):
+            result = get_paths_with_courses_for_user(self.collaborator)
+
+        self.assertEqual({path for path, _courses in result}, set(paths))
+        for path, courses in result:
+            self.assertEqual(courses, [second, self.course_active])
+            self.assertEqual(
+                set(courses),
+                set(get_courses_in_learning_path_for_user(self.collaborator, path)),
+            )
+
     def test_get_paths_for_user_by_role(self):
         path = LearningPath.objects.create(name="Ruta A", status=LearningPath.PathStatus.ACTIVE)
         path_other = LearningPath.objects.create(name="Ruta B")
@@ -233,3 +288,365 @@ class RF5ServicesTests(TestCase):
         cards = get_catalog_courses_for_user(self.collaborator)
         self.assertEqual(1, len(cards))
         self.assertEqual(50.0, cards[0].progress_percent)
+
+
+class InscriptionProgressTrackingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="learner",
+            email="learner@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        self.course = Course.objects.create(
+            name="Curso Progreso", status=Course.CourseStatus.ACTIVE
+        )
+        self.module = Module.objects.create(course=self.course, name="Módulo")
+        self.contents = [
+            Content.objects.create(
+                module=self.module,
+                title=f"C{i}",
+                content_type=Content.ContentType.MATERIAL,
+            )
+            for i in range(2)
+        ]
+        self.inscription = CourseInscription.objects.create(
+            app_user=self.user, course=self.course
+        )
+
+    def _complete(self, content):
+        progress, _created = ContentProgress.objects.get_or_create(
+            content=content, course_inscription=self.inscription
+        )
+        progress.is_completed = True
+        progress.save(update_fields=["is_completed"])
+        return progress
+
+    def test_progress_follows_completed_flag(self):
+        progress = self._complete(self.contents[0])
+        self.inscription.refresh_from_db()
+        self.assertEqual(1, self.inscription.completed_contents)
+        self.assertEqual(Decimal("50.00"), self.inscription.progress)
+        self.assertEqual(
+            CourseInscription.InscriptionStatus.IN_PROGRESS, self.inscription.status
+        )
+
+        # Guardar de nuevo sin cambiar el estado no debe volver a contar
+        progress.save()
+        self._complete(self.contents[1])
+        self.inscription.refresh_from_db()
+        self.assertEqual(2, self.inscription.completed_contents)
+        self.assertEqual(Decimal("100.00"), self.inscription.progress)
+        self.assertEqual(
+            CourseInscription.InscriptionStatus.COMPLETED, self.inscription.status
+        )
+        self.assertIsNotNone(self.inscription.completion_date)
+
+        progress = ContentProgress.objects.get(pk=progress.pk)
+        progress.is_completed = False
+        progress.save()
+        self.inscription.refresh_from_db()
+        self.assertEqual(1, self.inscription.completed_contents)
+
+    def test_progress_follows_course_structure(self):
+        self._complete(self.contents[0])
+        third = Content.objects.create(
+            module=self.module, title="C2", content_type=Content.ContentType.MATERIAL
+        )
+        self.inscription.refresh_from_db()
+        self.assertEqual(Decimal("33.33"), self.inscription.progress)
+
+        third.delete()
+        self.contents[0].delete()
+        self.inscription.refresh_from_db()
+        self.assertEqual(0, self.inscription.completed_contents)
+        self.assertEqual(Decimal("0.00"), self.inscription.progress)
+
+    def test_reconcile_command_fixes_drift(self):
+        self._complete(self.contents[0])
+        CourseInscription.objects.filter(pk=self.inscription.pk).update(
+            completed_contents=0, progress=Decimal("0.00")
+        )
+
+        call_command("reconcile_inscription_progress", stdout=StringIO())
+        self.inscription.refresh_from_db()
+        self.assertEqual(1, self.inscription.completed_contents)
+        self.assertEqual(Decimal("50.00"), self.inscription.progress)
+
+    def test_incremental_progress_rounds_half_up_like_sql(self):
+        inscription = CourseInscription(progress=Decimal("0.00"))
+        _apply_progress(inscription, 1, 32, None)
+        self.assertEqual(Decimal("3.13"), inscription.progress)
+        _apply_progress(inscription, 5, 32, None)
+        self.assertEqual(Decimal("15.63"), inscription.progress)
+
+    def test_bulk_update_progress_in_chunks(self):
+        others = [
+            CourseInscription.objects.create(
+                app_user=User.objects.create_user(
+                    username=f"bulk{i}",
+                    email=f"bulk{i}@example.com",
+                    password="pass1234A!",
+                    role=AppUser.UserRole.COLABORADOR,
+                ),
+                course=self.course,
+            )
+            for i in range(2)
+        ]
+        for content in self.contents:
+            ContentProgress.objects.create(
+                content=content, course_inscription=others[0], is_completed=True
+            )
+        self._complete(self.contents[0])
+        CourseInscription.objects.update(
+            completed_contents=0,
+            progress=Decimal("0.00"),
+            status=CourseInscription.InscriptionStatus.ENROLLED,
+        )
+
+        # Lote 1: ids + agregado + bulk_update; lote 2 (sin cambios): ids + agregado
+        with self.assertNumQueries(5):
+            updated = bulk_update_inscription_progress(batch_size=2)
+        self.assertEqual(2, updated)
+
+        self.inscription.refresh_from_db()
+        others[0].refresh_from_db()
+        others[1].refresh_from_db()
+        self.assertEqual(Decimal("50.00"), self.inscription.progress)
+        self.assertEqual(Decimal("100.00"), others[0].progress)
+        self.assertEqual(
+            CourseInscription.InscriptionStatus.COMPLETED, others[0].status
+        )
+        self.assertEqual(Decimal("0.00"), others[1].progress)
+        self.assertEqual(
+            CourseInscription.InscriptionStatus.ENROLLED, others[1].status
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UnlockStateCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="unlock",
+            email="unlock@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        self.course = Course.objects.create(
+            name="Curso Secuencial", status=Course.CourseStatus.ACTIVE
+        )
+        self.first = Module.objects.create(course=self.course, name="M1")
+        self.second = Module.objects.create(course=self.course, name="M2")
+        self.content = Content.objects.create(
+            module=self.first, title="C1", content_type=Content.ContentType.MATERIAL
+        )
+        self.inscription = CourseInscription.objects.create(
+            app_user=self.user, course=self.course
+        )
+
+    def test_state_is_served_from_cache(self):
+        state = get_unlock_state(self.inscription)
+        self.assertEqual(state.unlocked_module_ids, {self.first.pk})
+        self.assertEqual(state.highest_unlocked_module_id, self.first.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unlock_state(self.inscription), state)
+
+    def test_completing_content_unlocks_next_module(self):
+        get_unlock_state(self.inscription)
+        ContentProgress.objects.create(
+            content=self.content, course_inscription=self.inscription, is_completed=True
+        )
+
+        state = get_unlock_state(self.inscription)
+
+        self.assertEqual(state.unlocked_module_ids, {self.first.pk, self.second.pk})
+        self.assertEqual(state.completed_ids, {self.content.pk})
+
+    def test_structure_change_invalidates_state(self):
+        get_unlock_state(self.inscription)
+        blocker = Module.objects.create(course=self.course, name="M0")
+        Content.objects.create(
+            module=blocker, title="C0", content_type=Content.ContentType.MATERIAL
+        )
+        set_module_order(self.course, [blocker.pk, self.first.pk, self.second.pk])
+
+        state = get_unlock_state(self.inscription)
+        self.assertEqual(state.unlocked_module_ids, {blocker.pk})
+
+    def test_can_access_content_uses_cached_state(self):
+        locked = Content.objects.create(
+            module=self.second, title="C2", content_type=Content.ContentType.MATERIAL
+        )
+        locked = Content.objects.select_related("module").get(pk=locked.pk)
+        get_unlock_state(self.inscription)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(can_access_content(self.user, self.content))
+        with self.assertNumQueries(0):
+            self.assertFalse(can_access_content(self.user, locked, self.inscription))
+
+
+class UnlockStateDatabaseCacheTests(TestCase):
+    def test_cached_state_costs_two_cache_reads(self):
+        user = User.objects.create_user(
+            username="dbcache",
+            email="dbcache@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        course = Course.objects.create(name="Curso", status=Course.CourseStatus.ACTIVE)
+        Module.objects.create(course=course, name="M1")
+        inscription = CourseInscription.objects.create(app_user=user, course=course)
+        get_unlock_state(inscription)
+
+        # Caché por defecto (DatabaseCache): versión de estructura y estado
+        with CaptureQueriesContext(connection) as ctx:
+            get_unlock_state(inscription)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        for query in ctx.captured_queries:
+            self.assertIn("django_cache", query["sql"])
+
+
+class HomeQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="budget",
+            email="budget@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        self.client.force_login(self.user)
+
+    def _add_enrolled_path(self, index):
+        path = LearningPath.objects.create(name=f"Ruta {index}")
+        for n in range(2):
+            course = Course.objects.create(
+                name=f"Curso {index}-{n}", status=Course.CourseStatus.ACTIVE
+            )
+            CourseInPath.objects.create(learning_path=path, course=course)
+            CourseInscription.objects.create(app_user=self.user, course=course)
+        PathInscription.objects.create(app_user=self.user, learning_path=path)
+
+    def _count_home_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("my_learning"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_home_queries_do_not_grow_with_rows(self):
+        self._add_enrolled_path(0)
+        baseline = self._count_home_queries()
+
+        for index in range(1, 4):
+            self._add_enrolled_path(index)
+
+        self.assertEqual(self._count_home_queries(), baseline)
+
+
+@override_settings(
+    STORAGES={
+        **settings.STORAGES,
+        "submissions": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    }
+)
+class SubmissionStorageTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            username="submitter",
+            email="submitter@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        course = Course.objects.create(name="Curso Tareas")
+        module = Module.objects.create(course=course, name="Módulo")
+        self.content = Content.objects.create(
+            module=module, title="Tarea", content_type=Content.ContentType.ASSIGNMENT
+        )
+        self.inscription = CourseInscription.objects.create(app_user=user, course=course)
+        self.progress = ContentProgress.objects.create(
+            content=self.content, course_inscription=self.inscription
+        )
+
+    def test_submission_is_written_to_storage(self):
+        store_submission(
+            self.progress, SimpleUploadedFile("informe.pdf", b"%PDF-1.4 contenido")
+        )
+        first_name = self.progress.submission.name
+        storage = self.progress.submission.storage
+
+        self.progress.refresh_from_db()
+        self.assertTrue(self.progress.is_completed)
+        self.assertIsNone(self.progress.file)
+        self.assertTrue(first_name.endswith("informe.pdf"))
+        self.assertEqual(self.progress.submission.read(), b"%PDF-1.4 contenido")
+
+        store_submission(self.progress, SimpleUploadedFile("v2.pdf", b"nuevo"))
+        self.assertFalse(storage.exists(first_name))
+
+    def test_command_moves_database_blobs_to_storage(self):
+        ContentProgress.objects.filter(pk=self.progress.pk).update(file=b"blob antiguo")
+
+        call_command("migrate_submission_blobs", stdout=StringIO())
+
+        self.progress.refresh_from_db()
+        self.assertIsNone(self.progress.file)
+        self.assertEqual(self.progress.submission.read(), b"blob antiguo")
+
+
+class ContentProgressDeferredColumnsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            username="heavy",
+            email="heavy@example.com",
+            password="pass1234A!",
+            role=AppUser.UserRole.COLABORADOR,
+        )
+        self.course = Course.objects.create(name="Curso Pesado")
+        module = Module.objects.create(course=self.course, name="Módulo")
+        content = Content.objects.create(
+            module=module, title="Examen", content_type=Content.ContentType.MATERIAL
+        )
+        inscription = CourseInscription.objects.create(app_user=user, course=self.course)
+        ContentProgress.objects.create(
+            content=content,
+            course_inscription=inscription,
+            file=b"x" * 200_000,
+            results=[{"question_id": 1, "is_correct": True}],
+        )
+
+    def test_heavy_columns_are_deferred_by_default(self):
+        with CaptureQueriesContext(connection) as ctx:
+            progress = ContentProgress.objects.get()
+        sql = ctx.captured_queries[0]["sql"]
+        self.assertNotIn('"file"', sql)
+        self.assertNotIn('"results"', sql)
+        self.assertEqual(progress.get_deferred_fields(), {"file", "results"})
+
+        with self.assertNumQueries(1):
+            progress = ContentProgress.objects.with_results().get()
+            self.assertEqual(progress.results[0]["question_id"], 1)
+
+    def test_loading_heavy_columns_keeps_other_deferrals(self):
+        progress = ContentProgress.objects.only("pk", "score").with_results().get()
+        self.assertEqual(
+            progress.get_deferred_fields(),
+            {f.attname for f in ContentProgress._meta.concrete_fields}
+            - {"id", "score", "results"},
+        )
+
+        progress = ContentProgress.objects.defer("score").with_file().get()
+        self.assertEqual(progress.get_deferred_fields(), {"score", "results"})
+
+    def test_benchmark_reports_smaller_payload(self):
+        out = StringIO()
+        call_command(
+            "benchmark_progress_loading", str(self.course.pk), "--repeat=1", stdout=out
+        )
+        full, deferred = [
+            float(line.split(", ")[1].split(" ")[0])
+            for line in out.getvalue().splitlines()
+        ]
+        self.assertGreater(full, 100)
+        self.assertLess(deferred, 1)
@@ -1,9 +1,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Count
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.contrib import messages
+from django.db.models import Count
 from django.utils import timezone
 
 from accounts.models import AppUser
@@ -22,19 +22,14 @@ from enrollments.services import (
 def home(request):
     """Dashboard de aprendizaje (My learning)."""
     # Rutas primero: solo las que el usuario está inscrito
-    paths = LearningPath.objects.filter(inscriptions__app_user=request.user).order_by(
-        "-created_at"
+    paths = (
+        LearningPath.objects.filter(inscriptions__app_user=request.user)
+        .annotate(courses_total=Count("courses", distinct=True))
+        .order_by("-created_at")
     )
 
     # Cursos visibles para el usuario con datos de tarjeta estilo catálogo
-    courses_qs = (
-        get_courses_for_user(request.user)
-        .annotate(
-            modules_count=Count("modules", distinct=True),
-            contents_count=Count("modules__contents", distinct=True),
-        )
-        .order_by("-created_at")
-    )
+    courses_qs = get_courses_for_user(request.user).order_by("-created_at")
     prefetch = _build_inscriptions_prefetch(request.user)
     if prefetch is not None:
         courses_qs = courses_qs.prefetch_related(prefetch)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from learning_paths.services import recompute_path_durations
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la duración estimada de todas las rutas como la suma de "
+        "las horas de sus cursos, con una sola sentencia UPDATE."
+    )
+
+    def handle(self, *args, **options):
+        updated = recompute_path_durations()
+        self.stdout.write(self.style.SUCCESS(f"{updated} ruta(s) actualizadas."))
@@ -23,6 +23,8 @@ class LearningPath(models.Model):
         related_name="created_paths",
     )
     header_img = models.ImageField(null=True, blank=True)
+    # Hash de la portada con miniaturas generadas (courses.thumbnails)
+    header_img_digest = models.CharField(max_length=16, blank=True, editable=False)
     status = models.CharField(
         max_length=20, choices=PathStatus.choices, default=PathStatus.DRAFT
     )
@@ -0,0 +1,135 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import CourseInPath, LearningPath
+
+_pending_durations = threading.local()
+
+
+@transaction.atomic
+def set_path_course_order(
+    learning_path: LearningPath, course_ids: List[int]
+) -> List[CourseInPath]:
+    """Rewrite the CourseInPath chain of a path in the given order (one bulk UPDATE)."""
+    entries = {
+        cip.course_id: cip  # pyright: ignore[reportAttributeAccessIssue]
+        for cip in CourseInPath.objects.select_for_update().filter(
+            learning_path=learning_path
+        )
+    }
+    course_ids = [int(pk) for pk in course_ids]
+    if len(course_ids) != len(set(course_ids)) or set(course_ids) != set(entries):
+        raise ValueError(
+            "El nuevo orden debe incluir cada curso de la ruta exactamente una vez."
+        )
+
+    ordered = [entries[pk] for pk in course_ids]
+    changed = []
+    for index, cip in enumerate(ordered):
+        previous_id = course_ids[index - 1] if index > 0 else None
+        next_id = course_ids[index + 1] if index + 1 < len(course_ids) else None
+        if cip.previous_course_id != previous_id or cip.next_course_id != next_id:  # pyright: ignore[reportAttributeAccessIssue]
+            cip.previous_course_id = previous_id  # pyright: ignore[reportAttributeAccessIssue]
+            cip.next_course_id = next_id  # pyright: ignore[reportAttributeAccessIssue]
+            changed.append(cip)
+
+    if changed:
+        CourseInPath.objects.bulk_update(changed, ["previous_course", "next_course"])
+    return ordered
+
+
+def order_path_links(links: Iterable[CourseInPath]) -> List[CourseInPath]:
+    """
+    Order already-loaded CourseInPath rows of one path by their course chain.
+    Rows left out of the chain (broken pointers) are appended by id.
+    """
+    by_course: Dict[int, CourseInPath] = {cip.course_id: cip for cip in links}  # pyright: ignore[reportAttributeAccessIssue]
+    heads = [
+        cip
+        for cip in by_course.values()
+        if cip.previous_course_id not in by_course  # pyright: ignore[reportAttributeAccessIssue]
+    ]
+
+    ordered: List[CourseInPath] = []
+    seen = set()
+    current = heads[0] if heads else None
+    while current is not None and current.course_id not in seen:  # pyright: ignore[reportAttributeAccessIssue]
+        ordered.append(current)
+        seen.add(current.course_id)  # pyright: ignore[reportAttributeAccessIssue]
+        next_id: Optional[int] = current.next_course_id  # pyright: ignore[reportAttributeAccessIssue]
+        current = by_course.get(next_id) if next_id is not None else None
+
+    if len(ordered) != len(by_course):
+        ordered.extend(
+            sorted(
+                (cip for cip in by_course.values() if cip.course_id not in seen),  # pyright: ignore[reportAttributeAccessIssue]
+                key=lambda cip: cip.pk,
+            )
+        )
+    return ordered
+
+
+def recompute_path_durations(
+    path_ids: Optional[Iterable[int]] = None,
+    course_ids: Optional[Iterable[int]] = None,
+) -> int:
+    """
+    Set ``estimated_duration`` to the sum of its courses' hours with a single
+    correlated UPDATE. Limited to the given paths and to the paths containing
+    the given courses; with neither, every path is recomputed.
+    """
+    paths = LearningPath.objects.all()
+    if path_ids is not None or course_ids is not None:
+        paths = paths.filter(
+            Q(pk__in=list(path_ids or []))
+            | Q(
+                pk__in=CourseInPath.objects.filter(
+                    course_id__in=list(course_ids or [])
+                ).values("learning_path_id")
+            )
+        )
+
+    total_hours = (
+        CourseInPath.objects.filter(learning_path=OuterRef("pk"))
+        .values("learning_path")
+        .annotate(total=Sum("course__duration_hours"))
+        .values("total")
+    )
+    return paths.update(
+        estimated_duration=Coalesce(
+            Subquery(total_hours, output_field=IntegerField()), Value(0)
+        )
+    )
+
+
+def _flush_path_durations() -> None:
+    path_ids = getattr(_pending_durations, "path_ids", set())
+    course_ids = getattr(_pending_durations, "course_ids", set())
+    _pending_durations.path_ids = set()
+    _pending_durations.course_ids = set()
+    if path_ids or course_ids:
+        recompute_path_durations(path_ids, course_ids)
+
+
+def schedule_path_duration_update(
+    path_ids: Iterable[int] = (), course_ids: Iterable[int] = ()
+) -> None:
+    """
+    Recompute path durations once the current transaction commits.
+
+    Requests made during the same transaction are merged, so the first
+    on_commit callback runs one UPDATE for all of them and the rest find
+    nothing left to do. Ids left behind by a rolled-back transaction are
+    flushed with the next commit; the recompute reads committed data, so
+    that only rewrites the same value.
+    """
+    if not hasattr(_pending_durations, "path_ids"):
+        _pending_durations.path_ids = set()
+        _pending_durations.course_ids = set()
+    _pending_durations.path_ids.update(path_ids)
+    _pending_durations.course_ids.update(course_ids)
+    transaction.on_commit(_flush_path_durations)
@@ -1,2 +1,43 @@
+from django.test import TestCase
 
-# Create your tests here.
+from courses.models import Course
+from .models import CourseInPath, LearningPath
+from .services import recompute_path_durations
+
+
+class PathDurationTests(TestCase):
+    def setUp(self):
+        self.courses = [
+            Course.objects.create(name=f"Curso {hours}", duration_hours=hours)
+            for hours in (2, 3, 5)
+        ]
+        self.path = LearningPath.objects.create(name="Ruta")
+        self.other = LearningPath.objects.create(name="Otra ruta")
+
+    def test_changes_in_one_transaction_run_a_single_update(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for course in self.courses:
+                CourseInPath.objects.create(learning_path=self.path, course=course)
+            CourseInPath.objects.create(learning_path=self.other, course=self.courses[0])
+            self.courses[0].duration_hours = 4
+            self.courses[0].save()
+
+        self.assertEqual(LearningPath.objects.get(pk=self.path.pk).estimated_duration, None)
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+
+        durations = dict(LearningPath.objects.values_list("pk", "estimated_duration"))
+        self.assertEqual(durations, {self.path.pk: 12, self.other.pk: 4})
+
+    def test_bulk_recompute_covers_every_path(self):
+        CourseInPath.objects.bulk_create(
+            [CourseInPath(learning_path=self.path, course=course) for course in self.courses]
+        )
+
+        with self.assertNumQueries(1):
+            updated = recompute_path_durations()
+
+        self.assertEqual(updated, 2)
+        durations = dict(LearningPath.objects.values_list("pk", "estimated_duration"))
+        self.assertEqual(durations, {self.path.pk: 10, self.other.pk: 0})
@@ -1,10 +1,8 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Count
 
 from enrollments.services import (
-    get_courses_in_learning_path_for_user,
-    get_paths_for_user,
+    get_paths_with_courses_for_user,
     _build_catalog_card_for_course,
     _build_inscriptions_prefetch,
 )
@@ -15,13 +13,8 @@ from courses.models import Course
 @login_required
 def paths(request):
     """Listado de rutas visibles según el rol del usuario (RF5)."""
-    paths = get_paths_for_user(request.user)
-
-    # Para cada ruta, traer cursos visibles para el usuario
-    path_cards = []
-    for path in paths:
-        courses = get_courses_in_learning_path_for_user(request.user, path)
-        path_cards.append((path, courses))
+    # Rutas y sus cursos visibles en lote (sin una consulta por ruta)
+    path_cards = get_paths_with_courses_for_user(request.user)
 
     return render(request, "learning_paths/paths.html", {"path_cards": path_cards})
 
@@ -36,10 +29,6 @@ def path_detail(request, pk: int):
 
     courses_qs = (
         Course.objects.filter(in_paths__learning_path=learning_path)
-        .annotate(
-            modules_count=Count("modules", distinct=True),
-            contents_count=Count("modules__contents", distinct=True),
-        )
         .order_by("name")
         .distinct()
     )
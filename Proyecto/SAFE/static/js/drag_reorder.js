@@ -0,0 +1,89 @@
+// Reordenamiento por arrastre: los contenedores con data-reorder-url envían
+// el orden completo de sus hijos [data-reorder-id] en una sola petición.
+(function () {
+  function csrfToken(container) {
+    const input = container.querySelector('input[name="csrfmiddlewaretoken"]')
+      || document.querySelector('input[name="csrfmiddlewaretoken"]');
+    return input ? input.value : '';
+  }
+
+  function items(container) {
+    return Array.from(container.querySelectorAll(':scope > [data-reorder-id]'));
+  }
+
+  function renumber(container) {
+    items(container).forEach((item, index) => {
+      const label = item.querySelector('.reorder-index');
+      if (label) label.textContent = index + 1;
+    });
+  }
+
+  function enable(container) {
+    let dragged = null;
+    let previousOrder = [];
+    let afterItems = null;
+    let dropped = false;
+
+    function restore() {
+      previousOrder.forEach((item) => container.insertBefore(item, afterItems));
+      renumber(container);
+    }
+
+    items(container).forEach((item) => {
+      item.setAttribute('draggable', 'true');
+
+      item.addEventListener('dragstart', (event) => {
+        dragged = item;
+        dropped = false;
+        previousOrder = items(container);
+        // Nodo que sigue a la lista (p. ej. el formulario de alta), para restaurarla
+        afterItems = previousOrder[previousOrder.length - 1].nextSibling;
+        item.classList.add('dragging');
+        event.dataTransfer.effectAllowed = 'move';
+      });
+
+      item.addEventListener('dragend', () => {
+        item.classList.remove('dragging');
+        dragged = null;
+        // Soltado fuera de la lista o cancelado con Esc: no se guardó nada
+        if (!dropped) restore();
+      });
+
+      item.addEventListener('dragover', (event) => {
+        if (!dragged || dragged === item) return;
+        event.preventDefault();
+        const rect = item.getBoundingClientRect();
+        const after = event.clientY > rect.top + rect.height / 2;
+        container.insertBefore(dragged, after ? item.nextSibling : item);
+      });
+    });
+
+    container.addEventListener('drop', (event) => {
+      event.preventDefault();
+      dropped = true;
+      const order = items(container).map((item) => Number(item.dataset.reorderId));
+
+      fetch(container.dataset.reorderUrl, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-CSRFToken': csrfToken(container),
+        },
+        body: JSON.stringify({ order: order }),
+      })
+        .then((response) => response.json().then((data) => ({ ok: response.ok, data })))
+        .then(({ ok, data }) => {
+          if (!ok) throw new Error(data.error || 'No se pudo guardar el orden.');
+          renumber(container);
+        })
+        .catch((error) => {
+          restore();
+          alert(error.message);
+        });
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('[data-reorder-url]').forEach(enable);
+  });
+})();
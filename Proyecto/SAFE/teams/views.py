@@ -3,7 +3,6 @@ from django.urls import reverse
 from django.views.decorators.http import require_POST
 from .models import Team, TeamUser
 from enrollments.models import CourseInscription, PathInscription, ContentProgress
-from enrollments.services import update_inscription_progress
 from courses.models import Course
 from learning_paths.models import LearningPath, CourseInPath
 from accounts.models import AppUser
@@ -49,10 +48,8 @@ def supervisor_panel(request):
     if filter_date_end:
         base_queryset = base_queryset.filter(enrollment_date__lte=filter_date_end)
 
-    # Recalcular progreso en tiempo real para asegurar consistencia
-    # Esto corrige discrepancias entre el progreso real (ContentProgress) y el campo almacenado
-    for inscription in base_queryset:
-        update_inscription_progress(inscription)
+    # El progreso almacenado se mantiene por enrollments.signals; las
+    # discrepancias se corrigen con `manage.py reconcile_inscription_progress`.
 
     team_progress = (
         base_queryset.select_related("app_user", "course")
@@ -39,6 +39,17 @@ for app in "${APPS[@]}"; do
 done
 
 docker compose exec -T web python manage.py migrate --noinput
+docker compose exec -T web python manage.py createcachetable
+
+# 4) Sincronizar datos derivados (idempotente)
+docker compose exec -T web python manage.py rebuild_course_counters
+docker compose exec -T web python manage.py reconcile_inscription_progress
+docker compose exec -T web python manage.py rebuild_course_ordering
+docker compose exec -T web python manage.py recompute_path_durations
+docker compose exec -T web python manage.py canonicalize_exams
+docker compose exec -T web python manage.py compact_exam_results
+docker compose exec -T web python manage.py migrate_submission_blobs
+docker compose exec -T web python manage.py regenerate_thumbnails
 
 echo ""
 echo "=========================================="